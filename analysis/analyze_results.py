@@ -4,19 +4,50 @@ GPQA评测结果分析脚本
 分析评测结果，生成统计报告
 """
 
+import sys
 import json
 import argparse
 from pathlib import Path
 from collections import defaultdict
-import matplotlib.pyplot as plt
-import seaborn as sns
 
-def analyze_results(results_file):
+# 添加父目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+# 列式存储中分析用到的列 -> 分析脚本使用的字段名
+COLUMNAR_FIELDS = {
+    'question_id': 'question_id',
+    'subdomain': 'subject',
+    'actual': 'model_answer',
+    'correct': 'is_correct',
+    'api_time': 'elapsed_time',
+    'tokens_used': 'tokens_used',
+    'error': 'error',
+}
+
+def load_columnar(path):
+    """从列式存储（单个文件或多次运行的目录）只读取分析需要的列，转换成 {completed, failed} 格式"""
+    from core.columnar_store import read_columns
+    
+    columns = read_columns(path, COLUMNAR_FIELDS)
+    completed, failed = [], []
+    for row in zip(*(columns[name] for name in COLUMNAR_FIELDS)):
+        record = dict(zip(COLUMNAR_FIELDS.values(), row))
+        if record['error'] is not None:
+            failed.append({k: record[k] for k in ('question_id', 'subject', 'error')})
+        else:
+            del record['error']
+            completed.append(record)
+    return {'completed': completed, 'failed': failed}
+
+def analyze_results(results_file, viz=False, columnar=False):
     """分析评测结果"""
     
     print(f"Loading results from: {results_file}")
-    with open(results_file, 'r') as f:
-        data = json.load(f)
+    if columnar:
+        data = load_columnar(results_file)
+    else:
+        with open(results_file, 'r') as f:
+            data = json.load(f)
     
     completed = data.get('completed', [])
     failed = data.get('failed', [])
@@ -109,9 +140,10 @@ def analyze_results(results_file):
             print(f"  {error}: {count}")
     
     # 生成可视化（如果需要）
-    generate_visualizations(data)
+    if viz:
+        generate_visualizations(data, results_file)
 
-def generate_visualizations(data):
+def generate_visualizations(data, results_file):
     """生成结果可视化图表"""
     try:
         import matplotlib.pyplot as plt
@@ -179,17 +211,20 @@ def generate_visualizations(data):
         ax.set_ylabel('Count')
     
     plt.tight_layout()
-    output_path = Path(results_file).parent / 'results_analysis.png'
+    results_path = Path(results_file)
+    output_path = (results_path if results_path.is_dir() else results_path.parent) / 'results_analysis.png'
     plt.savefig(output_path)
     print(f"\nVisualization saved to: {output_path}")
 
 def main():
     parser = argparse.ArgumentParser(description="分析GPQA评测结果")
-    parser.add_argument("results_file", help="结果文件路径")
+    parser.add_argument("results_file", help="结果文件路径（--columnar 时可以是包含多次运行的目录）")
     parser.add_argument("--viz", action="store_true", help="生成可视化图表")
+    parser.add_argument("--columnar", action="store_true",
+                        help="读取列式结果（gpqa_results.parquet，需要 pyarrow），只加载分析用到的列")
     args = parser.parse_args()
     
-    analyze_results(args.results_file)
+    analyze_results(args.results_file, viz=args.viz, columnar=args.columnar)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
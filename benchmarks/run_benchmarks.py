@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+GPQA评测流水线基准测试
+使用合成数据和进程内的模拟API服务器，测量:
+    - dataset_loading: 预处理产物/题目存储的写入、加载、随机访问
+    - startup: 带已有检查点时运行器的启动时间
+    - checkpoint: save_checkpoint 和逐题日志追加的开销
+    - analysis: analyze_results 的耗时
+    - run_test: 端到端吞吐量（题/秒），覆盖不同并发度
+
+结果写成JSON，便于在不同版本之间比较。
+
+用法:
+    python benchmarks/run_benchmarks.py                # 完整规模（448 ~ 100k 条结果）
+    python benchmarks/run_benchmarks.py --quick        # 小规模冒烟
+    python benchmarks/run_benchmarks.py --only checkpoint analysis
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import logging
+import platform
+import argparse
+import datetime
+import tempfile
+import threading
+import statistics
+import subprocess
+import contextlib
+from pathlib import Path
+from typing import Dict, Any, List, Callable
+
+# 添加父目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+# 基准测试不走真实API：关闭缓存和对冲，避免用户环境变量影响结果
+os.environ.setdefault("XAI_API_KEY", "benchmark")
+os.environ["RESPONSE_CACHE"] = "off"
+os.environ["HEDGING"] = "off"
+
+# 抑制运行器的逐题INFO日志（运行器的 basicConfig 在已配置时不会生效）
+logging.basicConfig(level=logging.WARNING)
+
+from configs.config import API_CONFIG
+from core import columnar_store
+from core.checkpoint import atomic_write_json
+from core.question_format import write_processed, load_processed, content_hash
+from core.question_store import QuestionStore
+from core.gpqa_test_resumable import ResumableGPQATestRunner
+from scripts.mock_grok_server import build_parser as mock_server_parser, create_server
+from benchmarks.synthetic import synthetic_questions, synthetic_results, to_analysis_format
+
+# 模拟服务器没有配额，关闭客户端限流（必须在第一次创建运行器之前设置）
+API_CONFIG.update(requests_per_minute=None, tokens_per_minute=None, retry_delay=0.1)
+
+RESULT_SIZES = [448, 10_000, 100_000]
+QUICK_RESULT_SIZES = [448, 2_000]
+CONCURRENCY_LEVELS = [1, 4, 16, 64]
+QUICK_CONCURRENCY_LEVELS = [1, 8]
+
+DEFAULT_OUTPUT_DIR = Path(__file__).parent / "results"
+
+
+def timed(fn: Callable[[], Any], repeat: int = 1) -> Dict[str, float]:
+    """执行 repeat 次，返回耗时的最小值和中位数（秒）"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {"min_s": min(samples), "median_s": statistics.median(samples)}
+
+
+class BenchContext:
+    """一次基准运行的临时目录和合成数据缓存"""
+
+    def __init__(self, work_dir: Path, seed: int = 0):
+        self.work_dir = work_dir
+        self.seed = seed
+        self._questions = {}
+
+    def questions(self, count: int) -> List[Dict[str, Any]]:
+        if count not in self._questions:
+            self._questions[count] = synthetic_questions(count, self.seed)
+        return self._questions[count]
+
+    def dataset(self, count: int):
+        """写出 count 题的预处理产物和题目存储，返回 (json路径, 存储路径)"""
+        json_path = self.work_dir / f"questions_{count}.json"
+        store_path = self.work_dir / f"questions_{count}.qstore"
+        if not json_path.exists():
+            questions = self.questions(count)
+            digest = write_processed(json_path, questions, self.seed, "synthetic")
+            QuestionStore.build(store_path, questions, digest)
+        return json_path, store_path
+
+    def new_runner(self, name: str, count: int, max_workers: int = 1) -> ResumableGPQATestRunner:
+        """在独立目录中创建运行器，使用 count 题的合成题目存储"""
+        json_path, store_path = self.dataset(count)
+        run_dir = self.work_dir / name
+        return ResumableGPQATestRunner(
+            checkpoint_file=str(run_dir / "gpqa_checkpoint.json"),
+            log_dir=str(run_dir / "logs"),
+            max_workers=max_workers,
+            processed_data=str(json_path),
+            question_store=str(store_path)
+        )
+
+
+def bench_dataset_loading(ctx: BenchContext, sizes: List[int]) -> List[Dict[str, Any]]:
+    records = []
+    for size in sizes:
+        questions = ctx.questions(size)
+        json_path = ctx.work_dir / f"load_{size}.json"
+        store_path = ctx.work_dir / f"load_{size}.qstore"
+
+        digest = content_hash(questions)
+        write = timed(lambda: (write_processed(json_path, questions, ctx.seed, "synthetic"),
+                               QuestionStore.build(store_path, questions, digest)))
+        load_json = timed(lambda: load_processed(json_path), repeat=3)
+        open_store = timed(lambda: QuestionStore(store_path).close(), repeat=3)
+
+        rng = random.Random(ctx.seed)
+        ids = [rng.randrange(size) for _ in range(1000)]
+        with QuestionStore(store_path) as store:
+            random_access = timed(lambda: [store.get_question(i) for i in ids], repeat=3)
+            iterate = timed(lambda: sum(1 for _ in store))
+
+        records.append({
+            "name": "dataset_loading",
+            "params": {"questions": size},
+            "metrics": {
+                "write_s": write["median_s"],
+                "load_json_s": load_json["median_s"],
+                "store_open_s": open_store["median_s"],
+                "store_random_access_us": random_access["median_s"] / len(ids) * 1e6,
+                "store_iterate_s": iterate["median_s"],
+                "json_bytes": json_path.stat().st_size,
+                "store_bytes": store_path.stat().st_size,
+            }
+        })
+    return records
+
+
+def _write_checkpoint(ctx: BenchContext, name: str, size: int) -> Path:
+    """写出一个包含 size 条结果的检查点，返回其路径"""
+    questions = ctx.questions(size)
+    results = synthetic_results(questions, ctx.seed)
+    checkpoint_file = ctx.work_dir / name / "gpqa_checkpoint.json"
+    checkpoint_file.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write_json(checkpoint_file, {
+        "timestamp": "benchmark",
+        "completed_questions": [r["question_id"] for r in results],
+        "results": results,
+        "stats": {"total_time": 0, "api_calls": size, "api_errors": 0, "timeouts": 0,
+                  "tokens_used": sum(r.get("tokens_used", 0) for r in results), "reasoning_tokens": 0},
+        "failed_questions": {},
+        "dataset_hash": None,
+    })
+    return checkpoint_file
+
+
+def bench_startup(ctx: BenchContext, sizes: List[int]) -> List[Dict[str, Any]]:
+    records = []
+    for size in sizes:
+        _write_checkpoint(ctx, f"startup_{size}", size)
+        ctx.dataset(size)
+
+        def start():
+            runner = ctx.new_runner(f"startup_{size}", size)
+            runner.load_questions()
+
+        records.append({
+            "name": "startup",
+            "params": {"results": size},
+            "metrics": timed(start, repeat=3)
+        })
+    return records
+
+
+def bench_checkpoint(ctx: BenchContext, sizes: List[int]) -> List[Dict[str, Any]]:
+    records = []
+    for size in sizes:
+        checkpoint_file = _write_checkpoint(ctx, f"checkpoint_{size}", size)
+        runner = ctx.new_runner(f"checkpoint_{size}", size)
+
+        save = timed(runner.save_checkpoint, repeat=3)
+
+        # 逐题追加日志（每条 fsync）
+        extra = synthetic_results(synthetic_questions(100, ctx.seed + 1), ctx.seed + 1)
+        for i, result in enumerate(extra):
+            result["question_id"] = size + i
+        append = timed(lambda: [runner.record_result(r["question_id"], r) for r in extra])
+
+        records.append({
+            "name": "checkpoint",
+            "params": {"results": size},
+            "metrics": {
+                "save_min_s": save["min_s"],
+                "save_median_s": save["median_s"],
+                "journal_append_ms": append["median_s"] / len(extra) * 1000,
+                "checkpoint_bytes": checkpoint_file.stat().st_size,
+            }
+        })
+    return records
+
+
+def bench_analysis(ctx: BenchContext, sizes: List[int]) -> List[Dict[str, Any]]:
+    try:
+        from analysis.analyze_results import analyze_results
+    except ImportError as e:
+        print(f"跳过 analysis 基准（{e}）")
+        return [{"name": "analysis", "params": {}, "skipped": str(e)}]
+
+    records = []
+    for size in sizes:
+        results_file = ctx.work_dir / f"analysis_{size}.json"
+        results = synthetic_results(ctx.questions(size), ctx.seed)
+        with open(results_file, "w", encoding="utf-8") as f:
+            json.dump(to_analysis_format(results), f, ensure_ascii=False)
+
+        def analyze():
+            with contextlib.redirect_stdout(io.StringIO()):
+                analyze_results(str(results_file))
+
+        records.append({
+            "name": "analysis",
+            "params": {"results": size},
+            "metrics": timed(analyze, repeat=3)
+        })
+        
+        if not columnar_store.is_available():
+            continue
+        columnar_file = columnar_store.write_results(
+            results, ctx.work_dir / f"analysis_{size}" / columnar_store.COLUMNAR_FILENAME, "bench"
+        )
+        
+        def analyze_columnar():
+            with contextlib.redirect_stdout(io.StringIO()):
+                analyze_results(str(columnar_file), columnar=True)
+        
+        records.append({
+            "name": "analysis",
+            "params": {"results": size, "format": "columnar"},
+            "metrics": timed(analyze_columnar, repeat=3)
+        })
+    return records
+
+
+@contextlib.contextmanager
+def mock_server(latency: str, latency_mean: float, error_rate: float):
+    """在后台线程启动模拟服务器，期间把 API_CONFIG["base_url"] 指向它"""
+    args = mock_server_parser().parse_args([
+        "--port", "0", "--latency", latency, "--latency-mean", str(latency_mean),
+        "--error-500", str(error_rate), "--seed", "0",
+    ])
+    server = create_server(args)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    previous = API_CONFIG["base_url"]
+    API_CONFIG["base_url"] = f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+    try:
+        yield server
+    finally:
+        API_CONFIG["base_url"] = previous
+        server.shutdown()
+        server.server_close()
+
+
+def bench_run_test(ctx: BenchContext, questions: int, concurrency_levels: List[int],
+                   latency: str, latency_mean: float, error_rate: float) -> List[Dict[str, Any]]:
+    records = []
+    ctx.dataset(questions)
+    with mock_server(latency, latency_mean, error_rate):
+        for concurrency in concurrency_levels:
+            runner = ctx.new_runner(f"run_test_c{concurrency}", questions, max_workers=concurrency)
+            start = time.perf_counter()
+            runner.run_test(0, questions)
+            elapsed = time.perf_counter() - start
+
+            times = sorted(r["total_time"] for r in runner.results)
+            records.append({
+                "name": "run_test",
+                "params": {"questions": questions, "concurrency": concurrency, "latency": latency,
+                           "latency_mean_s": latency_mean, "error_rate": error_rate},
+                "metrics": {
+                    "elapsed_s": elapsed,
+                    "questions_per_s": questions / elapsed,
+                    "failed": sum(1 for r in runner.results if "error" in r),
+                    "p50_question_s": times[len(times) // 2],
+                    "p99_question_s": times[min(len(times) - 1, int(len(times) * 0.99))],
+                }
+            })
+            runner.session.close()
+    return records
+
+
+def git_commit() -> str:
+    """当前代码版本，便于比较不同版本的结果"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).parent,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old_file: str, new_file: str):
+    """按 (name, params) 对齐两次结果，打印各指标的变化比例"""
+    def index(path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data["meta"], {
+            (r["name"], json.dumps(r["params"], sort_keys=True)): r.get("metrics", {}) for r in data["benchmarks"]
+        }
+
+    old_meta, old = index(old_file)
+    new_meta, new = index(new_file)
+    print(f"基线: {old_meta.get('git_commit')} ({old_meta['timestamp']})  对比: {new_meta.get('git_commit')} ({new_meta['timestamp']})")
+    for key in sorted(set(old) & set(new)):
+        name, params = key
+        print(f"\n{name} {params}")
+        for metric, new_value in new[key].items():
+            old_value = old[key].get(metric)
+            if isinstance(new_value, (int, float)) and isinstance(old_value, (int, float)) and old_value:
+                print(f"  {metric:28s} {old_value:14.6g} -> {new_value:14.6g}  ({new_value / old_value:6.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GPQA评测流水线基准测试")
+    parser.add_argument("--quick", action="store_true", help="小规模运行（冒烟测试）")
+    parser.add_argument("--only", nargs="+", choices=["dataset_loading", "startup", "checkpoint", "analysis", "run_test"],
+                        help="只运行指定的基准")
+    parser.add_argument("--sizes", type=int, nargs="+", help="结果/题目规模（默认 448 10000 100000）")
+    parser.add_argument("--concurrency", type=int, nargs="+", help="run_test 的并发度（默认 1 4 16 64）")
+    parser.add_argument("--questions", type=int, default=448, help="run_test 的题目数")
+    parser.add_argument("--latency", choices=["fixed", "lognormal", "pareto"], default="fixed",
+                        help="run_test 模拟服务器的延迟分布")
+    parser.add_argument("--latency-mean", type=float, default=0.02, help="run_test 模拟服务器的平均延迟（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="run_test 模拟服务器返回5xx的比例")
+    parser.add_argument("--output", help="结果JSON路径（默认 benchmarks/results/bench_<时间戳>.json）")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="比较两次基准结果后退出")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    sizes = args.sizes or (QUICK_RESULT_SIZES if args.quick else RESULT_SIZES)
+    concurrency_levels = args.concurrency or (QUICK_CONCURRENCY_LEVELS if args.quick else CONCURRENCY_LEVELS)
+    selected = set(args.only or ["dataset_loading", "startup", "checkpoint", "analysis", "run_test"])
+
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    records = []
+    with tempfile.TemporaryDirectory(prefix="gpqa_bench_") as tmp:
+        ctx = BenchContext(Path(tmp))
+        suite = [
+            ("dataset_loading", lambda: bench_dataset_loading(ctx, sizes)),
+            ("startup", lambda: bench_startup(ctx, sizes)),
+            ("checkpoint", lambda: bench_checkpoint(ctx, sizes)),
+            ("analysis", lambda: bench_analysis(ctx, sizes)),
+            ("run_test", lambda: bench_run_test(ctx, args.questions, concurrency_levels,
+                                                args.latency, args.latency_mean, args.error_rate)),
+        ]
+        for name, run in suite:
+            if name not in selected:
+                continue
+            print(f"=== {name} ===")
+            for record in run():
+                records.append(record)
+                metrics = ", ".join(f"{k}={v:.4g}" for k, v in record.get("metrics", {}).items())
+                print(f"  {record['params']}: {metrics or record.get('skipped')}")
+
+    output = Path(args.output) if args.output else DEFAULT_OUTPUT_DIR / f"bench_{timestamp}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "meta": {
+                "timestamp": timestamp,
+                "git_commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "args": vars(args),
+            },
+            "benchmarks": records
+        }, f, indent=2, ensure_ascii=False)
+    print(f"\n基准结果已保存到: {output}")
+
+
+if __name__ == "__main__":
+    main()
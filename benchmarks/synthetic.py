@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+基准测试用的合成数据
+生成与真实GPQA题目/结果结构相同的数据，规模不受数据集448题的限制
+"""
+
+import random
+from typing import Dict, Any, List
+
+from core.question_format import build_question
+
+DOMAINS = {
+    "Physics": ["Quantum Mechanics", "Electromagnetism and Photonics", "High-energy particle physics", "Astrophysics"],
+    "Chemistry": ["Organic Chemistry", "Inorganic Chemistry", "Physical Chemistry"],
+    "Biology": ["Molecular Biology", "Genetics"],
+}
+
+
+def synthetic_item(index: int, rng: random.Random) -> Dict[str, Any]:
+    """生成一道原始格式（HuggingFace字段名）的题目"""
+    domain = rng.choice(sorted(DOMAINS))
+    words = " ".join(f"term{rng.randint(0, 9999)}" for _ in range(rng.randint(40, 160)))
+    return {
+        "Question": f"Synthetic question {index}: {words}?",
+        "Correct Answer": f"correct option {index}",
+        "Incorrect Answer 1": f"distractor {index}-1",
+        "Incorrect Answer 2": f"distractor {index}-2",
+        "Incorrect Answer 3": f"distractor {index}-3",
+        "High-level domain": domain,
+        "Subdomain": rng.choice(DOMAINS[domain]),
+    }
+
+
+def synthetic_questions(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """生成 count 道处理后的题目（与 scripts/preprocess_gpqa.py 的输出相同）"""
+    rng = random.Random(seed)
+    return [build_question(synthetic_item(i, rng), i, seed) for i in range(count)]
+
+
+def synthetic_result(question: Dict[str, Any], rng: random.Random) -> Dict[str, Any]:
+    """生成一条与 ResumableGPQATestRunner.build_result 结构相同的结果"""
+    question_text = question["question"]
+    log = {
+        "question_id": question["question_id"],
+        "question_preview": question_text[:200] + "..." if len(question_text) > 200 else question_text,
+        "question_length": len(question_text),
+        "domain": question["domain"],
+        "subdomain": question["subdomain"],
+    }
+    if rng.random() < 0.02:
+        return {**log, "expected": question["correct_answer"], "error": "所有重试都失败",
+                "error_class": "retries_exhausted", "attempts": 3, "api_time": 2700.0, "total_time": 2700.0}
+
+    actual = question["correct_answer"] if rng.random() < 0.6 else rng.choice("ABCD")
+    api_time = rng.lognormvariate(5, 0.8)
+    reasoning = int(api_time * rng.uniform(20, 60))
+    return {
+        **log,
+        "expected": question["correct_answer"],
+        "actual": actual,
+        "raw_response": actual,
+        "correct": actual == question["correct_answer"],
+        "api_time": api_time,
+        "tokens_used": reasoning + len(question_text) // 4 + 1,
+        "reasoning_tokens": reasoning,
+        "model": "grok-4",
+        "total_time": api_time,
+    }
+
+
+def synthetic_results(questions: List[Dict[str, Any]], seed: int = 0) -> List[Dict[str, Any]]:
+    """为每道题生成一条结果"""
+    rng = random.Random(seed)
+    return [synthetic_result(q, rng) for q in questions]
+
+
+def to_analysis_format(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """转换成 analysis/analyze_results.py 读取的 {completed, failed} 格式"""
+    completed, failed = [], []
+    for r in results:
+        if "error" in r:
+            failed.append({"question_id": r["question_id"], "subject": r["subdomain"], "error": r["error"]})
+        else:
+            completed.append({
+                "question_id": r["question_id"],
+                "subject": r["subdomain"],
+                "model_answer": r["actual"],
+                "is_correct": r["correct"],
+                "elapsed_time": r["api_time"],
+                "tokens_used": r["tokens_used"],
+            })
+    return {"completed": completed, "failed": failed}
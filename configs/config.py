@@ -12,10 +12,64 @@ PROJECT_ROOT = Path(__file__).parent.parent
 
 # API配置
 API_CONFIG = {
-    "base_url": "https://api.x.ai/v1/chat/completions",
+    # 可指向本地模拟服务器（scripts/mock_grok_server.py）做压测
+    "base_url": os.getenv("GROK_API_ENDPOINT", "https://api.x.ai/v1/chat/completions"),
     "timeout": 900,  # 15分钟
+    "stream": False,  # 是否使用流式（SSE）响应
+    "connect_timeout": 10,  # 流式模式下的建连超时（秒）
+    "stream_idle_timeout": 120,  # 流式模式下无任何数据的最长空闲时间（秒）
     "max_retries": 3,
-    "retry_delay": 5,  # 秒
+    "retry_delay": 5,  # 秒，指数退避的基础延迟
+    "backoff_factor": 2,  # 退避因子
+    "max_retry_delay": 120,  # 单次退避等待上限（秒）
+    "requeue_budget": 2,  # 重试耗尽的题目在同一次运行中最多重新分发的次数
+    "drain_timeout": 60,  # 收到 SIGTERM/SIGINT 后等待在途题目完成的最长时间（秒），超时的记为待处理
+    "pool_size": 10,  # 连接池大小（keep-alive复用的连接数）
+    "requests_per_minute": 10,  # 客户端限流：每分钟请求数
+    "tokens_per_minute": None,  # 客户端限流：每分钟token数，None 表示不限制
+}
+
+# 熔断配置：连续连接错误/5xx达到阈值后暂停调用，定期探测，恢复后自动继续
+BREAKER_CONFIG = {
+    "failure_threshold": 5,  # 连续失败多少次后熔断
+    "reset_timeout": 30,  # 熔断后首次探测前的等待时间（秒）
+    "max_reset_timeout": 600,  # 探测失败时等待时间翻倍的上限（秒）
+}
+
+# 自适应超时配置：按本次运行已完成题目的耗时为每题设定超时和重试次数
+TIMEOUT_CONFIG = {
+    "adaptive": os.getenv("ADAPTIVE_TIMEOUT", "off") == "on",
+    "min_timeout": 120,  # 自适应超时下限（秒）
+    "max_timeout": 1800,  # 自适应超时上限（秒）
+    "min_samples": 5,  # 子领域样本不足时退回全局样本，全局也不足时使用 API_CONFIG["timeout"]
+    "percentile": 0.95,  # 估计耗时所用的分位数
+    "margin": 1.5,  # 估计耗时的余量系数
+}
+
+def question_time_budget(api_config: dict = API_CONFIG, timeout_config: dict = TIMEOUT_CONFIG) -> float:
+    """
+    单题一次分发的最长耗时（秒）：所有尝试的读超时 + 建连超时 + 重试之间的最长退避
+
+    启用自适应超时时单次超时最长可达 max_timeout，总等待不少于固定超时时的 timeout × max_retries。
+    不含限流排队和熔断等待。
+    """
+    attempts = api_config["max_retries"]
+    request_time = api_config["timeout"] * attempts
+    if timeout_config.get("adaptive"):
+        request_time = max(request_time, timeout_config["max_timeout"])
+    backoff = sum(
+        min(api_config["max_retry_delay"], api_config["retry_delay"] * api_config["backoff_factor"] ** i)
+        for i in range(attempts - 1)
+    )
+    return request_time + api_config.get("connect_timeout", 10) * attempts + backoff
+
+# 长尾请求对冲配置（HEDGING=on 启用）
+HEDGING_CONFIG = {
+    "enabled": os.getenv("HEDGING", "off") == "on",
+    "percentile": 0.95,  # 请求耗时超过本次运行已观测延迟的该分位数后发出对冲请求
+    "min_samples": 20,  # 观测样本不足时不对冲
+    "max_extra_fraction": 0.1,  # 对冲请求数最多占总请求数的比例
+    "max_extra_tokens": None,  # 对冲请求累计token上限，None 表示不限制
 }
 
 # 模型配置
@@ -38,6 +92,16 @@ PATHS = {
     "checkpoint": PROJECT_ROOT / "results" / "gpqa_checkpoint.json",
     "logs_dir": PROJECT_ROOT / "logs",
     "results_dir": PROJECT_ROOT / "results",
+    "response_cache": PROJECT_ROOT / "results" / "response_cache.sqlite",
+    "processed_data": PROJECT_ROOT / "data" / "gpqa_processed.json",
+    "question_store": PROJECT_ROOT / "data" / "gpqa_processed.qstore",
+}
+
+# 响应缓存配置（RESPONSE_CACHE=on 读写缓存，RESPONSE_CACHE=replay 只读回放）
+CACHE_CONFIG = {
+    "enabled": os.getenv("RESPONSE_CACHE", "off") in ("on", "replay"),
+    "replay": os.getenv("RESPONSE_CACHE") == "replay",
+    "max_bytes": 2 * 1024 ** 3,  # 2GB
 }
 
 # 监控配置
@@ -45,6 +109,17 @@ MONITOR_CONFIG = {
     "check_interval": 60,  # 秒
     "no_progress_threshold": 10,  # 无进展检查次数
     "auto_restart": True,
+    "metrics_host": "127.0.0.1",  # 运行器指标服务的监听地址（--metrics-port 启用）
+    # 跟随模式/监督进程: 超过该时长没有进展视为停滞；取单题最长耗时（所有尝试的超时+退避）再留5分钟限流排队余量
+    "stall_seconds": question_time_budget() + 300,
+    "event_window": 600,  # 跟随模式: 吞吐和错误率的滚动窗口（秒）
+    "error_rate_alert": 0.2,  # 跟随模式: 窗口内错误率超过该值时告警
+    "heartbeat_interval": 10,  # 监督进程: 运行器心跳间隔（秒）
+    "heartbeat_timeout": 60,  # 监督进程: 超过该时长没有心跳视为卡死（秒）
+    "grace_period": 120,  # 监督进程: SIGTERM 后等待保存检查点的时长，超时 SIGKILL（秒）
+    "restart_backoff": 5,  # 监督进程: 首次重启等待（秒），连续失败时翻倍
+    "max_restart_backoff": 300,  # 监督进程: 重启等待上限（秒）
+    "max_restarts": 20,  # 监督进程: 最多重启次数
 }
 
 # 确保必要的目录存在
@@ -5,10 +5,21 @@ Grok API客户端
 """
 
 import time
+import asyncio
+import functools
 import requests
+from concurrent.futures import ThreadPoolExecutor
 import logging
 from typing import Dict, Any, Optional
-from ..configs.config import API_CONFIG, MODEL_CONFIG, get_api_key, get_proxy_config
+from configs.config import API_CONFIG, MODEL_CONFIG, BREAKER_CONFIG, CACHE_CONFIG, HEDGING_CONFIG, PATHS, get_api_key, get_proxy_config
+from .http_session import create_session
+from .rate_limiter import get_rate_limiter
+from .retry_policy import RetryPolicy
+from .streaming import consume_sse
+from .latency import begin_attempt, end_attempt
+from .response_cache import ResponseCache
+from .hedging import HedgingPolicy, call_hedged
+from .circuit_breaker import get_circuit_breaker, is_outage_exception, is_outage_status
 
 logger = logging.getLogger(__name__)
 
@@ -22,19 +33,93 @@ class GrokAPIClient:
         self.timeout = API_CONFIG["timeout"]
         self.max_retries = API_CONFIG["max_retries"]
         self.retry_delay = API_CONFIG["retry_delay"]
+        self.retry_policy = RetryPolicy.from_config(API_CONFIG)
+        
+        # 流式模式：按空闲时间而不是总耗时判断超时
+        self.stream = API_CONFIG.get("stream", False)
+        self.connect_timeout = API_CONFIG.get("connect_timeout", 10)
+        self.stream_idle_timeout = API_CONFIG.get("stream_idle_timeout", 120)
+        
+        # 响应缓存（未启用时为 None）
+        self.cache = ResponseCache.from_config(CACHE_CONFIG, PATHS["response_cache"])
         self.proxies = get_proxy_config()
         
-    def call_api(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        # 持久连接池，多次请求复用同一批连接
+        self.session = create_session(API_CONFIG.get("pool_size", 10), self.proxies)
+        
+        # 进程内共享的RPM/TPM限流器
+        self.rate_limiter = get_rate_limiter(
+            API_CONFIG.get("requests_per_minute"),
+            API_CONFIG.get("tokens_per_minute")
+        )
+        
+        # 进程内共享的熔断器
+        self.breaker = get_circuit_breaker(BREAKER_CONFIG)
+        
+        # 长尾请求对冲（未启用时为 None）
+        self.hedging = None
+        if HEDGING_CONFIG.get("enabled"):
+            self.hedging = HedgingPolicy(
+                percentile=HEDGING_CONFIG["percentile"],
+                min_samples=HEDGING_CONFIG["min_samples"],
+                max_extra_fraction=HEDGING_CONFIG["max_extra_fraction"],
+                max_extra_tokens=HEDGING_CONFIG.get("max_extra_tokens"),
+                # 对冲和落后请求最多占连接池的一半，其余留给主请求
+                max_outstanding=max(1, API_CONFIG.get("pool_size", 10) // 2)
+            )
+            # 主请求和对冲请求都在这里执行，最多同时有 pool_size 对
+            self._hedge_executor = ThreadPoolExecutor(max_workers=API_CONFIG.get("pool_size", 10) * 2)
+    
+    def close(self):
+        """关闭连接池和响应缓存"""
+        if self.hedging:
+            self._hedge_executor.shutdown(wait=False)
+        self.session.close()
+        if self.cache:
+            self.cache.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        
+    async def acall_api(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        """
+        异步调用Grok API
+        
+        在事件循环的线程池中执行 call_api，所有并发请求共享同一个连接池。
+        返回结果与 call_api 相同。
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(self.call_api, prompt, **kwargs))
+        
+    def call_api(self, prompt: str, stream: Optional[bool] = None, **kwargs) -> Dict[str, Any]:
         """
         调用Grok API
         
         Args:
             prompt: 提示文本
+            stream: 是否使用流式（SSE）响应，默认取 API_CONFIG["stream"]
             **kwargs: 额外的模型参数
             
         Returns:
-            API响应结果
+            API响应结果，流式模式下额外包含 stream_metrics（首token时间、分块间隔），
+            发出过对冲请求时额外包含 hedged/hedge_winner，
+            因熔断中止时 requeue 为 True
         """
+        if stream is None:
+            stream = self.stream
+        
+        if not self.hedging:
+            return self._call_api_once(prompt, stream, **kwargs)
+        return call_hedged(
+            self.hedging, self._hedge_executor,
+            functools.partial(self._call_api_once, prompt, stream, **kwargs)
+        )
+    
+    def _call_api_once(self, prompt: str, stream: bool, **kwargs) -> Dict[str, Any]:
+        """单次调用（含缓存和重试），参数同 call_api"""
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
@@ -50,50 +135,171 @@ class GrokAPIClient:
             **model_params
         }
         
-        # 重试逻辑
+        # 先查缓存，命中则不调用API
+        cache_key = None
+        if self.cache:
+            cache_key = ResponseCache.key_for_request(self.base_url, data)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return {
+                    "success": True,
+                    "content": cached['choices'][0]['message']['content'],
+                    "usage": cached.get('usage', {}),
+                    "model": cached.get('model', 'unknown'),
+                    "elapsed_time": 0.0,
+                    "cached": True
+                }
+            if self.cache.replay:
+                return {
+                    "success": False,
+                    "error": "回放模式下缓存未命中",
+                    "error_class": "replay_miss",
+                    "elapsed_time": 0.0
+                }
+        
+        if stream:
+            data["stream"] = True
+            data["stream_options"] = {"include_usage": True}
+            # 读超时作用于每次读取之间的间隔，即空闲超时
+            timeout = (self.connect_timeout, self.stream_idle_timeout)
+        else:
+            timeout = self.timeout
+        
+        # 重试逻辑，每次尝试的延迟分解随返回值带出
+        attempts = []
         for attempt in range(self.max_retries):
+            wait_start = time.perf_counter()
+            self.breaker.wait_until_closed(self._probe_api)
+            reserved_tokens = self.rate_limiter.acquire()
+            waited = time.perf_counter() - wait_start
+            used_tokens = 0
+            retry_after = None
+            timer = begin_attempt()
             try:
                 start_time = time.time()
                 
-                response = requests.post(
+                response = self.session.post(
                     self.base_url,
                     headers=headers,
                     json=data,
-                    timeout=self.timeout,
-                    proxies=self.proxies
+                    timeout=timeout,
+                    stream=stream
                 )
                 
-                elapsed_time = time.time() - start_time
+                if is_outage_status(response.status_code):
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
                 
                 if response.status_code == 200:
-                    result = response.json()
-                    return {
+                    if stream:
+                        result = consume_sse(response, start_time, self.stream_idle_timeout)
+                    else:
+                        result = response.json()
+                    elapsed_time = time.time() - start_time
+                    used_tokens = result.get('usage', {}).get('total_tokens', 0)
+                    api_result = {
                         "success": True,
                         "content": result['choices'][0]['message']['content'],
                         "usage": result.get('usage', {}),
                         "model": result.get('model', 'unknown'),
-                        "elapsed_time": elapsed_time
+                        "elapsed_time": elapsed_time,
+                        "latency_attempts": attempts
                     }
+                    if "stream_metrics" in result:
+                        api_result["stream_metrics"] = result["stream_metrics"]
+                    if self.cache:
+                        self.cache.put(cache_key, {k: v for k, v in result.items() if k != "stream_metrics"})
+                    return api_result
                 else:
                     logger.error(f"API错误 - 状态码: {response.status_code}")
                     
-            except requests.exceptions.Timeout:
+                    if not self.retry_policy.is_retryable_status(response.status_code):
+                        return {
+                            "success": False,
+                            "error": f"不可重试的API错误 - 状态码: {response.status_code}",
+                            "error_class": f"http_{response.status_code}",
+                            "elapsed_time": time.time() - start_time,
+                            "latency_attempts": attempts
+                        }
+                    retry_after = self.retry_policy.parse_retry_after(response.headers)
+                    
+            except requests.exceptions.Timeout as e:
                 logger.error(f"请求超时 (尝试 {attempt+1}/{self.max_retries})")
+                if is_outage_exception(e):
+                    self.breaker.record_failure()
                 
             except Exception as e:
                 logger.error(f"请求失败 (尝试 {attempt+1}/{self.max_retries}): {str(e)}")
+                if is_outage_exception(e):
+                    self.breaker.record_failure()
+                
+                if not self.retry_policy.is_retryable_exception(e):
+                    return {
+                        "success": False,
+                        "error": f"不可重试的错误: {type(e).__name__}",
+                        "error_class": type(e).__name__,
+                        "elapsed_time": time.time() - start_time,
+                        "latency_attempts": attempts
+                    }
+                
+            finally:
+                self.rate_limiter.record_usage(used_tokens, reserved_tokens)
+                attempts.append({"wait": waited, **end_attempt(timer), "retry_wait": 0.0})
+            
+            # 上游已熔断：不再消耗重试次数，由调用方稍后重新提交
+            if self.breaker.is_open:
+                return {
+                    "success": False,
+                    "error": "API熔断",
+                    "error_class": "circuit_open",
+                    "requeue": True,
+                    "elapsed_time": time.time() - start_time,
+                    "latency_attempts": attempts
+                }
             
             if attempt < self.max_retries - 1:
-                wait_time = self.retry_delay * (attempt + 1)
-                logger.info(f"等待 {wait_time} 秒后重试...")
+                wait_time = self.retry_policy.get_delay(attempt, retry_after)
+                logger.info(f"等待 {wait_time:.1f} 秒后重试...")
                 time.sleep(wait_time)
+                attempts[-1]["retry_wait"] = wait_time
         
         return {
             "success": False,
             "error": "所有重试都失败",
-            "elapsed_time": time.time() - start_time
+            "error_class": "retries_exhausted",
+            "elapsed_time": time.time() - start_time,
+            "latency_attempts": attempts
         }
     
+    def _probe_api(self) -> bool:
+        """熔断恢复探测：发送一个极小的请求，上游返回非5xx即视为恢复"""
+        # 探测请求同样占用RPM/TPM预算
+        reserved_tokens = self.rate_limiter.acquire()
+        used_tokens = 0
+        try:
+            response = self.session.post(
+                self.base_url,
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": MODEL_CONFIG["default_model"],
+                    "messages": [{"role": "user", "content": "Reply with just 'OK'"}],
+                    "max_tokens": 10
+                },
+                timeout=(self.connect_timeout, 60)
+            )
+            if response.status_code == 200:
+                try:
+                    used_tokens = response.json().get('usage', {}).get('total_tokens', 0)
+                except ValueError:
+                    pass
+            return not is_outage_status(response.status_code)
+        finally:
+            self.rate_limiter.record_usage(used_tokens, reserved_tokens)
+    
     def extract_answer(self, response: str) -> str:
         """
         从响应中提取答案字母
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+批量提交模式
+把待测题目的请求写成一个JSONL请求文件，整体提交给批处理后端并轮询，
+完成后把输出文件解析成与同步调用相同格式的结果
+
+请求/输出文件采用OpenAI兼容的批处理格式:
+    请求: {"custom_id": "gpqa-12", "method": "POST", "url": "/v1/chat/completions", "body": {...}}
+    输出: {"custom_id": "gpqa-12", "response": {"status_code": 200, "body": {...}}, "error": null}
+"""
+
+from abc import ABC, abstractmethod
+import json
+import time
+import uuid
+import hashlib
+import threading
+import requests
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterator, Optional, Tuple
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+# 批处理的终态
+TERMINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+
+
+def custom_id_for(question_id: int) -> str:
+    """题目ID -> 请求的 custom_id"""
+    return f"gpqa-{question_id}"
+
+
+def question_id_from(custom_id: str) -> int:
+    """custom_id -> 题目ID"""
+    return int(custom_id.rsplit("-", 1)[1])
+
+
+def write_request_file(path, bodies: Dict[int, Dict[str, Any]]) -> int:
+    """
+    写入批量请求文件
+
+    Args:
+        path: 输出路径
+        bodies: 题目ID -> chat completions 请求体
+
+    Returns:
+        写入的请求数
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for question_id, body in bodies.items():
+            line = {"custom_id": custom_id_for(question_id), "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+    return len(bodies)
+
+
+def read_batch_results(path, batch_id: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    解析批处理输出文件
+
+    Yields:
+        (题目ID, 与 call_grok_api 返回值相同格式的结果)
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            question_id = question_id_from(record["custom_id"])
+            response = record.get("response") or {}
+            body = response.get("body") or {}
+
+            if record.get("error") or response.get("status_code") != 200 or not body.get("choices"):
+                error = record.get("error") or f"状态码: {response.get('status_code')}"
+                yield question_id, {
+                    "success": False,
+                    "error": f"批处理请求失败 - {error}",
+                    "error_class": "batch_error",
+                    "elapsed_time": 0.0,
+                    "batch_id": batch_id
+                }
+                continue
+
+            yield question_id, {
+                "success": True,
+                "content": body["choices"][0]["message"]["content"],
+                "usage": body.get("usage", {}),
+                "model": body.get("model", "unknown"),
+                # 批处理没有单题延迟
+                "elapsed_time": 0.0,
+                "batch_id": batch_id
+            }
+
+
+class BatchBackend(ABC):
+    """批处理后端接口，具体服务商的实现继承此类并实现全部抽象方法"""
+
+    name = "base"
+
+    @abstractmethod
+    def submit(self, request_file: Path) -> str:
+        """提交请求文件，返回批次ID"""
+
+    @abstractmethod
+    def poll(self, batch_id: str) -> Dict[str, Any]:
+        """
+        查询批次状态
+
+        Returns:
+            {"status": ..., "completed": 已完成请求数, "total": 请求总数}；
+            status 取 validating/in_progress 或 TERMINAL_STATES 之一
+        """
+
+    @abstractmethod
+    def download(self, batch_id: str, output_file: Path) -> Path:
+        """把已完成批次的输出文件下载到 output_file"""
+
+
+class LocalBatchBackend(BatchBackend):
+    """
+    本地批处理后端，在后台线程池中逐条执行请求文件
+
+    指定 endpoint 时把每条请求转发到该 chat completions 地址（如本地模拟服务器），
+    否则直接生成确定性的合成响应，用于测试和离线演练整个批量流程。
+    """
+
+    name = "local"
+
+    def __init__(self, work_dir, endpoint: Optional[str] = None, api_key: Optional[str] = None,
+                 concurrency: int = 4, connect_timeout: float = 10, rate_limiter=None):
+        """
+        Args:
+            work_dir: 存放批次输出文件的目录
+            endpoint: 转发请求的 chat completions 地址，None 表示生成合成响应
+            api_key: 转发请求时使用的API密钥
+            concurrency: 同时执行的请求数
+            connect_timeout: 转发请求的建连超时（秒），读取不设超时
+            rate_limiter: 转发请求时使用的RPM/TPM限流器（core.rate_limiter.RateLimiter），None 表示不限制
+        """
+        self.work_dir = Path(work_dir)
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self.endpoint = endpoint
+        self.api_key = api_key
+        self.concurrency = concurrency
+        self.connect_timeout = connect_timeout
+        self.rate_limiter = rate_limiter
+        self.batches = {}
+        self.lock = threading.Lock()
+
+    def _output_path(self, batch_id: str) -> Path:
+        return self.work_dir / f"{batch_id}.output.jsonl"
+
+    def submit(self, request_file: Path) -> str:
+        with open(request_file, "r", encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f if line.strip()]
+
+        batch_id = f"local-{uuid.uuid4().hex[:12]}"
+        state = {"status": "in_progress", "completed": 0, "total": len(lines)}
+        with self.lock:
+            self.batches[batch_id] = state
+
+        thread = threading.Thread(target=self._run, args=(batch_id, lines), daemon=True)
+        thread.start()
+        return batch_id
+
+    def _run(self, batch_id: str, lines):
+        """执行一个批次，全部完成后一次性写出输出文件"""
+        def execute(line):
+            output = {"custom_id": line["custom_id"], **self._execute(line["body"])}
+            with self.lock:
+                self.batches[batch_id]["completed"] += 1
+            return output
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                outputs = list(executor.map(execute, lines))
+            tmp_path = self._output_path(batch_id).with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for output in outputs:
+                    f.write(json.dumps(output, ensure_ascii=False) + "\n")
+            tmp_path.replace(self._output_path(batch_id))
+            status = "completed"
+        except Exception:
+            status = "failed"
+
+        with self.lock:
+            self.batches[batch_id]["status"] = status
+
+    def _execute(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """执行单条请求，返回输出行中 response/error 部分"""
+        if self.endpoint is None:
+            return {"response": {"status_code": 200, "body": self._synthetic_response(body)}, "error": None}
+
+        reserved_tokens = self.rate_limiter.acquire() if self.rate_limiter else 0
+        used_tokens = 0
+        try:
+            response = requests.post(
+                self.endpoint,
+                headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
+                json=body,
+                timeout=(self.connect_timeout, None)
+            )
+            response_body = response.json()
+            if response.status_code == 200:
+                used_tokens = response_body.get("usage", {}).get("total_tokens", 0)
+            return {"response": {"status_code": response.status_code, "body": response_body}, "error": None}
+        except Exception as e:
+            return {"response": None, "error": f"{type(e).__name__}: {e}"}
+        finally:
+            if self.rate_limiter:
+                self.rate_limiter.record_usage(used_tokens, reserved_tokens)
+
+    @staticmethod
+    def _synthetic_response(body: Dict[str, Any]) -> Dict[str, Any]:
+        """按提示内容哈希生成固定的答案字母和用量"""
+        prompt = body["messages"][-1]["content"]
+        digest = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+        reasoning_tokens = 500 + digest % 5000
+        return {
+            "model": body.get("model", "unknown"),
+            "choices": [{"message": {"role": "assistant", "content": "ABCD"[digest % 4]}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": len(prompt) // 4,
+                "completion_tokens": reasoning_tokens + 1,
+                "total_tokens": len(prompt) // 4 + reasoning_tokens + 1,
+                "completion_tokens_details": {"reasoning_tokens": reasoning_tokens}
+            }
+        }
+
+    def poll(self, batch_id: str) -> Dict[str, Any]:
+        with self.lock:
+            state = self.batches.get(batch_id)
+            if state is not None:
+                return dict(state)
+        # 本进程之外提交的批次：输出文件存在即视为完成，否则批次已随原进程丢失
+        if self._output_path(batch_id).exists():
+            return {"status": "completed", "completed": None, "total": None}
+        return {"status": "expired", "completed": None, "total": None}
+
+    def download(self, batch_id: str, output_file: Path) -> Path:
+        output_file = Path(output_file)
+        if output_file != self._output_path(batch_id):
+            output_file.write_bytes(self._output_path(batch_id).read_bytes())
+        return output_file
+
+
+# 可用的批处理后端
+BATCH_BACKENDS = {
+    LocalBatchBackend.name: LocalBatchBackend,
+}
+
+
+def wait_for_batch(backend: BatchBackend, batch_id: str, poll_interval: float = 60,
+                   on_progress=None) -> Dict[str, Any]:
+    """
+    轮询直到批次进入终态
+
+    Args:
+        backend: 批处理后端
+        batch_id: 批次ID
+        poll_interval: 轮询间隔（秒）
+        on_progress: 每次轮询后调用 on_progress(state)
+
+    Returns:
+        终态时的状态
+    """
+    while True:
+        state = backend.poll(batch_id)
+        if on_progress:
+            on_progress(state)
+        if state["status"] in TERMINAL_STATES:
+            return state
+        time.sleep(poll_interval)
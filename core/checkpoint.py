@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+检查点存储
+- 完整检查点：临时文件 + fsync + 原子重命名写入，并保留若干历史版本
+- 检查点日志：每完成一题追加一条记录并fsync，崩溃后通过回放日志恢复进度
+"""
+
+import os
+import json
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+
+class CheckpointCorruptError(Exception):
+    """所有版本的检查点都无法读取"""
+
+
+def _generation_path(path: Path, generation: int) -> Path:
+    """第 generation 个历史版本的路径，0 为当前版本"""
+    return path if generation == 0 else path.with_name(f"{path.name}.{generation}")
+
+
+def generation_of(path, source) -> int:
+    """load_latest_valid 实际读取的文件是 path 的第几个历史版本（0 为当前版本）"""
+    path, source = Path(path), Path(source)
+    if source.name == path.name:
+        return 0
+    return int(source.name.rsplit(".", 1)[1])
+
+
+def journal_path_for(checkpoint_file) -> Path:
+    """检查点对应的日志文件路径，如 gpqa_checkpoint.json -> gpqa_checkpoint.journal.jsonl"""
+    checkpoint_path = Path(checkpoint_file)
+    return checkpoint_path.with_name(f"{checkpoint_path.stem}.journal.jsonl")
+
+
+def _fsync_dir(directory: Path):
+    """fsync目录，确保重命名本身已落盘"""
+    try:
+        fd = os.open(str(directory), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write_json(path, data: Dict[str, Any], keep: int = 3):
+    """
+    原子地写入JSON检查点，并轮转历史版本
+
+    先写入同目录下的临时文件并fsync，再依次把 path -> path.1 -> path.2 ...
+    轮转，最后把临时文件重命名为 path。任何时刻被杀掉，磁盘上都至少有一个完整版本。
+
+    Args:
+        path: 检查点路径
+        data: 检查点内容
+        keep: 保留的版本数（含当前版本）
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+
+    # 从最旧的版本开始向后轮转
+    for generation in range(keep - 1, 0, -1):
+        src = _generation_path(path, generation - 1)
+        if src.exists():
+            os.replace(src, _generation_path(path, generation))
+
+    os.replace(tmp_path, path)
+    _fsync_dir(path.parent)
+
+
+def _is_valid_checkpoint(data: Any) -> bool:
+    """检查点结构是否完整"""
+    return (
+        isinstance(data, dict)
+        and isinstance(data.get("completed_questions"), list)
+        and isinstance(data.get("results"), list)
+    )
+
+
+def load_latest_valid(path, keep: int = 3) -> Tuple[Optional[Dict[str, Any]], Optional[Path]]:
+    """
+    从最新版本开始依次尝试读取检查点，返回第一个完整的版本
+
+    Args:
+        path: 检查点路径
+        keep: 保留的版本数
+
+    Returns:
+        (检查点内容, 实际读取的文件)；一个版本都不存在时返回 (None, None)
+
+    Raises:
+        CheckpointCorruptError: 存在检查点文件但全部损坏
+    """
+    path = Path(path)
+    found = []
+    for generation in range(keep):
+        candidate = _generation_path(path, generation)
+        if not candidate.exists():
+            continue
+        found.append(candidate)
+        try:
+            with open(candidate, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if _is_valid_checkpoint(data):
+            return data, candidate
+
+    if found:
+        raise CheckpointCorruptError(f"检查点全部损坏: {', '.join(str(p) for p in found)}")
+    return None, None
+
+
+class CheckpointJournal:
+    """追加写入的JSONL预写日志
+
+    每次写入完整检查点后日志随之轮转（journal -> journal.1 -> ...），与检查点的历史版本一一对应：
+    journal.k 中的记录已压缩进检查点版本 k-1 及更新的版本。
+    回退到检查点版本 g 时，回放日志 0..g 即可恢复之后完成的题目；更旧的日志已包含在该版本中。
+    """
+
+    def __init__(self, path, keep: int = 3):
+        """
+        Args:
+            path: 日志文件路径
+            keep: 保留的日志个数（含当前日志），应与检查点版本数一致
+        """
+        self.path = Path(path)
+        self.keep = keep
+        self.lock = threading.Lock()
+
+    def append(self, record: Dict[str, Any]):
+        """追加一条记录并落盘"""
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def replay(self, generations: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        按时间顺序读取保留日志中的记录
+
+        写入过程中被杀掉时最后一行可能不完整，这样的行会被跳过。
+
+        Args:
+            generations: 只读取最新的若干个日志（从检查点版本 g 恢复时传 g+1），None 表示全部
+        """
+        records = []
+        count = self.keep if generations is None else min(self.keep, generations)
+        with self.lock:
+            for generation in range(count - 1, -1, -1):
+                journal_path = _generation_path(self.path, generation)
+                if not journal_path.exists():
+                    continue
+                with open(journal_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            records.append(json.loads(line))
+                        except json.JSONDecodeError:
+                            continue
+        return records
+
+    def rotate(self):
+        """开始新的日志（在完整检查点写入成功后调用）"""
+        with self.lock:
+            for generation in range(self.keep - 1, 0, -1):
+                src = _generation_path(self.path, generation - 1)
+                if src.exists():
+                    os.replace(src, _generation_path(self.path, generation))
+            _fsync_dir(self.path.parent)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+熔断器
+连续出现连接错误或5xx时熔断，暂停所有API调用，
+之后由一个调用方发送低成本探测请求，探测成功后自动恢复
+"""
+
+import time
+import logging
+import threading
+import requests
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def is_outage_status(status_code: int) -> bool:
+    """5xx 视为上游故障"""
+    return status_code >= 500
+
+
+def is_outage_exception(exc: Exception) -> bool:
+    """连接失败（含建连超时）、连接中断视为上游故障；读超时可能只是推理时间长，不计入"""
+    return isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError))
+
+
+class CircuitBreaker:
+    """进程内共享的熔断器（线程安全）"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30,
+                 max_reset_timeout: float = 600):
+        """
+        Args:
+            failure_threshold: 连续失败多少次后熔断
+            reset_timeout: 熔断后首次探测前的等待时间（秒）
+            max_reset_timeout: 探测失败时等待时间翻倍的上限（秒）
+        """
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.reset_timeout = reset_timeout
+        self.opened_at = 0.0
+        self.tripped_at = 0.0
+        self.trips = 0
+        self.condition = threading.Condition()
+
+    @classmethod
+    def from_config(cls, breaker_config: dict) -> "CircuitBreaker":
+        """从 BREAKER_CONFIG 构造"""
+        return cls(
+            failure_threshold=breaker_config.get("failure_threshold", 5),
+            reset_timeout=breaker_config.get("reset_timeout", 30),
+            max_reset_timeout=breaker_config.get("max_reset_timeout", 600)
+        )
+
+    @property
+    def is_open(self) -> bool:
+        """是否处于熔断（含探测中）状态"""
+        with self.condition:
+            return self.state != CLOSED
+
+    def record_success(self):
+        """记录一次上游可用的响应（含4xx等非故障状态）"""
+        with self.condition:
+            self.consecutive_failures = 0
+
+    def record_failure(self):
+        """记录一次连接错误或5xx，连续失败达到阈值时熔断"""
+        with self.condition:
+            self.consecutive_failures += 1
+            if self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = self.tripped_at = time.monotonic()
+                self.reset_timeout = self.base_reset_timeout
+                self.trips += 1
+                logger.warning(
+                    f"连续 {self.consecutive_failures} 次连接错误/5xx，熔断API调用，"
+                    f"{self.reset_timeout:.0f} 秒后探测"
+                )
+
+    def wait_until_closed(self, probe: Callable[[], bool], stop_event: Optional[threading.Event] = None) -> bool:
+        """
+        熔断期间阻塞调用方，直到上游恢复
+
+        等待期满后由其中一个调用方执行 probe，其余调用方继续等待；
+        探测失败时等待时间翻倍（不超过 max_reset_timeout），探测方也回到等待，
+        只有熔断器关闭后才返回。
+
+        Args:
+            probe: 低成本探测请求，上游可用时返回 True
+            stop_event: 置位后不再等待（至少每秒检查一次），正在进行的探测不会被打断
+
+        Returns:
+            熔断器已关闭时为 True，因 stop_event 放弃等待时为 False
+        """
+        # 有 stop_event 时分段等待，及时响应终止信号
+        poll = None if stop_event is None else 1.0
+        while True:
+            with self.condition:
+                while True:
+                    if self.state == CLOSED:
+                        return True
+                    if stop_event is not None and stop_event.is_set():
+                        return False
+                    if self.state == HALF_OPEN:
+                        # 其他调用方正在探测
+                        self.condition.wait(poll)
+                        continue
+                    remaining = self.opened_at + self.reset_timeout - time.monotonic()
+                    if remaining > 0:
+                        self.condition.wait(remaining if poll is None else min(remaining, poll))
+                        continue
+                    self.state = HALF_OPEN
+                    break
+
+            try:
+                healthy = probe()
+            except Exception as e:
+                logger.warning(f"探测请求异常: {e}")
+                healthy = False
+
+            with self.condition:
+                if healthy:
+                    self.state = CLOSED
+                    self.consecutive_failures = 0
+                    logger.info(f"探测成功，API调用已恢复（熔断 {time.monotonic() - self.tripped_at:.0f} 秒）")
+                else:
+                    self.state = OPEN
+                    self.opened_at = time.monotonic()
+                    self.reset_timeout = min(self.max_reset_timeout, self.reset_timeout * 2)
+                    logger.warning(f"探测失败，{self.reset_timeout:.0f} 秒后再次探测")
+                self.condition.notify_all()
+
+
+_shared_breaker = None
+_shared_lock = threading.Lock()
+
+
+def get_circuit_breaker(breaker_config: dict) -> CircuitBreaker:
+    """
+    获取进程内共享的熔断器
+
+    第一次调用时按给定配置创建，之后所有调用方共用同一个实例，
+    任一调用路径观测到的故障都会暂停全部调用。
+    """
+    global _shared_breaker
+    with _shared_lock:
+        if _shared_breaker is None:
+            _shared_breaker = CircuitBreaker.from_config(breaker_config)
+        return _shared_breaker
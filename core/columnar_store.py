@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+列式结果存储
+把运行结果写成Parquet文件，分析时只读取需要的列；raw_response、题目预览等大文本
+单独写入 .text.parquet，数值分析不会读到它们
+
+每个运行目录（--log-dir）一份，重跑/续跑时覆盖:
+    gpqa_logs/gpqa_results.parquet        题目ID、领域、答案、正确性、耗时、token等
+    gpqa_logs/gpqa_results.text.parquet   题目ID、raw_response、question_preview
+
+依赖 pyarrow（可选），未安装时运行器跳过写入。
+
+用法（把已有的JSON报告转换成列式存储）:
+    python core/columnar_store.py gpqa_logs/gpqa_report_20250101_120000.json
+"""
+
+import os
+import sys
+import json
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+COLUMNAR_FILENAME = "gpqa_results.parquet"
+TEXT_SUFFIX = ".text.parquet"
+
+
+def _schema():
+    return pa.schema([
+        ("run_id", pa.string()),
+        ("question_id", pa.int64()),
+        ("domain", pa.string()),
+        ("subdomain", pa.string()),
+        ("question_length", pa.int64()),
+        ("expected", pa.string()),
+        ("actual", pa.string()),
+        ("correct", pa.bool_()),
+        ("error", pa.string()),
+        ("error_class", pa.string()),
+        ("attempts", pa.int64()),
+        ("api_time", pa.float64()),
+        ("total_time", pa.float64()),
+        ("tokens_used", pa.int64()),
+        ("reasoning_tokens", pa.int64()),
+        ("model", pa.string()),
+        ("cached", pa.bool_()),
+        ("hedge_winner", pa.string()),
+        ("batch_id", pa.string()),
+        ("ttfb", pa.float64()),
+    ])
+
+
+def _text_schema():
+    return pa.schema([
+        ("run_id", pa.string()),
+        ("question_id", pa.int64()),
+        ("question_preview", pa.string()),
+        ("raw_response", pa.string()),
+    ])
+
+
+def is_available() -> bool:
+    """是否已安装 pyarrow"""
+    return pa is not None
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("列式存储需要 pyarrow: pip install pyarrow")
+
+
+def text_path_for(path) -> Path:
+    """数值文件对应的大文本文件"""
+    path = Path(path)
+    return path.with_name(path.name[:-len(".parquet")] + TEXT_SUFFIX)
+
+
+def _column_value(result: Dict[str, Any], name: str):
+    if name == "ttfb":
+        return result.get("latency", {}).get("summary", {}).get("ttfb")
+    if name == "correct":
+        return bool(result.get("correct", False))
+    if name == "cached":
+        return bool(result.get("cached", False))
+    return result.get(name)
+
+
+def _write_table(table, path: Path):
+    """先写临时文件再替换，读取方不会看到写了一半的文件"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    pq.write_table(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+
+
+def write_results(results: List[Dict[str, Any]], path, run_id: str) -> Path:
+    """
+    写入一次运行的全部结果
+
+    Args:
+        results: ResumableGPQATestRunner.build_result 格式的结果列表
+        path: 数值文件路径，大文本写入同目录的 .text.parquet
+        run_id: 运行标识（时间戳），多次运行合并分析时区分来源
+
+    Returns:
+        数值文件路径
+    """
+    _require_pyarrow()
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    schema = _schema()
+    columns = {name: [] for name in schema.names}
+    text_columns = {name: [] for name in _text_schema().names}
+    for result in results:
+        for name in schema.names:
+            columns[name].append(run_id if name == "run_id" else _column_value(result, name))
+        text_columns["run_id"].append(run_id)
+        text_columns["question_id"].append(result["question_id"])
+        text_columns["question_preview"].append(result.get("question_preview"))
+        text_columns["raw_response"].append(result.get("raw_response"))
+
+    _write_table(pa.Table.from_pydict(columns, schema=schema), path)
+    _write_table(pa.Table.from_pydict(text_columns, schema=_text_schema()), text_path_for(path))
+    return path
+
+
+def find_result_files(path) -> List[Path]:
+    """单个文件原样返回；目录则递归查找其中所有运行的数值文件"""
+    path = Path(path)
+    if path.is_file():
+        return [path]
+    return sorted(p for p in path.rglob("*.parquet") if not p.name.endswith(TEXT_SUFFIX))
+
+
+def read_columns(path, columns: Iterable[str]) -> Dict[str, list]:
+    """
+    只读取指定列，多个文件（多次运行）按行拼接
+
+    Args:
+        path: 数值文件或包含多次运行的目录
+        columns: 需要的列名
+
+    Returns:
+        列名 -> 值列表
+    """
+    _require_pyarrow()
+    columns = list(columns)
+    files = find_result_files(path)
+    if not files:
+        return {name: [] for name in columns}
+    tables = [pq.read_table(f, columns=columns) for f in files]
+    return pa.concat_tables(tables).to_pydict()
+
+
+def read_text(path, question_ids: Optional[Iterable[int]] = None) -> Dict[str, list]:
+    """读取大文本列（raw_response、question_preview），可只取部分题目"""
+    _require_pyarrow()
+    filters = [("question_id", "in", list(question_ids))] if question_ids is not None else None
+    tables = [pq.read_table(text_path_for(f), filters=filters) for f in find_result_files(path)]
+    if not tables:
+        return {name: [] for name in _text_schema().names}
+    return pa.concat_tables(tables).to_pydict()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="把JSON报告转换成列式结果存储")
+    parser.add_argument("reports", nargs="+", help="gpqa_report_*.json 报告文件")
+    parser.add_argument("--output-dir", default=None, help="输出目录（默认与报告同目录，每个报告一个子目录）")
+    args = parser.parse_args()
+
+    if not is_available():
+        print("需要安装 pyarrow: pip install pyarrow")
+        sys.exit(1)
+
+    for report_file in map(Path, args.reports):
+        with open(report_file, "r", encoding="utf-8") as f:
+            report = json.load(f)
+        run_id = report.get("test_info", {}).get("timestamp") or report_file.stem
+        output_dir = Path(args.output_dir) if args.output_dir else report_file.parent
+        path = write_results(report["detailed_results"], output_dir / run_id / COLUMNAR_FILENAME, run_id)
+        print(f"{report_file} -> {path} ({len(report['detailed_results'])} 题)")
+
+
+if __name__ == "__main__":
+    main()
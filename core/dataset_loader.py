@@ -4,11 +4,12 @@ GPQA数据集加载器
 处理数据集的加载和格式化
 """
 
-import random
 import logging
 from typing import Dict, List, Tuple
 from datasets import load_dataset
-from ..configs.config import DATASET_CONFIG
+from ..configs.config import DATASET_CONFIG, PATHS
+from .question_format import build_question
+from .question_store import QuestionStore
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +20,14 @@ class GPQADatasetLoader:
     def __init__(self):
         self.dataset = None
         self.dataset_config = DATASET_CONFIG
+        self.store = None
+    
+    def open_store(self) -> bool:
+        """打开预处理生成的题目存储，不存在时返回 False"""
+        if self.store is None and PATHS["question_store"].exists():
+            self.store = QuestionStore(PATHS["question_store"])
+            logger.info(f"使用题目存储: {PATHS['question_store']} ({len(self.store)} 题)")
+        return self.store is not None
         
     def load_dataset(self):
         """加载GPQA数据集"""
@@ -57,40 +66,8 @@ class GPQADatasetLoader:
         Returns:
             (格式化的题目, 正确答案字母)
         """
-        question = item.get("Question", "")
-        
-        # 获取答案
-        correct_answer = item.get("Correct Answer", "")
-        incorrect_answers = [
-            item.get("Incorrect Answer 1", ""),
-            item.get("Incorrect Answer 2", ""),
-            item.get("Incorrect Answer 3", "")
-        ]
-        
-        # 创建答案列表
-        all_answers = [(correct_answer, True)]
-        all_answers.extend([(ans, False) for ans in incorrect_answers if ans])
-        
-        # 使用确定性随机打乱顺序
-        random.seed(question_id)
-        random.shuffle(all_answers)
-        
-        # 构建选项并记录正确答案
-        options = []
-        correct_letter = None
-        
-        for i, (answer, is_correct) in enumerate(all_answers):
-            letter = chr(65 + i)  # A, B, C, D
-            options.append(f"{letter}. {answer}")
-            if is_correct:
-                correct_letter = letter
-        
-        # 格式化题目
-        formatted = f"{question}\n\n"
-        formatted += "\n".join(options)
-        formatted += "\n\n请只回答字母 (A, B, C 或 D)。"
-        
-        return formatted, correct_letter
+        question = build_question(item, question_id)
+        return question["prompt"], question["correct_answer"]
     
     def get_question(self, question_id: int) -> Dict:
         """
@@ -110,8 +87,26 @@ class GPQADatasetLoader:
         
         return self.dataset[question_id]
     
+    def get_processed_question(self, question_id: int) -> Dict:
+        """
+        获取指定ID的已格式化题目（提示、正确答案字母等）
+        
+        有题目存储时O(1)读取单条记录，否则从原始数据集现场格式化。
+        
+        Args:
+            question_id: 题目ID
+            
+        Returns:
+            见 core.question_format.build_question
+        """
+        if self.open_store():
+            return self.store.get_question(question_id)
+        return build_question(self.get_question(question_id), question_id)
+    
     def get_total_questions(self) -> int:
         """获取题目总数"""
+        if self.open_store():
+            return len(self.store)
         if not self.dataset:
             self.load_dataset()
         return len(self.dataset)
\ No newline at end of file
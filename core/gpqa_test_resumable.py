@@ -4,29 +4,137 @@ GPQA测试系统 - 支持断点续传版本
 """
 
 import os
+import sys
 import json
 import time
 import datetime
 from pathlib import Path
 from dotenv import load_dotenv
-from datasets import load_dataset
 import requests
-import random
+import signal
 import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from typing import Dict, List, Any, Set
 
+# 添加父目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from configs.config import API_CONFIG, BREAKER_CONFIG, CACHE_CONFIG, HEDGING_CONFIG, MONITOR_CONFIG, TIMEOUT_CONFIG, PATHS
+from core.http_session import create_session
+from core.rate_limiter import get_rate_limiter
+from core.retry_policy import RetryPolicy
+from core.streaming import consume_sse
+from core.response_cache import ResponseCache
+from core.hedging import HedgingPolicy, call_hedged
+from core.timeout_policy import TimeoutPolicy
+from core.circuit_breaker import get_circuit_breaker, is_outage_exception, is_outage_status
+from core.latency import begin_attempt, end_attempt, latency_percentiles, summarize_attempts
+from core.metrics import RunMetrics, start_metrics_server
+from core.progress_events import ProgressEventWriter, events_path_for
+from core.heartbeat import HeartbeatEmitter
+from core import columnar_store
+from core.batch_mode import BATCH_BACKENDS, BatchBackend, read_batch_results, wait_for_batch, write_request_file
+from core.checkpoint import CheckpointJournal, atomic_write_json, generation_of, load_latest_valid, journal_path_for
+from core.question_format import load_questions
+
 # 加载环境变量
 load_dotenv()
 
+# 可以在同一次运行中重新分发的失败类型；不可重试的状态码/异常、回放未命中重跑也不会成功
+REDISPATCH_ERROR_CLASSES = {"retries_exhausted", "batch_error"}
+
+
+def build_report(results: List[Dict[str, Any]], stats: Dict[str, Any], timestamp: str,
+                 dataset_hash: str = None, pending: Set[int] = None) -> Dict[str, Any]:
+    """
+    根据结果和统计生成完整报告（单次运行和分片合并共用）
+
+    pending 为尚未最终完成的题目ID（仍有重试预算的失败题目、被中断的在途题目），
+    不计入结果，单独列出
+    """
+    pending = sorted(pending or ())
+    correct_count = sum(1 for r in results if r.get("correct", False))
+    failed_count = sum(1 for r in results if "error" in r)
+    total_count = len(results)
+    accuracy = correct_count / total_count if total_count > 0 else 0
+    
+    return {
+        "test_info": {
+            "timestamp": timestamp,
+            "model": "grok-4",
+            "dataset": "gpqa_main",
+            "dataset_hash": dataset_hash,
+            "total_questions": total_count,
+            "correct": correct_count,
+            "failed": failed_count,
+            "pending": len(pending),
+            "pending_questions": pending,
+            "accuracy": accuracy
+        },
+        "statistics": {
+            **stats,
+            "average_time_per_question": sum(r.get("total_time", 0) for r in results) / total_count if total_count > 0 else 0,
+            "average_tokens_per_question": stats.get("tokens_used", 0) / total_count if total_count > 0 else 0,
+            "latency_breakdown": latency_percentiles(results)
+        },
+        "detailed_results": results
+    }
+
 class ResumableGPQATestRunner:
     """支持断点续传的GPQA测试运行器"""
     
-    def __init__(self, checkpoint_file: str = "gpqa_checkpoint.json", log_dir: str = "gpqa_logs"):
-        """初始化测试运行器"""
+    def __init__(self, checkpoint_file: str = "gpqa_checkpoint.json", log_dir: str = "gpqa_logs",
+                 max_workers: int = 1, compact_interval: int = 50, keep_checkpoints: int = 3,
+                 processed_data: str = None, question_store: str = None, requeue_budget: int = None,
+                 metrics_port: int = None, drain_timeout: float = None,
+                 requests_per_minute: float = None, tokens_per_minute: float = None):
+        """初始化测试运行器
+        
+        Args:
+            checkpoint_file: 检查点文件路径
+            log_dir: 日志目录
+            max_workers: 同时在途的题目数量（1 即串行）
+            compact_interval: 每完成多少题把日志压缩进完整检查点
+            keep_checkpoints: 保留的完整检查点版本数（含当前版本）
+            processed_data: 预处理数据路径，默认 PATHS["processed_data"]
+            question_store: 内存映射题目存储路径，默认 PATHS["question_store"]
+            requeue_budget: 失败题目在同一次运行中最多重新分发的次数，默认 API_CONFIG["requeue_budget"]
+            metrics_port: 指标服务端口（/metrics、/metrics.json），None 表示不启动
+            drain_timeout: 收到终止信号后等待在途题目完成的最长时间（秒），默认 API_CONFIG["drain_timeout"]
+            requests_per_minute: 本进程的RPM预算，默认 API_CONFIG["requests_per_minute"]（分片运行时由协调器按密钥分摊）
+            tokens_per_minute: 本进程的TPM预算，默认 API_CONFIG["tokens_per_minute"]
+        """
         self.log_dir = Path(log_dir)
-        self.log_dir.mkdir(exist_ok=True)
+        self.log_dir.mkdir(parents=True, exist_ok=True)
         
         self.checkpoint_file = checkpoint_file
+        self.max_workers = max(1, max_workers)
+        self.compact_interval = max(1, compact_interval)
+        self.keep_checkpoints = max(1, keep_checkpoints)
+        self.processed_data = Path(processed_data) if processed_data else PATHS["processed_data"]
+        self.question_store = Path(question_store) if question_store else PATHS["question_store"]
+        self.dataset_hash = None
+        self.requeue_budget = API_CONFIG.get("requeue_budget", 2) if requeue_budget is None else requeue_budget
+        
+        # 每完成一题追加一条的预写日志，两次完整检查点之间的结果不会丢失
+        self.journal = CheckpointJournal(journal_path_for(checkpoint_file), keep=self.keep_checkpoints)
+        
+        # 进度事件流，监控器按偏移增量读取（monitors/monitor_continuous.py --follow）
+        self.events = ProgressEventWriter(events_path_for(self.log_dir))
+        
+        # 并发模式下保护 stats / results / completed_questions 的锁
+        self.lock = threading.RLock()
+        
+        # 收到终止信号后置位：停止分发新题目，在途题目在排空截止时间前完成的照常记录，
+        # 其余记为待处理，然后保存检查点退出
+        self.stop_event = threading.Event()
+        self.stop_signal = None
+        self.drain_timeout = API_CONFIG.get("drain_timeout", 60) if drain_timeout is None else drain_timeout
+        self.drain_deadline = None
+        self.abandoned_in_flight = 0
+        
         self.timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         
         # 设置日志
@@ -37,7 +145,53 @@ class ResumableGPQATestRunner:
         if not self.api_key:
             raise ValueError("未设置 XAI_API_KEY")
         
-        # 加载检查点
+        # 代理设置
+        proxies = {}
+        if os.environ.get('https_proxy'):
+            proxies = {
+                'http': os.environ.get('http_proxy', ''),
+                'https': os.environ.get('https_proxy', '')
+            }
+        
+        # 长尾请求对冲：耗时超过本次运行p95的请求再发一份，先返回的获胜（未启用时为 None）
+        self.hedging = None
+        if HEDGING_CONFIG.get("enabled"):
+            self.hedging = HedgingPolicy(
+                percentile=HEDGING_CONFIG["percentile"],
+                min_samples=HEDGING_CONFIG["min_samples"],
+                max_extra_fraction=HEDGING_CONFIG["max_extra_fraction"],
+                max_extra_tokens=HEDGING_CONFIG.get("max_extra_tokens"),
+                # 主请求最多占 max_workers 个连接，对冲和落后请求只用剩下的，连接池不会被占满而阻塞
+                max_outstanding=self.max_workers
+            )
+            self.hedge_executor = ThreadPoolExecutor(max_workers=self.max_workers * 2)
+        
+        # 所有工作线程共享的连接池（对冲时每题最多占两个连接）
+        pool_size = self.max_workers * 2 if self.hedging else self.max_workers
+        self.session = create_session(pool_size=pool_size, proxies=proxies)
+        
+        # 所有工作线程共享的RPM/TPM限流器
+        self.rate_limiter = get_rate_limiter(
+            API_CONFIG.get("requests_per_minute") if requests_per_minute is None else requests_per_minute,
+            API_CONFIG.get("tokens_per_minute") if tokens_per_minute is None else tokens_per_minute
+        )
+        
+        # 重试策略：区分可重试错误，指数退避+抖动
+        self.retry_policy = RetryPolicy.from_config(API_CONFIG)
+        
+        # 熔断器：上游故障时暂停所有调用，探测恢复后继续，在途题目重新排队而不是记为失败
+        self.breaker = get_circuit_breaker(BREAKER_CONFIG)
+        
+        # 流式模式：卡死的连接在空闲超时后即可重试，不必等满总超时
+        self.stream = API_CONFIG.get("stream", False)
+        
+        # 响应缓存：重跑或只更换答案提取逻辑时不再重复付费（未启用时为 None）
+        self.cache = ResponseCache.from_config(CACHE_CONFIG, PATHS["response_cache"])
+        if self.cache:
+            self.logger.info(f"响应缓存已启用: {PATHS['response_cache']}{' (回放模式)' if self.cache.replay else ''}")
+        
+        # 加载检查点（checkpoint_generation 为实际读取的历史版本，没有检查点时为 None）
+        self.checkpoint_generation = None
         self.checkpoint = self.load_checkpoint()
         
         # 统计信息
@@ -53,37 +207,228 @@ class ResumableGPQATestRunner:
         # 已完成的题目ID集合
         self.completed_questions = set(self.checkpoint.get("completed_questions", []))
         
-        # 结果列表
+        # 结果列表（只含已最终完成的题目，失败题目在重试预算用完后才计入）
         self.results = self.checkpoint.get("results", [])
         
+        # 仍有重试预算的失败题目: 题目ID -> {error_class, error, attempts, last_attempt}
+        self.failed_questions = {
+            int(qid): info for qid, info in self.checkpoint.get("failed_questions", {}).items()
+        }
+        
+        # 上次因终止信号放弃的在途题目（未完成），本次优先分发
+        self.interrupted_questions = set(self.checkpoint.get("interrupted_questions", []))
+        
         self.logger.info(f"已加载检查点，已完成 {len(self.completed_questions)} 题")
+        
+        # 回放上次完整检查点之后的日志
+        self.replay_journal()
+        self.reopen_legacy_failures()
+        
+        # 自适应超时：用已完成题目的耗时作为初始样本（未启用时为 None）
+        self.timeout_policy = None
+        if TIMEOUT_CONFIG.get("adaptive"):
+            self.timeout_policy = TimeoutPolicy.from_config(API_CONFIG, TIMEOUT_CONFIG)
+            for result in self.results:
+                self.timeout_policy.observe(result)
+        
+        # 运行指标：抓取时直接读取以下计数，不扫描结果列表
+        self.failed_count = sum(1 for r in self.results if "error" in r)
+        self.correct_count = sum(1 for r in self.results if r.get("correct"))
+        self.target_count = 0
+        self.queued_count = 0
+        self.in_flight_count = 0
+        self.metrics = RunMetrics(self.collect_metrics)
+        self.metrics_server = None
+        if metrics_port is not None:
+            self.metrics_server = start_metrics_server(self.metrics, metrics_port, MONITOR_CONFIG["metrics_host"])
+            host, port = self.metrics_server.server_address[:2]
+            self.logger.info(f"指标服务: http://{host}:{port}/metrics (JSON: /metrics.json)")
+    
+    def replay_journal(self):
+        """
+        把日志中检查点之后完成的题目恢复到内存
+        
+        只回放未压缩进所读检查点版本的日志：更旧日志中的记录（含失败记录及其统计）
+        已包含在检查点中，回放会用旧统计覆盖检查点中更新的统计
+        """
+        replayed = 0
+        generations = None if self.checkpoint_generation is None else self.checkpoint_generation + 1
+        for record in self.journal.replay(generations):
+            question_id = record["question_id"]
+            if question_id in self.completed_questions:
+                # 检查点写入成功但日志尚未清空时崩溃，记录已在检查点中
+                continue
+            self.stats = record.get("stats", self.stats)
+            if "failure" in record:
+                self.failed_questions[question_id] = record["failure"]
+                continue
+            self.results.append(record["result"])
+            self.completed_questions.add(question_id)
+            self.failed_questions.pop(question_id, None)
+            replayed += 1
+        
+        if replayed:
+            self.logger.info(f"已从日志回放 {replayed} 题，共完成 {len(self.completed_questions)} 题")
+    
+    def reopen_legacy_failures(self):
+        """
+        旧版检查点把重试耗尽的失败题目也记为已完成，resume 时永远不会重跑；
+        把这类没有 attempts 记录的失败结果移回失败列表，按重试预算重新分发
+        """
+        reopened = [r for r in self.results if r.get("error") == "所有重试都失败" and "attempts" not in r]
+        if not reopened:
+            return
+        
+        for result in reopened:
+            question_id = result["question_id"]
+            self.completed_questions.discard(question_id)
+            self.failed_questions[question_id] = {
+                "error_class": "retries_exhausted",
+                "error": result["error"],
+                "attempts": 1,
+                "last_attempt": None
+            }
+        reopened_ids = {r["question_id"] for r in reopened}
+        self.results = [r for r in self.results if r["question_id"] not in reopened_ids]
+        self.logger.info(f"检查点中有 {len(reopened)} 道失败题目未记录尝试次数，将重新分发")
     
     def load_checkpoint(self) -> Dict:
-        """加载检查点数据"""
-        if os.path.exists(self.checkpoint_file):
-            try:
-                with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                self.logger.warning(f"加载检查点失败: {e}")
-        return {}
+        """加载检查点数据，当前版本损坏时回退到最新的完整历史版本"""
+        data, source = load_latest_valid(self.checkpoint_file, self.keep_checkpoints)
+        if data is None:
+            return {}
+        self.checkpoint_generation = generation_of(self.checkpoint_file, source)
+        if str(source) != str(self.checkpoint_file):
+            self.logger.warning(f"当前检查点不可用，已回退到历史版本: {source}")
+        return data
     
     def save_checkpoint(self):
         """保存检查点数据"""
-        checkpoint_data = {
-            "timestamp": self.timestamp,
-            "completed_questions": list(self.completed_questions),
-            "results": self.results,
-            "stats": self.stats,
-            "last_saved": datetime.datetime.now().isoformat()
+        with self.lock:
+            checkpoint_data = {
+                "timestamp": self.timestamp,
+                "completed_questions": list(self.completed_questions),
+                "results": list(self.results),
+                "stats": dict(self.stats),
+                "failed_questions": {str(qid): info for qid, info in self.failed_questions.items()},
+                "interrupted_questions": sorted(self.interrupted_questions),
+                "dataset_hash": self.dataset_hash,
+                "last_saved": datetime.datetime.now().isoformat()
+            }
+            
+            try:
+                atomic_write_json(self.checkpoint_file, checkpoint_data, keep=self.keep_checkpoints)
+                # 日志中的记录已全部包含在检查点中，随检查点版本一起轮转
+                self.journal.rotate()
+                self.events.emit("checkpoint", completed=len(self.completed_questions))
+                self.logger.info(f"检查点已保存，已完成 {len(self.completed_questions)} 题")
+            except Exception as e:
+                self.logger.error(f"保存检查点失败: {e}")
+    
+    def record_result(self, question_id: int, result: Dict[str, Any]) -> bool:
+        """
+        记录一道题目的处理结果，并立即追加到日志
+        
+        可重新分发的失败在重试预算内只记入 failed_questions，不计入结果。
+        
+        Returns:
+            该题是否已最终完成；False 表示应重新分发
+        """
+        with self.lock:
+            failure = self.failed_questions.get(question_id, {})
+            attempts = failure.get("attempts", 0) + 1
+            
+            if "error" in result:
+                if (result.get("error_class") in REDISPATCH_ERROR_CLASSES
+                        and attempts <= self.requeue_budget):
+                    failure = {
+                        "error_class": result["error_class"],
+                        "error": result["error"],
+                        "attempts": attempts,
+                        "last_attempt": datetime.datetime.now().isoformat()
+                    }
+                    self.failed_questions[question_id] = failure
+                    self.journal.append({
+                        "question_id": question_id,
+                        "failure": failure,
+                        "stats": dict(self.stats)
+                    })
+                    self.events.emit("failure", question_id=question_id,
+                                     error_class=failure["error_class"], attempts=attempts)
+                    return False
+                result["attempts"] = attempts
+            
+            self.failed_questions.pop(question_id, None)
+            self.interrupted_questions.discard(question_id)
+            self.results.append(result)
+            self.completed_questions.add(question_id)
+            if "error" in result:
+                self.failed_count += 1
+            elif result.get("correct"):
+                self.correct_count += 1
+            self.metrics.observe_result(result)
+            if self.timeout_policy:
+                self.timeout_policy.observe(result)
+            self.journal.append({
+                "question_id": question_id,
+                "result": result,
+                "stats": dict(self.stats)
+            })
+            self.events.emit("result", question_id=question_id, correct=result.get("correct", False),
+                             error_class=result.get("error_class"), total_time=result.get("total_time"),
+                             tokens=result.get("tokens_used", 0))
+            return True
+    
+    def collect_metrics(self) -> Dict[str, Dict[str, float]]:
+        """指标服务每次抓取时调用：累计统计项作为计数器，队列状态作为状态量"""
+        with self.lock:
+            # stats["total_time"] 从未累加，不作为计数器导出
+            counters = {key: value for key, value in self.stats.items()
+                        if key != "total_time" and isinstance(value, (int, float))}
+            counters.update({
+                "questions_completed": len(self.completed_questions) - self.failed_count,
+                "questions_failed": self.failed_count,
+                "questions_correct": self.correct_count,
+            })
+            gauges = {
+                "questions_target": self.target_count,
+                "questions_queued": self.queued_count,
+                "questions_in_flight": self.in_flight_count,
+                "questions_awaiting_redispatch": len(self.failed_questions),
+                "circuit_open": int(self.breaker.is_open),
+            }
+        return {"counters": counters, "gauges": gauges}
+    
+    def heartbeat_status(self) -> Dict[str, Any]:
+        """心跳内容（monitors/supervisor.py 据此判断卡死和停滞）"""
+        return {
+            "completed": len(self.completed_questions),
+            "in_flight": self.in_flight_count,
+            "circuit_open": self.breaker.is_open,
+            "stopping": self.stop_event.is_set()
         }
+    
+    def request_stop(self, signum, frame=None):
+        """
+        终止信号处理：停止分发新题目，run_test 在排空截止时间前等待在途题目，然后保存检查点
         
-        try:
-            with open(self.checkpoint_file, 'w', encoding='utf-8') as f:
-                json.dump(checkpoint_data, f, indent=2, ensure_ascii=False)
-            self.logger.info(f"检查点已保存，已完成 {len(self.completed_questions)} 题")
-        except Exception as e:
-            self.logger.error(f"保存检查点失败: {e}")
+        再次收到信号时不再等待，在途题目直接记为待处理。
+        """
+        if self.stop_event.is_set():
+            self.drain_deadline = time.monotonic()
+            self.logger.warning(f"再次收到信号 {signal.Signals(signum).name}，放弃在途题目，立即保存检查点")
+            return
+        self.stop_signal = signum
+        self.drain_deadline = time.monotonic() + self.drain_timeout
+        self.stop_event.set()
+        self.logger.warning(f"收到信号 {signal.Signals(signum).name}，停止分发新题目，"
+                            f"最多等待 {self.drain_timeout:.0f} 秒让 {self.in_flight_count} 道在途题目完成"
+                            f"（再次发送信号立即退出）")
+    
+    def _incr_stat(self, key: str, value: int = 1):
+        """线程安全地累加统计项"""
+        with self.lock:
+            self.stats[key] = self.stats.get(key, 0) + value
     
     def setup_logging(self):
         """设置日志系统"""
@@ -101,57 +446,145 @@ class ResumableGPQATestRunner:
         self.logger = logging.getLogger(__name__)
         self.logger.info(f"GPQA测试系统启动 - 时间戳: {self.timestamp}")
     
-    def call_grok_api(self, prompt: str, question_id: int) -> Dict[str, Any]:
-        """调用Grok API并记录详细信息"""
-        url = "https://api.x.ai/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+    def call_grok_api(self, prompt: str, question_id: int, timeout: float = None,
+                      max_retries: int = None) -> Dict[str, Any]:
+        """调用Grok API并记录详细信息，启用对冲时长尾请求会发出第二份
         
-        data = {
+        Args:
+            prompt: 提示文本
+            question_id: 题目ID（用于日志）
+            timeout: 单次请求超时（秒），默认 API_CONFIG["timeout"]
+            max_retries: 最多尝试次数，默认取重试策略配置
+        """
+        if not self.hedging:
+            return self._call_grok_api_once(prompt, question_id, timeout, max_retries)
+        
+        result = call_hedged(
+            self.hedging, self.hedge_executor,
+            lambda: self._call_grok_api_once(prompt, question_id, timeout, max_retries),
+            label=f"[问题{question_id}] "
+        )
+        if result.get("hedged"):
+            self._incr_stat("hedged_requests")
+            if result.get("hedge_winner") == "hedge":
+                self._incr_stat("hedge_wins")
+        return result
+    
+    def build_request_body(self, prompt: str) -> Dict[str, Any]:
+        """chat completions 请求体（同步调用和批量模式共用）"""
+        return {
             "model": "grok-4",
             "messages": [{"role": "user", "content": prompt}],
             "temperature": 0,
             "max_tokens": 100000
         }
+    
+    def _call_grok_api_once(self, prompt: str, question_id: int, timeout: float = None,
+                            max_retries: int = None) -> Dict[str, Any]:
+        """单次调用（含缓存和重试），参数同 call_grok_api"""
+        url = API_CONFIG["base_url"]
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
         
-        # 代理设置
-        proxies = {}
-        if os.environ.get('https_proxy'):
-            proxies = {
-                'http': os.environ.get('http_proxy', ''),
-                'https': os.environ.get('https_proxy', '')
-            }
+        data = self.build_request_body(prompt)
+        
+        # 先查缓存，命中则不调用API
+        cache_key = None
+        if self.cache:
+            cache_key = ResponseCache.key_for_request(url, data)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self._incr_stat("cache_hits")
+                self.logger.info(f"[问题{question_id}] 命中响应缓存")
+                return {
+                    "success": True,
+                    "content": cached['choices'][0]['message']['content'],
+                    "elapsed_time": 0.0,
+                    "usage": cached.get('usage', {}),
+                    "model": cached.get('model', 'unknown'),
+                    "cached": True
+                }
+            if self.cache.replay:
+                self.logger.error(f"[问题{question_id}] 回放模式下缓存未命中")
+                return {
+                    "success": False,
+                    "error": "回放模式下缓存未命中",
+                    "error_class": "replay_miss",
+                    "elapsed_time": 0.0
+                }
+        
+        if self.stream:
+            data["stream"] = True
+            data["stream_options"] = {"include_usage": True}
+            timeout = (API_CONFIG.get("connect_timeout", 10), API_CONFIG.get("stream_idle_timeout", 120))
+        else:
+            # 建连失败很快暴露，读超时按本题的截止时间设置
+            timeout = (API_CONFIG.get("connect_timeout", 10), timeout or API_CONFIG["timeout"])
         
         # 记录请求开始
         start_time = time.time()
         self.logger.info(f"[问题{question_id}] 开始API调用")
         
-        max_retries = 3
+        max_retries = max_retries or self.retry_policy.max_retries
+        # 每次尝试的延迟分解，随返回值带出（最后一次尝试在 finally 中追加）
+        attempts = []
         for attempt in range(max_retries):
+            if attempt > 0:
+                self._incr_stat("retries")
+            wait_start = time.perf_counter()
+            # 熔断期间在此等待，恢复后再发请求；等待中收到终止信号则交回调度器，记为待处理
+            if not self.breaker.wait_until_closed(self._probe_api, self.stop_event):
+                self.logger.warning(f"[问题{question_id}] 熔断等待期间收到终止信号，放弃本题")
+                return {
+                    "success": False,
+                    "error": "熔断等待期间运行中断",
+                    "error_class": "interrupted",
+                    "requeue": True,
+                    "elapsed_time": time.time() - start_time,
+                    "latency_attempts": attempts
+                }
+            
+            # 按RPM/TPM预算排队，预扣的token在请求结束后按实际用量结算
+            reserved_tokens = self.rate_limiter.acquire()
+            waited = time.perf_counter() - wait_start
+            used_tokens = 0
+            retry_after = None
+            timed_out = False
+            timer = begin_attempt()
             try:
-                response = requests.post(
+                attempt_start = time.time()
+                response = self.session.post(
                     url, 
                     headers=headers, 
                     json=data, 
-                    timeout=900,  # 增加到15分钟，接近API服务端限制
-                    proxies=proxies
+                    timeout=timeout,
+                    stream=self.stream
                 )
                 
-                elapsed_time = time.time() - start_time
-                self.stats["api_calls"] += 1
+                self._incr_stat("api_calls")
+                
+                if is_outage_status(response.status_code):
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
                 
                 if response.status_code == 200:
-                    result = response.json()
+                    if self.stream:
+                        result = consume_sse(response, attempt_start, API_CONFIG.get("stream_idle_timeout", 120))
+                    else:
+                        result = response.json()
+                    elapsed_time = time.time() - start_time
                     
                     # 记录token使用情况
                     usage = result.get('usage', {})
-                    self.stats["tokens_used"] += usage.get('total_tokens', 0)
+                    used_tokens = usage.get('total_tokens', 0)
+                    self._incr_stat("tokens_used", used_tokens)
                     
                     # 记录推理token
                     completion_details = usage.get('completion_tokens_details', {})
-                    self.stats["reasoning_tokens"] += completion_details.get('reasoning_tokens', 0)
+                    self._incr_stat("reasoning_tokens", completion_details.get('reasoning_tokens', 0))
                     
                     self.logger.info(
                         f"[问题{question_id}] API调用成功 - "
@@ -160,52 +593,142 @@ class ResumableGPQATestRunner:
                         f"推理token: {completion_details.get('reasoning_tokens', 0)}"
                     )
                     
-                    return {
+                    api_result = {
                         "success": True,
                         "content": result['choices'][0]['message']['content'],
                         "elapsed_time": elapsed_time,
                         "usage": usage,
-                        "model": result.get('model', 'unknown')
+                        "model": result.get('model', 'unknown'),
+                        "latency_attempts": attempts
                     }
+                    if "stream_metrics" in result:
+                        api_result["stream_metrics"] = result["stream_metrics"]
+                        self.logger.info(
+                            f"[问题{question_id}] 首token: {result['stream_metrics']['ttft'] or 0:.2f}秒, "
+                            f"最大分块间隔: {result['stream_metrics']['max_chunk_gap']:.2f}秒"
+                        )
+                    if self.cache:
+                        self.cache.put(cache_key, {k: v for k, v in result.items() if k != "stream_metrics"})
+                    return api_result
                 else:
-                    self.stats["api_errors"] += 1
+                    self._incr_stat("api_errors")
                     self.logger.error(
                         f"[问题{question_id}] API错误 - "
                         f"状态码: {response.status_code}, "
                         f"响应: {response.text[:200]}"
                     )
                     
-            except requests.exceptions.Timeout:
-                self.stats["timeouts"] += 1
+                    # 400/401等错误重试也不会成功，直接放弃
+                    if not self.retry_policy.is_retryable_status(response.status_code):
+                        return {
+                            "success": False,
+                            "error": f"不可重试的API错误 - 状态码: {response.status_code}",
+                            "error_class": f"http_{response.status_code}",
+                            "elapsed_time": time.time() - start_time,
+                            "latency_attempts": attempts
+                        }
+                    retry_after = self.retry_policy.parse_retry_after(response.headers)
+                    
+            except requests.exceptions.ConnectTimeout as e:
+                # 建连超时是网络故障，不说明推理耗时，不作为自适应超时的下界样本
+                self._incr_stat("timeouts")
+                if is_outage_exception(e):
+                    self.breaker.record_failure()
+                elapsed_time = time.time() - start_time
+                self.logger.error(f"[问题{question_id}] 建连超时 (尝试 {attempt+1}/{max_retries}) - 耗时: {elapsed_time:.2f}秒")
+                
+            except requests.exceptions.Timeout as e:
+                # 读超时：该次请求的实际耗时至少为读超时
+                self._incr_stat("timeouts")
+                timed_out = True
+                if is_outage_exception(e):
+                    self.breaker.record_failure()
                 elapsed_time = time.time() - start_time
                 self.logger.error(f"[问题{question_id}] 请求超时 (尝试 {attempt+1}/{max_retries}) - 耗时: {elapsed_time:.2f}秒")
                 
             except Exception as e:
-                self.stats["api_errors"] += 1
+                self._incr_stat("api_errors")
                 elapsed_time = time.time() - start_time
                 self.logger.error(f"[问题{question_id}] 请求失败 (尝试 {attempt+1}/{max_retries}) - 错误: {str(e)}")
+                if is_outage_exception(e):
+                    self.breaker.record_failure()
+                
+                if not self.retry_policy.is_retryable_exception(e):
+                    return {
+                        "success": False,
+                        "error": f"不可重试的错误: {type(e).__name__}",
+                        "error_class": type(e).__name__,
+                        "elapsed_time": elapsed_time,
+                        "latency_attempts": attempts
+                    }
+                
+            finally:
+                self.rate_limiter.record_usage(used_tokens, reserved_tokens)
+                attempts.append({"wait": waited, **end_attempt(timer), "retry_wait": 0.0, "timed_out": timed_out})
+            
+            # 上游已熔断：本题不再消耗重试次数，交回调度器重新排队
+            if self.breaker.is_open:
+                self.logger.warning(f"[问题{question_id}] API已熔断，题目重新排队")
+                return {
+                    "success": False,
+                    "error": "API熔断",
+                    "error_class": "circuit_open",
+                    "requeue": True,
+                    "elapsed_time": time.time() - start_time,
+                    "latency_attempts": attempts
+                }
             
             if attempt < max_retries - 1:
-                wait_time = 5 * (attempt + 1)  # 递增等待时间
-                self.logger.info(f"等待 {wait_time} 秒后重试...")
+                wait_time = self.retry_policy.get_delay(attempt, retry_after)
+                self.logger.info(f"等待 {wait_time:.1f} 秒后重试...")
                 time.sleep(wait_time)
+                attempts[-1]["retry_wait"] = wait_time
         
         # 所有重试都失败
         return {
             "success": False,
             "error": "所有重试都失败",
-            "elapsed_time": time.time() - start_time
+            "error_class": "retries_exhausted",
+            "elapsed_time": time.time() - start_time,
+            "latency_attempts": attempts
         }
     
+    def _probe_api(self) -> bool:
+        """熔断恢复探测：发送一个极小的请求，上游返回非5xx即视为恢复"""
+        self.logger.info("发送探测请求...")
+        # 探测请求同样占用RPM/TPM预算
+        reserved_tokens = self.rate_limiter.acquire()
+        used_tokens = 0
+        try:
+            response = self.session.post(
+                API_CONFIG["base_url"],
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": "grok-4",
+                    "messages": [{"role": "user", "content": "Reply with just 'OK'"}],
+                    "max_tokens": 10
+                },
+                timeout=(API_CONFIG.get("connect_timeout", 10), 60)
+            )
+            if response.status_code == 200:
+                try:
+                    used_tokens = response.json().get('usage', {}).get('total_tokens', 0)
+                except ValueError:
+                    pass
+            return not is_outage_status(response.status_code)
+        finally:
+            self.rate_limiter.record_usage(used_tokens, reserved_tokens)
+    
     def run_test(self, start_idx: int = 0, num_questions: int = None):
         """运行GPQA测试，支持指定起始位置和数量"""
         overall_start = time.time()
         
         # 加载数据集
-        self.logger.info("加载GPQA数据集...")
-        dataset = load_dataset("Idavidrein/gpqa", "gpqa_main", split="train")
-        total_dataset_size = len(dataset)
-        self.logger.info(f"成功加载 {total_dataset_size} 道题目")
+        questions = self.load_questions()
+        total_dataset_size = len(questions)
         
         # 确定要测试的题目范围
         if num_questions is None:
@@ -221,112 +744,349 @@ class ResumableGPQATestRunner:
         for i in range(start_idx, end_idx):
             if i not in self.completed_questions:
                 questions_to_test.append(i)
+        # 上次中断时被放弃的在途题目优先分发
+        questions_to_test.sort(key=lambda i: i not in self.interrupted_questions)
         
         self.logger.info(f"需要测试 {len(questions_to_test)} 题（已完成 {actual_questions - len(questions_to_test)} 题）")
+        self.events.emit("run_start", mode="sync", target=actual_questions,
+                         completed=actual_questions - len(questions_to_test), concurrency=self.max_workers)
         
-        # 处理每道题
-        for idx, question_id in enumerate(questions_to_test):
-            question_start = time.time()
-            
-            self.logger.info(f"\n{'='*60}")
-            self.logger.info(f"处理第 {idx+1}/{len(questions_to_test)} 题 (题目ID: {question_id})")
+        # 有界并发分发：同时在途的题目不超过 max_workers
+        self.logger.info(f"并发度: {self.max_workers}")
+        pending = deque(enumerate(questions_to_test))
+        # 失败后仍有重试预算的题目，优先级低于 pending，主流程分发完后再处理
+        redispatch = deque()
+        in_flight = {}
+        completed_in_run = 0
+        self.target_count = actual_questions
+        
+        def update_gauges():
+            self.queued_count = len(pending) + len(redispatch)
+            self.in_flight_count = len(in_flight)
+        
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            def submit_next() -> bool:
+                if self.stop_event.is_set() or (not pending and not redispatch):
+                    return False
+                # 熔断期间暂停分发，等探测恢复；等待可被终止信号打断
+                if not self.breaker.wait_until_closed(self._probe_api, self.stop_event):
+                    return False
+                # 熔断恢复前后可能刚收到终止信号
+                if self.stop_event.is_set():
+                    return False
+                idx, question_id = pending.popleft() if pending else redispatch.popleft()
+                future = executor.submit(
+                    self.process_question, questions[question_id], idx, len(questions_to_test)
+                )
+                in_flight[future] = (idx, question_id)
+                update_gauges()
+                return True
             
-            item = dataset[question_id]
+            while len(in_flight) < self.max_workers and submit_next():
+                pass
             
-            # 获取问题信息
-            question = item["Question"]
-            correct_answer = item["Correct Answer"]
-            incorrect_answers = [
-                item["Incorrect Answer 1"],
-                item["Incorrect Answer 2"],
-                item["Incorrect Answer 3"]
-            ]
+            while in_flight:
+                # 定期醒来检查终止信号；收到信号后只等到排空截止时间
+                timeout = 1.0
+                if self.stop_event.is_set():
+                    timeout = min(timeout, self.drain_deadline - time.monotonic())
+                    if timeout <= 0:
+                        break
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    idx, question_id = in_flight.pop(future)
+                    update_gauges()
+                    result = future.result()
+                    
+                    # 因熔断中断的题目放回队首，恢复后重新处理
+                    if result.get("requeue"):
+                        self._incr_stat("requeued")
+                        self.events.emit("requeue", question_id=question_id)
+                        pending.appendleft((idx, question_id))
+                        if self.stop_event.is_set():
+                            # 正在排空，本次不会再分发，下次运行优先重跑
+                            with self.lock:
+                                self.interrupted_questions.add(question_id)
+                        submit_next()
+                        continue
+                    
+                    # 添加到结果并标记为已完成（只在主线程中修改）
+                    if not self.record_result(question_id, result):
+                        failure = self.failed_questions[question_id]
+                        self.logger.warning(
+                            f"[问题{question_id}] 失败 ({failure['error_class']})，"
+                            f"第 {failure['attempts']}/{self.requeue_budget} 次重新排队"
+                        )
+                        redispatch.append((idx, question_id))
+                        submit_next()
+                        continue
+                    completed_in_run += 1
+                    
+                    # 每10题保存一次中间报告，定期把日志压缩进完整检查点
+                    if completed_in_run % 10 == 0:
+                        self.save_intermediate_report()
+                    if completed_in_run % self.compact_interval == 0:
+                        self.save_checkpoint()
+                    
+                    submit_next()
+        finally:
+            # 排空超时后放弃的在途题目记为待处理，下次运行优先重跑；不等待它们的请求线程
+            if in_flight:
+                with self.lock:
+                    self.abandoned_in_flight = len(in_flight)
+                    self.interrupted_questions.update(qid for _, qid in in_flight.values())
+                self.logger.warning(f"排空超时，{len(in_flight)} 道在途题目记为待处理: "
+                                    f"{sorted(qid for _, qid in in_flight.values())}")
+            executor.shutdown(wait=not in_flight, cancel_futures=True)
+            self.in_flight_count = 0
+        
+        # 最终保存
+        self.save_checkpoint()
+        self.events.emit("run_end", completed_in_run=completed_in_run, elapsed=time.time() - overall_start,
+                         interrupted=self.stop_event.is_set(), abandoned=self.abandoned_in_flight)
+        
+        if self.stop_event.is_set():
+            self.logger.info(f"已中断：本次完成 {completed_in_run} 题，剩余题目下次运行时继续")
+            return
+        
+        # 生成最终报告
+        self.generate_final_report()
+    
+    def run_batch(self, backend: BatchBackend, start_idx: int = 0, num_questions: int = None,
+                  poll_interval: float = 60):
+        """
+        批量模式运行：所有待测题目作为一个批次提交，没有单题超时
+        
+        批次ID记录在日志目录的 batch_state.json 中，进程中断后重新运行会继续轮询同一批次，
+        不会重复提交。失败的题目不计入结果，下次运行时随新批次重新提交（受重试预算限制）。
+        
+        Args:
+            backend: 批处理后端
+            start_idx: 起始索引
+            num_questions: 题目数量
+            poll_interval: 轮询间隔（秒）
+        """
+        questions = self.load_questions()
+        if num_questions is None:
+            num_questions = len(questions) - start_idx
+        end_idx = min(start_idx + num_questions, len(questions))
+        
+        state_file = self.log_dir / "batch_state.json"
+        state = None
+        if state_file.exists():
+            with open(state_file, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if backend.poll(state["batch_id"])["status"] in ("failed", "expired", "cancelled"):
+                self.logger.warning(f"上次提交的批次 {state['batch_id']} 已失效，重新提交")
+                state = None
+            else:
+                self.logger.info(f"继续轮询上次提交的批次 {state['batch_id']}")
+        
+        if state is None:
+            question_ids = [i for i in range(start_idx, end_idx) if i not in self.completed_questions]
+            if not question_ids:
+                self.logger.info("没有需要提交的题目")
+                self.generate_final_report()
+                return
             
-            # 记录问题信息
-            question_log = {
-                "question_id": question_id,
-                "question_preview": question[:200] + "..." if len(question) > 200 else question,
-                "question_length": len(question),
-                "domain": item.get("High-level domain", "unknown"),
-                "subdomain": item.get("Subdomain", "unknown")
+            request_file = self.log_dir / f"batch_requests_{self.timestamp}.jsonl"
+            write_request_file(request_file, {qid: self.build_request_body(questions[qid]["prompt"]) for qid in question_ids})
+            batch_id = backend.submit(request_file)
+            state = {
+                "batch_id": batch_id,
+                "backend": backend.name,
+                "request_file": str(request_file),
+                "question_ids": question_ids,
+                "submitted_at": datetime.datetime.now().isoformat()
             }
-            
-            # 随机排序答案
-            all_answers = [(correct_answer, True)] + [(ans, False) for ans in incorrect_answers if ans]
-            random.seed(question_id)
-            random.shuffle(all_answers)
-            
-            # 找出正确答案位置
-            correct_letter = None
-            options = []
-            for j, (answer, is_correct) in enumerate(all_answers):
-                letter = chr(65 + j)
-                options.append(f"{letter}. {answer}")
-                if is_correct:
-                    correct_letter = letter
-            
-            # 构建提示
-            prompt = f"{question}\n\n" + "\n".join(options) + "\n\n请只回答字母 (A, B, C 或 D)。"
-            
-            # 调用API
-            api_result = self.call_grok_api(prompt, question_id)
-            
+            atomic_write_json(state_file, state, keep=1)
+            self.logger.info(f"=== 已提交批次 {batch_id} ({backend.name}，共{len(question_ids)}题) ===")
+        
+        batch_start = time.time()
+        self.events.emit("run_start", mode="batch", target=end_idx - start_idx,
+                         completed=end_idx - start_idx - len(state["question_ids"]), concurrency=None)
+        
+        def on_progress(progress):
+            if progress.get("total"):
+                self.logger.info(f"批次 {state['batch_id']}: {progress['status']} {progress['completed']}/{progress['total']}")
+        
+        final = wait_for_batch(backend, state["batch_id"], poll_interval, on_progress)
+        if final["status"] != "completed":
+            self.logger.error(f"批次 {state['batch_id']} 结束状态: {final['status']}，重新运行将重新提交")
+            state_file.unlink()
+            self.events.emit("run_end", completed_in_run=0, elapsed=time.time() - batch_start)
+            return
+        
+        output_file = backend.download(state["batch_id"], self.log_dir / f"batch_output_{state['batch_id']}.jsonl")
+        ingested = 0
+        for question_id, api_result in read_batch_results(output_file, state["batch_id"]):
+            if question_id in self.completed_questions:
+                continue
             if api_result["success"]:
-                # 提取答案
-                response = api_result["content"]
-                answer_letter = ""
-                for char in response.strip().upper():
-                    if char in "ABCD":
-                        answer_letter = char
-                        break
-                
-                is_correct = answer_letter == correct_letter
-                
-                # 记录结果
-                result = {
-                    **question_log,
-                    "expected": correct_letter,
-                    "actual": answer_letter,
-                    "raw_response": response,
-                    "correct": is_correct,
-                    "api_time": api_result["elapsed_time"],
-                    "tokens_used": api_result.get("usage", {}).get("total_tokens", 0),
-                    "reasoning_tokens": api_result.get("usage", {}).get("completion_tokens_details", {}).get("reasoning_tokens", 0),
-                    "model": api_result.get("model", "unknown")
-                }
-                
-                self.logger.info(
-                    f"[问题{question_id}] 结果: {'✓ 正确' if is_correct else '✗ 错误'} "
-                    f"(期望: {correct_letter}, 实际: {answer_letter})"
-                )
+                usage = api_result["usage"]
+                self._incr_stat("api_calls")
+                self._incr_stat("tokens_used", usage.get("total_tokens", 0))
+                self._incr_stat("reasoning_tokens", usage.get("completion_tokens_details", {}).get("reasoning_tokens", 0))
             else:
-                # API调用失败
-                result = {
-                    **question_log,
-                    "expected": correct_letter,
-                    "error": api_result["error"],
-                    "api_time": api_result["elapsed_time"]
-                }
+                self._incr_stat("api_errors")
+            result = self.build_result(questions[question_id], api_result)
+            result["total_time"] = 0.0
+            if self.record_result(question_id, result):
+                ingested += 1
+        
+        self.logger.info(f"批次结果已导入 {ingested} 题，失败待重提 {len(self.failed_questions)} 题")
+        state_file.unlink()
+        self.save_checkpoint()
+        self.events.emit("run_end", completed_in_run=ingested, elapsed=time.time() - batch_start)
+        self.generate_final_report()
+    
+    def load_questions(self):
+        """
+        加载预处理好的题目（提示和正确答案已构建好）
+        
+        加载顺序见 core.question_format.load_questions，所有入口共用。
+        
+        Returns:
+            可按题目ID索引的题目序列
+        """
+        questions, self.dataset_hash = load_questions(self.question_store, self.processed_data)
+        
+        self.logger.info(f"成功加载 {len(questions)} 道题目 (内容哈希: {self.dataset_hash[:12]})")
+        
+        previous_hash = self.checkpoint.get("dataset_hash")
+        if previous_hash and previous_hash != self.dataset_hash:
+            self.logger.warning(
+                f"检查点使用的数据 ({previous_hash[:12]}) 与本次数据不一致，已完成题目的选项顺序可能不同"
+            )
+        
+        return questions
+    
+    def process_question(self, question: Dict[str, Any], idx: int, total: int) -> Dict[str, Any]:
+        """
+        处理单道题目（可在工作线程中执行）
+        
+        Args:
+            question: 预处理后的题目（见 core.question_format.build_question）
+            idx: 本次运行中的序号
+            total: 本次运行需要测试的题目数
+            
+        Returns:
+            该题的结果记录
+        """
+        question_start = time.time()
+        question_id = question["question_id"]
+        
+        self.logger.info(f"\n{'='*60}")
+        self.logger.info(f"处理第 {idx+1}/{total} 题 (题目ID: {question_id})")
+        
+        question_text = question["question"]
+        prompt = question["prompt"]
+        
+        # 按同子领域已完成题目的耗时设定本题的超时和重试次数，重新分发的题目逐次放宽
+        timeout, max_retries = None, None
+        subdomain = question.get("subdomain", "unknown")
+        if self.timeout_policy:
+            with self.lock:
+                requeues = self.failed_questions.get(question_id, {}).get("attempts", 0)
+            timeout, max_retries = self.timeout_policy.plan(subdomain, len(question_text), requeues)
+            self.logger.info(f"[问题{question_id}] 超时: {timeout:.0f}秒, 最多尝试 {max_retries} 次")
+        
+        # 调用API
+        api_result = self.call_grok_api(prompt, question_id, timeout, max_retries)
+        result = self.build_result(question, api_result)
+        
+        # 读超时说明该题耗时至少为 timeout，作为下界样本反馈给策略（流式模式下的超时是空闲超时，不计入）
+        if (self.timeout_policy and not self.stream
+                and any(a.get("timed_out") for a in api_result.get("latency_attempts", []))):
+            self.timeout_policy.observe_timeout(subdomain, len(question_text), timeout)
+        
+        question_elapsed = time.time() - question_start
+        result["total_time"] = question_elapsed
+        
+        self.logger.info(f"[问题{question_id}] 总耗时: {question_elapsed:.2f}秒")
+        
+        return result
+    
+    def build_result(self, question: Dict[str, Any], api_result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        把一次API调用的结果整理成结果记录（同步调用和批量模式共用）
+        
+        Args:
+            question: 预处理后的题目
+            api_result: call_grok_api 格式的返回值
             
-            question_elapsed = time.time() - question_start
-            result["total_time"] = question_elapsed
+        Returns:
+            结果记录（不含 total_time）
+        """
+        question_id = question["question_id"]
+        
+        # 记录问题信息
+        question_text = question["question"]
+        question_log = {
+            "question_id": question_id,
+            "question_preview": question_text[:200] + "..." if len(question_text) > 200 else question_text,
+            "question_length": len(question_text),
+            "domain": question.get("domain", "unknown"),
+            "subdomain": question.get("subdomain", "unknown")
+        }
+        
+        correct_letter = question["correct_answer"]
+        
+        if api_result["success"]:
+            # 提取答案
+            response = api_result["content"]
+            answer_letter = ""
+            for char in response.strip().upper():
+                if char in "ABCD":
+                    answer_letter = char
+                    break
             
-            # 添加到结果并标记为已完成
-            self.results.append(result)
-            self.completed_questions.add(question_id)
+            is_correct = answer_letter == correct_letter
             
-            self.logger.info(f"[问题{question_id}] 总耗时: {question_elapsed:.2f}秒")
+            # 记录结果
+            result = {
+                **question_log,
+                "expected": correct_letter,
+                "actual": answer_letter,
+                "raw_response": response,
+                "correct": is_correct,
+                "api_time": api_result["elapsed_time"],
+                "tokens_used": api_result.get("usage", {}).get("total_tokens", 0),
+                "reasoning_tokens": api_result.get("usage", {}).get("completion_tokens_details", {}).get("reasoning_tokens", 0),
+                "model": api_result.get("model", "unknown")
+            }
+            if "stream_metrics" in api_result:
+                result["stream_metrics"] = api_result["stream_metrics"]
+            if api_result.get("cached"):
+                result["cached"] = True
+            if api_result.get("hedged"):
+                result["hedge_winner"] = api_result["hedge_winner"]
+            if api_result.get("batch_id"):
+                result["batch_id"] = api_result["batch_id"]
             
-            # 每10题保存一次检查点
-            if (idx + 1) % 10 == 0:
-                self.save_checkpoint()
-                self.save_intermediate_report()
+            self.logger.info(
+                f"[问题{question_id}] 结果: {'✓ 正确' if is_correct else '✗ 错误'} "
+                f"(期望: {correct_letter}, 实际: {answer_letter})"
+            )
+        else:
+            # API调用失败
+            result = {
+                **question_log,
+                "expected": correct_letter,
+                "error": api_result["error"],
+                "error_class": api_result.get("error_class", "unknown"),
+                "api_time": api_result["elapsed_time"]
+            }
+            if api_result.get("requeue"):
+                result["requeue"] = True
         
-        # 最终保存
-        self.save_checkpoint()
+        # 延迟分解：各次尝试的建连/TLS/首字节/传输耗时及重试等待
+        if api_result.get("latency_attempts"):
+            attempts = api_result["latency_attempts"]
+            result["latency"] = {"attempts": attempts, "summary": summarize_attempts(attempts)}
         
-        # 生成最终报告
-        self.generate_final_report()
+        return result
     
     def save_intermediate_report(self):
         """保存中间结果报告"""
@@ -343,82 +1103,144 @@ class ResumableGPQATestRunner:
             "last_updated": datetime.datetime.now().isoformat()
         }
         
-        # 保存简要报告
-        with open(f"gpqa_intermediate_{self.timestamp}.json", 'w', encoding='utf-8') as f:
+        # 保存简要报告（放在日志目录下，分片运行时互不覆盖）
+        with open(self.log_dir / f"gpqa_intermediate_{self.timestamp}.json", 'w', encoding='utf-8') as f:
             json.dump(intermediate_report, f, indent=2, ensure_ascii=False)
         
         self.logger.info(f"中间报告已保存 - 已完成: {total_count}, 准确率: {accuracy:.2%}")
     
     def generate_final_report(self):
         """生成最终报告"""
-        # 计算统计数据
-        correct_count = sum(1 for r in self.results if r.get("correct", False))
-        total_count = len(self.results)
-        accuracy = correct_count / total_count if total_count > 0 else 0
-        
-        # 生成完整报告
-        report = {
-            "test_info": {
-                "timestamp": self.timestamp,
-                "model": "grok-4",
-                "dataset": "gpqa_main",
-                "total_questions": total_count,
-                "correct": correct_count,
-                "accuracy": accuracy
-            },
-            "statistics": {
-                **self.stats,
-                "average_time_per_question": sum(r.get("total_time", 0) for r in self.results) / total_count if total_count > 0 else 0,
-                "average_tokens_per_question": self.stats["tokens_used"] / total_count if total_count > 0 else 0
-            },
-            "detailed_results": self.results
-        }
+        report = build_report(self.results, self.stats, self.timestamp, self.dataset_hash,
+                              pending=set(self.failed_questions) | self.interrupted_questions)
+        total_count = report["test_info"]["total_questions"]
+        correct_count = report["test_info"]["correct"]
+        accuracy = report["test_info"]["accuracy"]
         
         # 保存详细报告
         report_file = self.log_dir / f"gpqa_report_{self.timestamp}.json"
         with open(report_file, "w", encoding='utf-8') as f:
             json.dump(report, f, indent=2, ensure_ascii=False)
         
+        # 同时写一份列式结果，分析时可只读需要的列（未安装 pyarrow 时跳过）
+        columnar_file = None
+        if columnar_store.is_available():
+            columnar_file = columnar_store.write_results(
+                self.results, self.log_dir / columnar_store.COLUMNAR_FILENAME, self.timestamp
+            )
+        
         # 打印总结
         self.logger.info("\n" + "="*60)
         self.logger.info("测试完成 - 总结报告")
         self.logger.info("="*60)
         self.logger.info(f"总题数: {total_count}")
         self.logger.info(f"正确数: {correct_count}")
+        self.logger.info(f"失败数: {report['test_info']['failed']}（重试预算: {self.requeue_budget}）")
+        if report['test_info']['pending']:
+            self.logger.info(f"待处理: {report['test_info']['pending']} 题（待重试或被中断，未计入结果）")
         self.logger.info(f"准确率: {accuracy:.2%}")
         self.logger.info(f"API调用次数: {self.stats['api_calls']}")
         self.logger.info(f"API错误次数: {self.stats['api_errors']}")
         self.logger.info(f"超时次数: {self.stats['timeouts']}")
         self.logger.info(f"总Token使用: {self.stats['tokens_used']:,}")
         self.logger.info(f"推理Token: {self.stats['reasoning_tokens']:,}")
+        breakdown = report["statistics"]["latency_breakdown"]
+        if breakdown:
+            self.logger.info("延迟分解 (p50 / p99 秒):")
+            for key in ("wait", "connect", "tls", "send", "ttfb", "body", "retry_wait"):
+                self.logger.info(f"  {key:10s} {breakdown[key]['p50']:8.3f} / {breakdown[key]['p99']:8.3f}")
         self.logger.info(f"\n详细报告已保存到: {report_file}")
+        if columnar_file:
+            self.logger.info(f"列式结果已保存到: {columnar_file}")
 
 
 def main():
     """主函数"""
-    import sys
+    import argparse
     
-    # 解析参数
-    if len(sys.argv) > 1:
-        if sys.argv[1] == "resume":
-            # 继续之前的测试
-            runner = ResumableGPQATestRunner()
-            # 继续测试剩余的题目
-            runner.run_test(0, 448)  # 会自动跳过已完成的
-        else:
-            # 新的测试
-            start_idx = 0
-            num_questions = int(sys.argv[1])
-            
-            if len(sys.argv) > 2:
-                start_idx = int(sys.argv[2])
-            
-            runner = ResumableGPQATestRunner()
-            runner.run_test(start_idx, num_questions)
-    else:
+    parser = argparse.ArgumentParser(
+        description="GPQA测试（支持断点续传）",
+        epilog="示例: python gpqa_test_resumable.py 50 100  |  python gpqa_test_resumable.py resume"
+    )
+    parser.add_argument("count", nargs="?", help="题目数量，或 resume 继续之前的测试")
+    parser.add_argument("start", nargs="?", type=int, default=0, help="起始索引")
+    parser.add_argument("--checkpoint", default="gpqa_checkpoint.json", help="检查点文件路径")
+    parser.add_argument("--log-dir", default="gpqa_logs", help="日志和报告目录")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("MAX_CONCURRENCY", "1")),
+                        help="同时在途的题目数（默认读取 MAX_CONCURRENCY，未设置时串行）")
+    parser.add_argument("--batch", action="store_true", help="批量模式：所有待测题目作为一个批次提交")
+    parser.add_argument("--batch-backend", default="local", choices=sorted(BATCH_BACKENDS),
+                        help="批处理后端")
+    parser.add_argument("--batch-endpoint", default=None,
+                        help="local 后端转发请求的地址（默认生成合成响应）")
+    parser.add_argument("--batch-poll", type=float, default=60, help="批次轮询间隔（秒）")
+    parser.add_argument("--requeue-budget", type=int, default=None,
+                        help="失败题目在本次运行中最多重新分发的次数（默认 API_CONFIG[\"requeue_budget\"]）")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="在该端口提供运行指标（/metrics 为Prometheus格式，/metrics.json 为JSON）")
+    parser.add_argument("--heartbeat-fd", type=int, default=None,
+                        help="向该文件描述符定期写心跳（由 monitors/supervisor.py 传入）")
+    parser.add_argument("--heartbeat-interval", type=float, default=10, help="心跳间隔（秒）")
+    parser.add_argument("--drain-timeout", type=float, default=None,
+                        help="收到 SIGTERM/SIGINT 后等待在途题目完成的最长时间（默认 API_CONFIG[\"drain_timeout\"]）")
+    parser.add_argument("--requests-per-minute", type=float, default=None,
+                        help="本进程的RPM预算（默认 API_CONFIG[\"requests_per_minute\"]，分片协调器按密钥分摊后传入）")
+    parser.add_argument("--tokens-per-minute", type=float, default=None,
+                        help="本进程的TPM预算（默认 API_CONFIG[\"tokens_per_minute\"]）")
+    args = parser.parse_args()
+    
+    if args.count is None:
         print("用法:")
         print("  python gpqa_test_resumable.py <题目数量> [起始索引]")
         print("  python gpqa_test_resumable.py resume  # 继续之前的测试")
+        print("  python gpqa_test_resumable.py resume --concurrency 4  # 4题并发")
+        print("  python gpqa_test_resumable.py 448 --batch  # 批量模式提交")
+        print("  python gpqa_test_resumable.py 448 --metrics-port 9108  # 提供运行指标")
+        print("  python core/shard_coordinator.py --shards 4  # 多进程分片运行")
+        return
+    
+    runner = ResumableGPQATestRunner(
+        checkpoint_file=args.checkpoint,
+        log_dir=args.log_dir,
+        max_workers=args.concurrency,
+        requeue_budget=args.requeue_budget,
+        metrics_port=args.metrics_port,
+        drain_timeout=args.drain_timeout,
+        requests_per_minute=args.requests_per_minute,
+        tokens_per_minute=args.tokens_per_minute
+    )
+    
+    # SIGTERM（监督进程或手动停止）/ Ctrl+C：停止分发、排空在途题目、保存检查点后退出
+    # 批量模式下批次ID已落盘，直接退出即可，下次运行继续轮询
+    if not args.batch:
+        signal.signal(signal.SIGTERM, runner.request_stop)
+        signal.signal(signal.SIGINT, runner.request_stop)
+    
+    if args.heartbeat_fd is not None:
+        HeartbeatEmitter(args.heartbeat_fd, runner.heartbeat_status, args.heartbeat_interval).start()
+    
+    if args.batch:
+        backend = BATCH_BACKENDS[args.batch_backend](
+            runner.log_dir / "batches", endpoint=args.batch_endpoint, api_key=runner.api_key,
+            rate_limiter=runner.rate_limiter
+        )
+        if args.count == "resume":
+            runner.run_batch(backend, 0, 448, args.batch_poll)
+        else:
+            runner.run_batch(backend, args.start, int(args.count), args.batch_poll)
+    elif args.count == "resume":
+        # 继续测试剩余的题目，会自动跳过已完成的
+        runner.run_test(0, 448)
+    else:
+        runner.run_test(args.start, int(args.count))
+    
+    # 因信号中断时按惯例以 128+信号值 退出，监督进程据此判断需要重启
+    if runner.stop_signal is not None:
+        if runner.abandoned_in_flight:
+            # 被放弃的请求线程仍在等待响应，正常退出会等它们结束；检查点和日志均已写入
+            logging.shutdown()
+            os._exit(128 + runner.stop_signal)
+        sys.exit(128 + runner.stop_signal)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+心跳
+运行器在后台线程中定期向监督进程（monitors/supervisor.py）继承下来的管道写一行JSON心跳，
+监督进程据此区分"进程卡死"（心跳中断）和"没有进展"（心跳正常但完成数不变）
+
+心跳格式:
+    {"ts": 1760000000.0, "pid": 1234, "completed": 120, "in_flight": 8, "circuit_open": false, "stopping": false}
+"""
+
+import os
+import json
+import time
+import threading
+from typing import Callable, Dict, Any
+
+
+class HeartbeatEmitter:
+    """后台线程定期把 status() 的结果写入心跳管道"""
+
+    def __init__(self, fd: int, status: Callable[[], Dict[str, Any]], interval: float = 10):
+        """
+        Args:
+            fd: 监督进程传入的管道写端
+            status: 返回当前运行状态的回调
+            interval: 心跳间隔（秒）
+        """
+        self.fd = fd
+        self.status = status
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="heartbeat", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def beat(self):
+        """立即发送一次心跳；监督进程已退出（管道断开）时返回 False"""
+        line = json.dumps({"ts": time.time(), "pid": os.getpid(), **self.status()}) + "\n"
+        try:
+            os.write(self.fd, line.encode("utf-8"))
+            return True
+        except (BrokenPipeError, OSError):
+            return False
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            if not self.beat():
+                return
+            self.stop_event.wait(self.interval)
+
+    def stop(self):
+        self.stop_event.set()
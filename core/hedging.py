@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+对冲请求策略
+请求耗时超过本次运行已观测延迟的某个分位数时，再发一个相同的请求，
+先成功返回的一方获胜；额外请求数受预算限制。
+落后的一方无法中途取消，会一直占用线程和连接直到自身超时，
+因此同时存在的额外请求（对冲中或已落后仍在运行）有上限，达到上限时不再对冲
+"""
+
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Executor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class HedgingPolicy:
+    """基于延迟分位数的对冲策略（线程安全）"""
+
+    def __init__(self, percentile: float = 0.95, min_samples: int = 20,
+                 max_extra_fraction: float = 0.1, max_extra_tokens: Optional[int] = None,
+                 window: int = 500, max_outstanding: Optional[int] = None):
+        """
+        Args:
+            percentile: 超过该分位数的延迟后发出对冲请求
+            min_samples: 观测样本不足时不对冲
+            max_extra_fraction: 对冲请求数占总请求数的上限
+            max_extra_tokens: 对冲请求累计消耗token的上限，None 表示不限制
+            window: 计算分位数时保留的最近样本数
+            max_outstanding: 同时存在的额外请求上限（应不超过连接池中主请求用不到的连接数），None 表示不限制
+        """
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.max_extra_fraction = max_extra_fraction
+        self.max_extra_tokens = max_extra_tokens
+        self.max_outstanding = max_outstanding
+
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_tokens = 0
+        self.outstanding = 0
+        self.lock = threading.Lock()
+
+    def observe(self, latency: float):
+        """记录一次成功请求的延迟"""
+        with self.lock:
+            self.latencies.append(latency)
+
+    def record_request(self):
+        """记录一次主请求，用于计算对冲预算"""
+        with self.lock:
+            self.requests += 1
+
+    def record_hedge_tokens(self, tokens: int):
+        """记录对冲请求消耗的token"""
+        with self.lock:
+            self.hedge_tokens += tokens
+
+    def hedge_delay(self) -> Optional[float]:
+        """
+        主请求发出多久后应发出对冲请求
+
+        Returns:
+            秒数；样本不足时返回 None（不对冲）
+        """
+        with self.lock:
+            if len(self.latencies) < self.min_samples:
+                return None
+            ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(self.percentile * len(ordered)))
+        return ordered[index]
+
+    def try_acquire(self) -> bool:
+        """在预算内申请一次对冲，成功时计入已用预算和在途额外请求数"""
+        with self.lock:
+            if self.hedges + 1 > self.max_extra_fraction * self.requests:
+                return False
+            if self.max_extra_tokens is not None and self.hedge_tokens >= self.max_extra_tokens:
+                return False
+            if self.max_outstanding is not None and self.outstanding >= self.max_outstanding:
+                return False
+            self.hedges += 1
+            self.outstanding += 1
+            return True
+
+    def release(self):
+        """一次对冲的两个请求都已结束，归还在途额外请求名额"""
+        with self.lock:
+            self.outstanding -= 1
+
+    def summary(self) -> dict:
+        """对冲统计"""
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "hedges": self.hedges,
+                "hedge_tokens": self.hedge_tokens,
+                "outstanding": self.outstanding,
+            }
+
+
+def call_hedged(policy: HedgingPolicy, executor: Executor,
+                call: Callable[[], Dict[str, Any]], label: str = "") -> Dict[str, Any]:
+    """
+    按对冲策略执行一次API调用
+
+    Args:
+        policy: 对冲策略
+        executor: 执行主请求和对冲请求的线程池
+        call: 无参调用，返回带 success/elapsed_time 的结果字典
+        label: 日志前缀
+
+    Returns:
+        先成功的一方的结果；发出过对冲请求时额外包含 hedged/hedge_winner
+    """
+    policy.record_request()
+    delay = policy.hedge_delay()
+    primary = executor.submit(call)
+
+    if delay is not None:
+        done, _ = wait([primary], timeout=delay)
+        if not done and policy.try_acquire():
+            return _race(policy, executor, call, primary, delay, label)
+
+    result = primary.result()
+    _observe(policy, result)
+    return result
+
+
+def _race(policy: HedgingPolicy, executor: Executor, call: Callable[[], Dict[str, Any]],
+          primary, delay: float, label: str) -> Dict[str, Any]:
+    """主请求已超时未返回，发出对冲请求并取先成功的一方"""
+    logger.info(f"{label}请求已超过 {delay:.1f} 秒（p{policy.percentile * 100:.0f}），发出对冲请求")
+    hedge = executor.submit(call)
+    # 对冲请求无论胜负都会消耗token，计入对冲预算
+    hedge.add_done_callback(
+        lambda f: policy.record_hedge_tokens(f.result().get("usage", {}).get("total_tokens", 0))
+    )
+    # 落后的一方跑完后才归还额外请求名额
+    running = [2]
+    running_lock = threading.Lock()
+
+    def on_done(_):
+        with running_lock:
+            running[0] -= 1
+            finished = running[0] == 0
+        if finished:
+            policy.release()
+
+    primary.add_done_callback(on_done)
+    hedge.add_done_callback(on_done)
+
+    pending = {primary, hedge}
+    result = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            result = future.result()
+            if result["success"]:
+                # 落后的一方无法中途取消，继续在后台跑完（期间占用额外请求名额），结果丢弃
+                result["hedged"] = True
+                result["hedge_winner"] = "hedge" if future is hedge else "primary"
+                _observe(policy, result)
+                return result
+
+    result["hedged"] = True
+    return result
+
+
+def _observe(policy: HedgingPolicy, result: Dict[str, Any]):
+    """只有真实完成的请求计入延迟分布"""
+    if result["success"] and not result.get("cached"):
+        policy.observe(result["elapsed_time"])
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+GPQA评测任务队列
+基于SQLite的 (config, question_id) 任务池，工作进程通过租约领取任务。
+租约过期（工作进程卡住或被杀）的任务会自动被其他工作进程领取。
+
+队列文件使用WAL模式，依赖同一主机上的共享内存，只能由同一台机器上的工作进程共享；
+不要放在NFS/SMB等网络存储上供多台机器同时访问。
+config 只是区分任务组的标签，不改变请求参数（模型、提示、种子均取自配置文件）。
+
+用法:
+    python core/job_queue.py enqueue --config grok4 --count 448
+    python core/job_queue.py worker --config grok4 --concurrency 4
+    python core/job_queue.py status --config grok4
+    python core/job_queue.py report --config grok4
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import datetime
+import argparse
+import threading
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional
+
+# 添加父目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from configs.config import question_time_budget
+
+DEFAULT_QUEUE = Path(__file__).parent.parent / "results" / "jobs.sqlite"
+
+
+class JobQueue:
+    """带租约的SQLite任务队列"""
+
+    def __init__(self, path, lease_seconds: float = 1800, max_attempts: int = 3,
+                 max_lease_seconds: float = None):
+        """
+        Args:
+            path: SQLite文件路径（本机磁盘）
+            lease_seconds: 租约时长，超过后任务可被其他工作进程领取
+            max_attempts: 单个任务最多被领取的次数
+            max_lease_seconds: 单次领取最多续租到的总时长，默认取单题最长耗时（configs.config.question_time_budget），
+                超过后不再续租，卡住的工作进程持有的任务会在租约过期后被其他工作进程接手
+        """
+        self.path = Path(path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.max_lease_seconds = question_time_budget() if max_lease_seconds is None else max_lease_seconds
+        self.lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # 手动管理事务，领取任务时用 BEGIN IMMEDIATE 保证只有一个进程拿到
+        self.conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                config TEXT NOT NULL,
+                question_id INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                worker TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                updated_at REAL,
+                UNIQUE(config, question_id)
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(config, status)")
+
+    def enqueue(self, config: str, question_ids: Iterable[int]) -> int:
+        """
+        添加任务，已存在的 (config, question_id) 会被忽略
+
+        Returns:
+            新增的任务数
+        """
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO jobs (config, question_id, updated_at) VALUES (?, ?, ?)",
+                [(config, qid, now) for qid in question_ids]
+            )
+            added = self.conn.total_changes - before
+            self.conn.execute("COMMIT")
+        return added
+
+    def lease(self, worker_id: str, config: str) -> Optional[Dict[str, Any]]:
+        """
+        领取一个待处理或租约已过期的任务
+
+        Returns:
+            {"id", "config", "question_id", "attempts"}，没有可领取的任务时返回 None
+        """
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                # 租约过期且尝试次数已用完的任务不再派发
+                self.conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = 'lease expired', updated_at = ? "
+                    "WHERE config = ? AND status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                    (now, config, now, self.max_attempts)
+                )
+                row = self.conn.execute(
+                    """
+                    SELECT id, question_id, attempts FROM jobs
+                    WHERE config = ? AND attempts < ?
+                      AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?))
+                    ORDER BY attempts, id LIMIT 1
+                    """,
+                    (config, self.max_attempts, now)
+                ).fetchone()
+                if row is None:
+                    self.conn.execute("COMMIT")
+                    return None
+
+                job_id, question_id, attempts = row
+                self.conn.execute(
+                    "UPDATE jobs SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1, "
+                    "updated_at = ? WHERE id = ?",
+                    (worker_id, now + self.lease_seconds, now, job_id)
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+        return {"id": job_id, "config": config, "question_id": question_id, "attempts": attempts + 1}
+
+    def renew(self, job_id: int, worker_id: str, seconds: float = None) -> bool:
+        """续租 seconds 秒（默认 lease_seconds），任务已被其他工作进程接管时返回 False"""
+        now = time.time()
+        seconds = self.lease_seconds if seconds is None else seconds
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? "
+                "WHERE id = ? AND worker = ? AND status = 'leased'",
+                (now + seconds, now, job_id, worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: int, worker_id: str, result: Dict[str, Any]) -> bool:
+        """
+        提交结果；租约过期后被重新领取的任务，先完成的一方获胜
+
+        Returns:
+            结果是否被采纳（任务已被其他工作进程完成时为 False）
+        """
+        now = time.time()
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE jobs SET status = 'done', worker = ?, result = ?, lease_expires = NULL, updated_at = ? "
+                "WHERE id = ? AND status != 'done'",
+                (worker_id, json.dumps(result, ensure_ascii=False), now, job_id)
+            )
+        return cursor.rowcount == 1
+
+    def fail(self, job_id: int, worker_id: str, error: str):
+        """放弃任务：尝试次数未用完时退回队列，否则标记为失败"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts < ? THEN 'pending' ELSE 'failed' END, "
+                "error = ?, lease_expires = NULL, updated_at = ? "
+                "WHERE id = ? AND worker = ? AND status = 'leased'",
+                (self.max_attempts, error, now, job_id, worker_id)
+            )
+
+    def release(self, job_id: int, worker_id: str):
+        """归还任务且不计入尝试次数（如上游熔断导致中断）"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "UPDATE jobs SET status = 'pending', attempts = attempts - 1, lease_expires = NULL, updated_at = ? "
+                "WHERE id = ? AND worker = ? AND status = 'leased'",
+                (now, job_id, worker_id)
+            )
+
+    def counts(self, config: str) -> Dict[str, int]:
+        """各状态的任务数"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT status, COUNT(*) FROM jobs WHERE config = ? GROUP BY status", (config,)
+            ).fetchall()
+        return dict(rows)
+
+    def has_unfinished(self, config: str) -> bool:
+        """是否还有待处理或他人租约中的任务"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE config = ? AND status IN ('pending', 'leased')", (config,)
+            ).fetchone()
+        return row[0] > 0
+
+    def results(self, config: str) -> List[Dict[str, Any]]:
+        """已完成任务的结果，按题目ID排序"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT result FROM jobs WHERE config = ? AND status = 'done' ORDER BY question_id", (config,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def close(self):
+        """关闭数据库连接"""
+        with self.lock:
+            self.conn.close()
+
+
+class LeaseKeeper:
+    """
+    在题目处理期间定期续租的后台线程
+
+    续租总时长不超过 queue.max_lease_seconds：请求卡住但进程仍存活时，
+    租约到期后任务由其他工作进程接手，而不是被一直占用
+    """
+
+    def __init__(self, queue: JobQueue, job_id: int, worker_id: str):
+        self.queue = queue
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        interval = max(1.0, self.queue.lease_seconds / 3)
+        renew_until = time.monotonic() + self.queue.max_lease_seconds
+        while not self.stopped.wait(interval):
+            remaining = renew_until - time.monotonic()
+            if remaining <= 0:
+                return
+            # 接近上限时只续到上限为止，租约恰好在 max_lease_seconds 时过期
+            if not self.queue.renew(self.job_id, self.worker_id, min(self.queue.lease_seconds, remaining)):
+                return
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stopped.set()
+
+
+def run_worker(queue: JobQueue, config: str, worker_id: str, concurrency: int, poll_interval: float = 30):
+    """
+    工作进程：不断从队列领取题目并处理，直到队列中没有未完成的任务
+
+    结果同时写入队列和本工作进程自己的检查点。
+    """
+    from core.gpqa_test_resumable import REDISPATCH_ERROR_CLASSES, ResumableGPQATestRunner
+
+    worker_dir = queue.path.parent / "queue_workers" / config / worker_id
+    runner = ResumableGPQATestRunner(
+        checkpoint_file=str(worker_dir / "gpqa_checkpoint.json"),
+        log_dir=str(worker_dir / "logs"),
+        max_workers=concurrency
+    )
+    questions = runner.load_questions()
+    processed = [0]
+    processed_lock = threading.Lock()
+
+    def worker_loop(slot: int):
+        slot_id = f"{worker_id}/{slot}"
+        while True:
+            # 上游熔断期间不领取新任务
+            runner.breaker.wait_until_closed(runner._probe_api)
+            job = queue.lease(slot_id, config)
+            if job is None:
+                if not queue.has_unfinished(config):
+                    return
+                # 其他工作进程还持有租约，等它们完成或租约过期后接手
+                time.sleep(poll_interval)
+                continue
+
+            question_id = job["question_id"]
+            try:
+                with LeaseKeeper(queue, job["id"], slot_id):
+                    result = runner.process_question(questions[question_id], processed[0], len(questions))
+            except Exception as e:
+                runner.logger.error(f"[问题{question_id}] 处理异常: {e}")
+                queue.fail(job["id"], slot_id, str(e))
+                continue
+
+            if result.get("requeue"):
+                queue.release(job["id"], slot_id)
+                continue
+
+            # 重试耗尽的失败在队列的尝试次数内退回队列，由任意工作进程重新领取
+            if result.get("error_class") in REDISPATCH_ERROR_CLASSES and job["attempts"] < queue.max_attempts:
+                runner.logger.warning(f"[问题{question_id}] 失败，退回队列（第 {job['attempts']}/{queue.max_attempts} 次）")
+                queue.fail(job["id"], slot_id, result["error"])
+                continue
+
+            with processed_lock:
+                processed[0] += 1
+            if queue.complete(job["id"], slot_id, result):
+                runner.record_result(question_id, result)
+            else:
+                runner.logger.warning(f"[问题{question_id}] 已被其他工作进程完成，丢弃本次结果")
+
+    threads = [threading.Thread(target=worker_loop, args=(slot,)) for slot in range(runner.max_workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    runner.save_checkpoint()
+    runner.logger.info(f"工作进程 {worker_id} 退出，队列状态: {queue.counts(config)}")
+
+
+def write_report(queue: JobQueue, config: str) -> Path:
+    """把队列中已完成的结果汇总成与单次运行相同格式的报告"""
+    from core.gpqa_test_resumable import build_report
+
+    results = queue.results(config)
+    stats = {
+        "tokens_used": sum(r.get("tokens_used", 0) for r in results),
+        "reasoning_tokens": sum(r.get("reasoning_tokens", 0) for r in results),
+    }
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    report = build_report(results, stats, timestamp)
+    report["test_info"]["config"] = config
+    report["test_info"]["queue_status"] = queue.counts(config)
+
+    report_file = queue.path.parent / f"gpqa_report_{config}_{timestamp}.json"
+    with open(report_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return report_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GPQA评测任务队列")
+    parser.add_argument("command", choices=["enqueue", "worker", "status", "report"])
+    parser.add_argument("--db", default=str(DEFAULT_QUEUE),
+                        help="队列文件路径（必须在本机磁盘上，WAL模式不支持NFS/SMB等网络存储）")
+    parser.add_argument("--config", required=True, help="任务组标签（只用于区分队列中的任务，不改变请求参数）")
+    parser.add_argument("--start", type=int, default=0, help="enqueue: 起始索引")
+    parser.add_argument("--count", type=int, default=448, help="enqueue: 题目数量")
+    parser.add_argument("--concurrency", type=int, default=1, help="worker: 同时处理的题目数")
+    parser.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}", help="worker: 工作进程标识")
+    parser.add_argument("--lease", type=float, default=1800, help="租约时长（秒）")
+    parser.add_argument("--max-lease", type=float, default=None,
+                        help="单个任务最多续租到的总时长（秒），默认取单题最长耗时")
+    args = parser.parse_args()
+
+    queue = JobQueue(args.db, lease_seconds=args.lease, max_lease_seconds=args.max_lease)
+
+    if args.command == "enqueue":
+        added = queue.enqueue(args.config, range(args.start, args.start + args.count))
+        print(f"新增 {added} 个任务，当前状态: {queue.counts(args.config)}")
+    elif args.command == "worker":
+        run_worker(queue, args.config, args.worker_id, args.concurrency)
+    elif args.command == "status":
+        print(json.dumps(queue.counts(args.config), ensure_ascii=False))
+    elif args.command == "report":
+        print(f"报告已保存到: {write_report(queue, args.config)}")
+
+    queue.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+请求延迟分解
+在urllib3连接层打点，把每次尝试拆成: 建连（含DNS）、TLS握手/代理隧道、
+发送请求、首字节（服务端排队+生成）、响应体传输，
+并在报告中按分项汇总百分位数
+"""
+
+import time
+import threading
+from typing import Dict, Any, List, Optional
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# 每个问题汇总的分项（秒）
+SPAN_KEYS = ["wait", "connect", "tls", "send", "ttfb", "body", "retry_wait", "total"]
+
+_local = threading.local()
+
+
+class AttemptTimer:
+    """一次请求尝试的计时点（单调时钟）"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.connect = 0.0
+        self.tls = 0.0
+        self.reused = True
+        self.sent_at = None
+        self.headers_at = None
+
+    def spans(self, end: Optional[float] = None) -> Dict[str, Any]:
+        """
+        计算本次尝试的各分项耗时
+
+        Args:
+            end: 响应体读取完成的时刻，默认当前时刻
+
+        Returns:
+            {"connect", "tls", "send", "ttfb", "body", "total", "reused"}；
+            连接失败等没有到达的阶段记为 None
+        """
+        end = time.perf_counter() if end is None else end
+        spans = {"connect": self.connect, "tls": self.tls, "reused": self.reused,
+                 "send": None, "ttfb": None, "body": None, "total": end - self.start}
+        if self.sent_at is not None:
+            # 发送阶段含等待连接池空闲连接的时间
+            spans["send"] = max(0.0, self.sent_at - self.start - self.connect - self.tls)
+        if self.sent_at is not None and self.headers_at is not None:
+            spans["ttfb"] = self.headers_at - self.sent_at
+            spans["body"] = max(0.0, end - self.headers_at)
+        return spans
+
+
+def begin_attempt() -> AttemptTimer:
+    """开始记录当前线程的一次请求尝试，期间经过计时连接的事件都会记入返回的计时器"""
+    timer = AttemptTimer()
+    _local.timer = timer
+    return timer
+
+
+def end_attempt(timer: AttemptTimer) -> Dict[str, Any]:
+    """结束记录，返回本次尝试的分项耗时"""
+    _local.timer = None
+    return timer.spans()
+
+
+def _current() -> Optional[AttemptTimer]:
+    return getattr(_local, "timer", None)
+
+
+class _TimingMixin:
+    """给urllib3连接加上建连、TLS、请求发送和响应头到达的打点"""
+
+    def _new_conn(self):
+        start = time.perf_counter()
+        sock = super()._new_conn()
+        timer = _current()
+        if timer:
+            timer.connect += time.perf_counter() - start
+            timer.reused = False
+        return sock
+
+    def connect(self):
+        start = time.perf_counter()
+        timer = _current()
+        connect_before = timer.connect if timer else 0.0
+        super().connect()
+        if timer:
+            # connect() 内部调用 _new_conn，其余时间为TLS握手或代理隧道
+            elapsed = time.perf_counter() - start
+            timer.tls += max(0.0, elapsed - (timer.connect - connect_before))
+
+    def request(self, *args, **kwargs):
+        result = super().request(*args, **kwargs)
+        timer = _current()
+        if timer:
+            timer.sent_at = time.perf_counter()
+        return result
+
+    def getresponse(self, *args, **kwargs):
+        response = super().getresponse(*args, **kwargs)
+        timer = _current()
+        if timer:
+            timer.headers_at = time.perf_counter()
+        return response
+
+
+class TimedHTTPConnection(_TimingMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimingMixin, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+TIMED_POOL_CLASSES = {"http": TimedHTTPConnectionPool, "https": TimedHTTPSConnectionPool}
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """使用计时连接的 HTTPAdapter（直连和HTTP代理都生效）"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = TIMED_POOL_CLASSES
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        manager.pool_classes_by_scheme = TIMED_POOL_CLASSES
+        return manager
+
+
+def summarize_attempts(attempts: List[Dict[str, Any]]) -> Dict[str, float]:
+    """把一道题所有尝试的分项相加，未到达的阶段按0计"""
+    summary = {key: 0.0 for key in SPAN_KEYS}
+    for attempt in attempts:
+        for key in SPAN_KEYS:
+            summary[key] += attempt.get(key) or 0.0
+    return summary
+
+
+def _percentile(values: List[float], q: float) -> float:
+    index = min(len(values) - 1, int(q * len(values)))
+    return values[index]
+
+
+def latency_percentiles(results: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """
+    汇总各题的延迟分解
+
+    Returns:
+        {"questions": 题数, 分项: {"p50", "p90", "p99", "max", "mean"}}，没有分解数据时返回空字典
+    """
+    summaries = [r["latency"]["summary"] for r in results if r.get("latency")]
+    if not summaries:
+        return {}
+
+    report = {"questions": len(summaries)}
+    for key in SPAN_KEYS:
+        values = sorted(s.get(key, 0.0) for s in summaries)
+        report[key] = {
+            "p50": _percentile(values, 0.5),
+            "p90": _percentile(values, 0.9),
+            "p99": _percentile(values, 0.99),
+            "max": values[-1],
+            "mean": sum(values) / len(values),
+        }
+    return report
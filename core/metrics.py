@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+运行指标
+在本地HTTP端口上暴露运行器的进度、吞吐和token消耗，供监控脚本或Prometheus抓取:
+    GET /metrics       Prometheus 文本格式
+    GET /metrics.json  JSON 格式
+
+计数器和状态量在抓取时由运行器的 collect 回调直接给出（不扫描结果列表），
+延迟直方图在每题完成时累加，抓取开销与已完成题数无关。
+"""
+
+import json
+import time
+import bisect
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Callable, Dict, Any, List, Optional
+
+METRIC_PREFIX = "gpqa"
+
+# 单题耗时的直方图分桶（秒），推理模型单题可达十几分钟
+QUESTION_BUCKETS = [1, 5, 15, 30, 60, 120, 300, 600, 900, 1800, 3600]
+# 建连、首字节等分项的分桶（秒）
+SPAN_BUCKETS = [0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300]
+
+# 每题完成时观测的分项: 直方图名 -> (分桶, 取值函数)
+RESULT_HISTOGRAMS = {
+    "question_seconds": (QUESTION_BUCKETS, lambda r: r.get("total_time")),
+    "api_seconds": (QUESTION_BUCKETS, lambda r: r.get("api_time")),
+    "connect_seconds": (SPAN_BUCKETS, lambda r: r.get("latency", {}).get("summary", {}).get("connect")),
+    "ttfb_seconds": (SPAN_BUCKETS + [600, 900, 1800], lambda r: r.get("latency", {}).get("summary", {}).get("ttfb")),
+}
+
+
+class Histogram:
+    """固定分桶的直方图（累计计数，与Prometheus语义一致）"""
+
+    def __init__(self, buckets: List[float]):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[int]:
+        """每个分桶上界（含 +Inf）的累计计数"""
+        total, result = 0, []
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+
+class RunMetrics:
+    """运行指标：collect 回调给出计数器/状态量，直方图由 observe_result 累加"""
+
+    def __init__(self, collect: Callable[[], Dict[str, Dict[str, float]]]):
+        """
+        Args:
+            collect: 返回 {"counters": {名称: 值}, "gauges": {名称: 值}} 的回调，每次抓取时调用一次
+        """
+        self.collect = collect
+        self.started_at = time.time()
+        self.histograms = {name: Histogram(buckets) for name, (buckets, _) in RESULT_HISTOGRAMS.items()}
+        self.lock = threading.Lock()
+
+    def observe_result(self, result: Dict[str, Any]):
+        """记录一道最终完成的题目（含失败）"""
+        with self.lock:
+            for name, (_, extract) in RESULT_HISTOGRAMS.items():
+                value = extract(result)
+                if value is not None:
+                    self.histograms[name].observe(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """当前指标的JSON结构"""
+        values = self.collect()
+        with self.lock:
+            histograms = {
+                name: {
+                    "buckets": dict(zip([str(b) for b in h.buckets] + ["+Inf"], h.cumulative())),
+                    "sum": h.sum,
+                    "count": h.count,
+                }
+                for name, h in self.histograms.items()
+            }
+        return {
+            "timestamp": time.time(),
+            "uptime_seconds": time.time() - self.started_at,
+            "counters": values.get("counters", {}),
+            "gauges": values.get("gauges", {}),
+            "histograms": histograms,
+        }
+
+    def render_prometheus(self) -> str:
+        """Prometheus 文本格式（计数器加 _total 后缀）"""
+        snapshot = self.snapshot()
+        lines = [
+            f"# TYPE {METRIC_PREFIX}_uptime_seconds gauge",
+            f"{METRIC_PREFIX}_uptime_seconds {snapshot['uptime_seconds']:.3f}",
+        ]
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name}_total counter")
+            lines.append(f"{METRIC_PREFIX}_{name}_total {value}")
+        for name, value in sorted(snapshot["gauges"].items()):
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} gauge")
+            lines.append(f"{METRIC_PREFIX}_{name} {value}")
+        for name, histogram in snapshot["histograms"].items():
+            metric = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# TYPE {metric} histogram")
+            for bound, count in histogram["buckets"].items():
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {count}')
+            lines.append(f"{metric}_sum {histogram['sum']:.6f}")
+            lines.append(f"{metric}_count {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """/metrics 和 /metrics.json"""
+
+    metrics: RunMetrics = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: str, content_type: str):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            self._send(200, self.metrics.render_prometheus(), "text/plain; version=0.0.4; charset=utf-8")
+        elif path == "/metrics.json":
+            self._send(200, json.dumps(self.metrics.snapshot(), ensure_ascii=False), "application/json")
+        else:
+            self._send(404, "not found\n", "text/plain; charset=utf-8")
+
+
+def start_metrics_server(metrics: RunMetrics, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    在后台守护线程中启动指标服务
+
+    Args:
+        metrics: 运行指标
+        port: 监听端口，0 表示由系统分配（实际端口见 server.server_address）
+        host: 监听地址，默认只对本机开放
+
+    Returns:
+        已启动的服务器，调用 shutdown() 停止
+    """
+    handler = type("BoundMetricsHandler", (MetricsHandler,), {"metrics": metrics})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    return server
+
+
+def fetch_metrics(url: str, timeout: float = 5) -> Optional[Dict[str, Any]]:
+    """读取 /metrics.json，服务不可用时返回 None"""
+    import urllib.request
+
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+    except (OSError, ValueError):
+        return None
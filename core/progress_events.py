@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+进度事件流
+运行器每完成/失败/重新排队一题向日志目录追加一行JSON事件，监控器按文件偏移增量读取，
+不再反复解析整个检查点和日志文件
+
+事件格式（每行一个）:
+    {"ts": 1760000000.0, "event": "run_start", "mode": "sync", "target": 448, "completed": 120, "concurrency": 8}
+    {"ts": ..., "event": "result", "question_id": 12, "correct": true, "error_class": null, "total_time": 35.2, ...}
+    {"ts": ..., "event": "failure", "question_id": 13, "error_class": "retries_exhausted", "attempts": 1}
+    {"ts": ..., "event": "requeue", "question_id": 14}
+    {"ts": ..., "event": "checkpoint", "completed": 150}
+    {"ts": ..., "event": "run_end", "completed_in_run": 328, "elapsed": 5400.0}
+
+run_start 的 target/completed 只统计本次运行的题目范围；result 只在题目最终完成（含重试耗尽的失败）时发出，
+失败后重新分发的题目发 failure。
+"""
+
+import json
+import time
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+EVENTS_FILENAME = "progress_events.jsonl"
+
+
+def events_path_for(log_dir) -> Path:
+    """日志目录对应的进度事件文件"""
+    return Path(log_dir) / EVENTS_FILENAME
+
+
+class ProgressEventWriter:
+    """追加写进度事件，每行写完即 flush，监控器读到的总是完整的行"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.lock = threading.Lock()
+
+    def emit(self, event: str, **fields):
+        line = json.dumps({"ts": time.time(), "event": event, **fields}, ensure_ascii=False)
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class EventTail:
+    """
+    按偏移增量读取事件文件（类似 tail -F）
+
+    只保存读取偏移和未读完的半行；文件被截断或替换（inode 变化）时从头读取。
+    """
+
+    def __init__(self, path, from_end: bool = False):
+        """
+        Args:
+            path: 事件文件路径
+            from_end: True 时跳过已有内容，只读取之后追加的事件
+        """
+        self.path = Path(path)
+        self.offset = 0
+        self.inode = None
+        self.partial = b""
+        if from_end and self.path.exists():
+            stat = self.path.stat()
+            self.offset, self.inode = stat.st_size, stat.st_ino
+
+    def read_new(self, max_bytes: int = 1024 * 1024) -> List[Dict[str, Any]]:
+        """读取上次之后新增的完整事件，最多读取 max_bytes 字节"""
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return []
+
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            self.offset, self.inode, self.partial = 0, stat.st_ino, b""
+        if stat.st_size == self.offset:
+            return []
+
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(max_bytes)
+        self.offset += len(data)
+
+        lines = (self.partial + data).split(b"\n")
+        self.partial = lines.pop()
+        events = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                # 写入中途崩溃留下的残行
+                continue
+        return events
+
+
+class ProgressTracker:
+    """根据事件流计算滚动吞吐、预计剩余时间、错误率和停滞时长，内存只与窗口内事件数有关"""
+
+    def __init__(self, window: float = 600, stall_seconds: float = 1800):
+        """
+        Args:
+            window: 滚动统计窗口（秒）
+            stall_seconds: 距上一个事件超过该时长视为停滞
+        """
+        self.window = window
+        self.stall_seconds = stall_seconds
+        self.target = None
+        self.completed = 0
+        self.errors = 0
+        self.correct = 0
+        self.running = False
+        self.started_at = None
+        self.last_event_at = None
+        # 窗口内的事件: (时间, "ok" / "error" / "failure")
+        self.recent = deque()
+
+    def feed(self, event: Dict[str, Any]):
+        ts = event.get("ts", time.time())
+        self.last_event_at = ts
+        kind = event.get("event")
+
+        if kind == "run_start":
+            self.target = event.get("target")
+            self.completed = event.get("completed", self.completed)
+            self.errors = self.correct = 0
+            self.running = True
+            self.started_at = ts
+            self.recent.clear()
+        elif kind == "result":
+            self.completed += 1
+            failed = event.get("error_class") is not None
+            self.errors += failed
+            self.correct += bool(event.get("correct"))
+            self.recent.append((ts, "error" if failed else "ok"))
+        elif kind == "failure":
+            self.recent.append((ts, "failure"))
+        elif kind == "run_end":
+            self.running = False
+        self._expire(ts)
+
+    def _expire(self, now: float):
+        while self.recent and self.recent[0][0] < now - self.window:
+            self.recent.popleft()
+
+    def seconds_since_last_event(self, now: Optional[float] = None) -> Optional[float]:
+        if self.last_event_at is None:
+            return None
+        return (now or time.time()) - self.last_event_at
+
+    def is_stalled(self, now: Optional[float] = None) -> bool:
+        """运行中且距上一个事件超过 stall_seconds"""
+        idle = self.seconds_since_last_event(now)
+        return self.running and idle is not None and idle > self.stall_seconds
+
+    def summary(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Returns:
+            completed / target / correct、errors（本次运行）/ throughput_per_min（窗口内最终完成的题目）/ eta_seconds /
+            error_rate（窗口内失败和重新分发的占比）/ idle_seconds / stalled
+        """
+        now = now or time.time()
+        self._expire(now)
+        finished = sum(1 for _, kind in self.recent if kind != "failure")
+        failed = sum(1 for _, kind in self.recent if kind != "ok")
+        # 运行开始不足一个窗口时按实际经过的时间计算
+        span = min(self.window, now - self.started_at) if self.started_at else self.window
+        throughput = finished / span * 60 if span > 0 else 0.0
+
+        eta = None
+        if self.target is not None and throughput > 0:
+            eta = max(0, self.target - self.completed) / throughput * 60
+
+        return {
+            "completed": self.completed,
+            "target": self.target,
+            "correct": self.correct,
+            "errors": self.errors,
+            "throughput_per_min": throughput,
+            "eta_seconds": eta,
+            "error_rate": failed / len(self.recent) if self.recent else 0.0,
+            "idle_seconds": self.seconds_since_last_event(now),
+            "stalled": self.is_stalled(now),
+            "running": self.running,
+        }
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+GPQA题目格式化
+预处理脚本、数据集加载器和测试运行器共用同一套选项打乱和提示构建逻辑，
+保证所有入口对同一道题给出相同的选项顺序
+"""
+
+import json
+import random
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, Any, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+ANSWER_INSTRUCTION = "请只回答字母 (A, B, C 或 D)。"
+
+# 预处理产物的格式版本
+PROCESSED_FORMAT_VERSION = 1
+
+
+def build_question(item: Dict[str, Any], question_id: int, seed: int = 0) -> Dict[str, Any]:
+    """
+    把原始GPQA题目转换为评测用的格式
+
+    1. 提取答案内容，去除"Correct Answer"等标签
+    2. 以 seed + question_id 为种子打乱选项（固定种子保证可重复）
+    3. 构建提示并记录正确答案字母
+
+    Args:
+        item: 原始题目数据
+        question_id: 题目在数据集中的索引
+        seed: 全局随机种子
+
+    Returns:
+        处理后的题目
+    """
+    question = item["Question"]
+    incorrect_answers = [
+        item.get("Incorrect Answer 1", ""),
+        item.get("Incorrect Answer 2", ""),
+        item.get("Incorrect Answer 3", "")
+    ]
+
+    all_answers = [(item["Correct Answer"], True)] + [(ans, False) for ans in incorrect_answers if ans]
+    # 使用独立的Random实例，不影响（也不受影响于）全局随机状态
+    random.Random(seed + question_id).shuffle(all_answers)
+
+    options = []
+    correct_letter = None
+    for i, (answer, is_correct) in enumerate(all_answers):
+        letter = chr(65 + i)  # A, B, C, D
+        options.append(f"{letter}. {answer}")
+        if is_correct:
+            correct_letter = letter
+
+    prompt = f"{question}\n\n" + "\n".join(options) + f"\n\n{ANSWER_INSTRUCTION}"
+
+    return {
+        "question_id": question_id,
+        "prompt": prompt,
+        "correct_answer": correct_letter,
+        "question": question,
+        "domain": item.get("High-level domain", "unknown"),
+        "subdomain": item.get("Subdomain", "unknown"),
+    }
+
+
+def content_hash(questions: List[Dict[str, Any]]) -> str:
+    """计算处理后题目的内容哈希，用于确认不同运行使用的是同一份数据"""
+    canonical = json.dumps(questions, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def write_processed(path, questions: List[Dict[str, Any]], seed: int, source: str) -> str:
+    """
+    写入预处理产物
+
+    Args:
+        path: 输出路径
+        questions: build_question 的结果列表
+        seed: 打乱选项使用的全局种子
+        source: 数据来源（数据集名/子集）
+
+    Returns:
+        内容哈希
+    """
+    digest = content_hash(questions)
+    artifact = {
+        "format_version": PROCESSED_FORMAT_VERSION,
+        "source": source,
+        "seed": seed,
+        "total_questions": len(questions),
+        "content_hash": digest,
+        "questions": questions,
+    }
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(artifact, f, ensure_ascii=False, separators=(",", ":"))
+    return digest
+
+
+def load_processed(path) -> Dict[str, Any]:
+    """
+    读取预处理产物并校验内容哈希
+
+    Raises:
+        ValueError: 格式版本不支持或内容哈希不匹配
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        artifact = json.load(f)
+
+    if not isinstance(artifact, dict) or artifact.get("format_version") != PROCESSED_FORMAT_VERSION:
+        raise ValueError(f"不支持的预处理数据格式: {path}，请重新运行 scripts/preprocess_gpqa.py")
+
+    if content_hash(artifact["questions"]) != artifact["content_hash"]:
+        raise ValueError(f"预处理数据内容哈希不匹配: {path}")
+
+    return artifact
+
+
+def load_questions(question_store, processed_data) -> Tuple[Sequence[Dict[str, Any]], str]:
+    """
+    加载预处理好的题目（所有入口共用，保证选项顺序一致）
+
+    优先使用内存映射的题目存储（按需读取单题），其次是JSON预处理产物，
+    都没有时退回到从HuggingFace加载并用 build_question 现场格式化。
+
+    Args:
+        question_store: 题目存储路径（scripts/preprocess_gpqa.py 生成）
+        processed_data: JSON预处理产物路径
+
+    Returns:
+        (可按题目ID索引的题目序列, 内容哈希)
+    """
+    from core.question_store import QuestionStore
+
+    question_store, processed_data = Path(question_store), Path(processed_data)
+    if question_store.exists():
+        logger.info(f"打开题目存储: {question_store}")
+        questions = QuestionStore(question_store)
+        return questions, questions.content_hash
+    if processed_data.exists():
+        logger.info(f"加载预处理数据: {processed_data}")
+        artifact = load_processed(processed_data)
+        return artifact["questions"], artifact["content_hash"]
+
+    logger.warning(
+        f"未找到预处理数据 {processed_data}，改为从HuggingFace加载"
+        f"（建议先运行 scripts/preprocess_gpqa.py）"
+    )
+    from datasets import load_dataset
+    dataset = load_dataset("Idavidrein/gpqa", "gpqa_main", split="train")
+    questions = [build_question(item, i) for i, item in enumerate(dataset)]
+    return questions, content_hash(questions)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+内存映射的题目存储
+二进制格式 + 偏移索引，get_question(i) 只反序列化一道题，
+多个进程打开同一文件时共享页缓存
+
+文件布局:
+    MAGIC (8字节) | 题目数 N (uint64) | 内容哈希 (64字节ASCII)
+    | 偏移表 (N+1 个 uint64，相对数据区起点) | 数据区 (逐题UTF-8 JSON)
+"""
+
+import json
+import mmap
+import struct
+from pathlib import Path
+from typing import Dict, Any, Iterator, List
+
+MAGIC = b"GPQAQS01"
+_HEADER = struct.Struct("<8sQ64s")
+_OFFSET = struct.Struct("<Q")
+
+
+class QuestionStore:
+    """只读的题目存储，支持O(1)随机访问"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path: 由 QuestionStore.build 生成的文件
+        """
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count, digest = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"不是有效的题目存储文件: {self.path}")
+
+        self.count = count
+        self.content_hash = digest.decode("ascii")
+        self._index_start = _HEADER.size
+        self._data_start = self._index_start + (count + 1) * _OFFSET.size
+
+    @staticmethod
+    def build(path, questions: List[Dict[str, Any]], content_hash: str):
+        """
+        写入题目存储
+
+        Args:
+            path: 输出路径
+            questions: 处理后的题目列表（按题目索引排列）
+            content_hash: 预处理产物的内容哈希
+        """
+        records = [json.dumps(q, ensure_ascii=False, separators=(",", ":")).encode("utf-8") for q in questions]
+
+        offsets = [0]
+        for record in records:
+            offsets.append(offsets[-1] + len(record))
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, len(records), content_hash.encode("ascii")))
+            f.write(b"".join(_OFFSET.pack(offset) for offset in offsets))
+            for record in records:
+                f.write(record)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, question_id: int) -> Dict[str, Any]:
+        return self.get_question(question_id)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(self.count):
+            yield self.get_question(i)
+
+    def get_question(self, question_id: int) -> Dict[str, Any]:
+        """读取一道题目，只解析这一条记录"""
+        if not 0 <= question_id < self.count:
+            raise IndexError(f"题目ID {question_id} 超出范围（共{self.count}题）")
+
+        entry = self._index_start + question_id * _OFFSET.size
+        start = _OFFSET.unpack_from(self._mm, entry)[0]
+        end = _OFFSET.unpack_from(self._mm, entry + _OFFSET.size)[0]
+        return json.loads(self._mm[self._data_start + start:self._data_start + end])
+
+    def close(self):
+        """关闭映射和文件"""
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def read_question_count(path) -> int:
+    """只读取文件头获取题目数"""
+    with open(path, "rb") as f:
+        magic, count, _ = _HEADER.unpack(f.read(_HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(f"不是有效的题目存储文件: {path}")
+    return count
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+客户端限流器
+按令牌桶同时限制每分钟请求数（RPM）和每分钟token数（TPM）
+"""
+
+import time
+import threading
+from typing import Optional
+
+
+class TokenBucket:
+    """令牌桶，容量为每分钟预算，按秒匀速补充"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self):
+        """按流逝时间补充令牌"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """距离可扣除 amount 个令牌还需等待的秒数"""
+        # 单次消耗超过桶容量时按满桶处理，避免永远等不到
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """同时限制RPM和TPM的线程安全限流器"""
+
+    def __init__(self, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None,
+                 default_token_estimate: int = 5000,
+                 smoothing: float = 0.2):
+        """
+        Args:
+            requests_per_minute: 每分钟请求数上限，None 表示不限制
+            tokens_per_minute: 每分钟token数上限，None 表示不限制
+            default_token_estimate: 尚无历史数据时对单次请求token数的估计
+            smoothing: 历史token用量指数滑动平均的权重
+        """
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.token_estimate = float(default_token_estimate)
+        self.smoothing = smoothing
+        self.lock = threading.Lock()
+
+    def estimate_tokens(self) -> int:
+        """根据已完成请求的 usage.total_tokens 估计下一次请求的消耗"""
+        with self.lock:
+            return int(self.token_estimate)
+
+    def acquire(self, estimated_tokens: Optional[int] = None) -> int:
+        """
+        阻塞直到RPM和TPM预算都足够，然后预扣预算
+
+        Args:
+            estimated_tokens: 本次请求预计消耗的token数，默认使用历史估计
+
+        Returns:
+            实际预扣的token数，请求结束后传给 record_usage 结算
+        """
+        while True:
+            with self.lock:
+                if estimated_tokens is None:
+                    estimated_tokens = int(self.token_estimate)
+
+                wait = 0.0
+                for bucket, amount in ((self.request_bucket, 1), (self.token_bucket, estimated_tokens)):
+                    if bucket:
+                        bucket.refill()
+                        wait = max(wait, bucket.wait_time(amount))
+
+                if wait == 0.0:
+                    if self.request_bucket:
+                        self.request_bucket.tokens -= 1
+                    if self.token_bucket:
+                        self.token_bucket.tokens -= min(estimated_tokens, self.token_bucket.capacity)
+                    return estimated_tokens
+
+            time.sleep(wait)
+
+    def record_usage(self, actual_tokens: int, reserved_tokens: int):
+        """
+        用实际token消耗结算预扣额度，并更新估计值
+
+        Args:
+            actual_tokens: 响应中的 usage.total_tokens，请求失败时传 0
+            reserved_tokens: acquire 返回的预扣数
+        """
+        with self.lock:
+            if self.token_bucket:
+                self.token_bucket.refill()
+                # 多扣的退回，少扣的补扣（允许短暂透支，由后续请求等待偿还）
+                self.token_bucket.tokens = min(
+                    self.token_bucket.capacity,
+                    self.token_bucket.tokens + reserved_tokens - actual_tokens
+                )
+            if actual_tokens > 0:
+                self.token_estimate += self.smoothing * (actual_tokens - self.token_estimate)
+
+
+_shared_limiter = None
+_shared_lock = threading.Lock()
+
+
+def get_rate_limiter(requests_per_minute: Optional[float] = None,
+                     tokens_per_minute: Optional[float] = None) -> RateLimiter:
+    """
+    获取进程内共享的限流器
+
+    第一次调用时按给定预算创建，之后所有调用方共用同一个实例，
+    保证同一进程中的所有API调用路径合计不超过配额。
+    """
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        return _shared_limiter
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+响应缓存
+按 (base_url, model, messages, temperature, max_tokens) 的哈希把API响应存入SQLite，
+重跑子集或更换答案提取逻辑时无需再次调用API；键中包含API地址，指向本地模拟服务器时的响应不会被真实运行命中
+"""
+
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+
+class ResponseCache:
+    """基于SQLite的内容寻址响应缓存"""
+
+    def __init__(self, path, max_bytes: Optional[int] = None, replay: bool = False):
+        """
+        Args:
+            path: SQLite文件路径
+            max_bytes: 缓存内容的总大小上限，超过后按最近最少使用淘汰；None 表示不限制
+            replay: 回放模式，只读缓存，未命中时不允许调用API
+        """
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.replay = replay
+        self.lock = threading.Lock()
+
+        if replay:
+            # 只读打开，回放过程中不会修改缓存文件
+            self.conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    response TEXT NOT NULL,
+                    usage TEXT,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+            self.conn.commit()
+
+    @classmethod
+    def from_config(cls, cache_config: Dict[str, Any], path) -> Optional["ResponseCache"]:
+        """根据 CACHE_CONFIG 创建缓存，未启用时返回 None"""
+        if not cache_config.get("enabled"):
+            return None
+        return cls(path, max_bytes=cache_config.get("max_bytes"), replay=cache_config.get("replay", False))
+
+    @staticmethod
+    def make_key(base_url: str, model: str, messages: List[Dict[str, Any]], temperature: Any, max_tokens: Any) -> str:
+        """计算请求的缓存键"""
+        payload = json.dumps(
+            {"base_url": base_url, "model": model, "messages": messages,
+             "temperature": temperature, "max_tokens": max_tokens},
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def key_for_request(cls, base_url: str, data: Dict[str, Any]) -> str:
+        """根据请求地址和 chat completion 请求体计算缓存键"""
+        return cls.make_key(base_url, data.get("model"), data.get("messages"),
+                            data.get("temperature"), data.get("max_tokens"))
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        查询缓存
+
+        Returns:
+            原始响应（与非流式 response.json() 结构相同），未命中返回 None
+        """
+        with self.lock:
+            row = self.conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if not self.replay:
+                self.conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+                self.conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, response: Dict[str, Any]):
+        """写入缓存，并在超过大小上限时淘汰最久未使用的条目"""
+        if self.replay:
+            return
+
+        text = json.dumps(response, ensure_ascii=False)
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, usage, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, response.get("model"), text, json.dumps(response.get("usage", {})),
+                 len(text.encode("utf-8")), now, now)
+            )
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        """按最近最少使用淘汰，直到总大小回到上限的90%以内（调用方持有锁）"""
+        if not self.max_bytes:
+            return
+
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        target = self.max_bytes * 0.9
+        for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall():
+            if total <= target:
+                break
+            self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+
+    def close(self):
+        """关闭数据库连接"""
+        with self.lock:
+            self.conn.close()
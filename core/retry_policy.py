@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+重试策略
+区分可重试/不可重试的错误，指数退避 + 抖动，并遵守服务端的 Retry-After
+"""
+
+import time
+import random
+import email.utils
+from typing import Dict, Any, Mapping, Optional
+import requests
+
+# 限流、超时和服务端错误可以重试；其余4xx（如400/401/403/404）重试也不会成功
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+# 连接被重置、超时、响应体中途断开等网络层错误
+RETRYABLE_EXCEPTIONS = (
+    requests.exceptions.Timeout,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+
+class RetryPolicy:
+    """重试策略"""
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 5, max_delay: float = 120,
+                 backoff_factor: float = 2, jitter: bool = True):
+        """
+        Args:
+            max_retries: 最大尝试次数（含第一次）
+            base_delay: 第一次重试前的基础等待秒数
+            max_delay: 退避等待的上限
+            backoff_factor: 每次重试等待时间的倍数
+            jitter: 是否加入随机抖动，避免并发请求同时重试
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.backoff_factor = backoff_factor
+        self.jitter = jitter
+
+    @classmethod
+    def from_config(cls, api_config: Dict[str, Any]) -> "RetryPolicy":
+        """从 API_CONFIG 创建"""
+        return cls(
+            max_retries=api_config.get("max_retries", 3),
+            base_delay=api_config.get("retry_delay", 5),
+            max_delay=api_config.get("max_retry_delay", 120),
+            backoff_factor=api_config.get("backoff_factor", 2),
+        )
+
+    def is_retryable_status(self, status_code: int) -> bool:
+        """HTTP状态码是否值得重试"""
+        return status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+
+    def is_retryable_exception(self, exc: Exception) -> bool:
+        """异常是否值得重试"""
+        return isinstance(exc, RETRYABLE_EXCEPTIONS)
+
+    def parse_retry_after(self, headers: Mapping[str, str]) -> Optional[float]:
+        """
+        解析 Retry-After 响应头
+
+        Args:
+            headers: 响应头
+
+        Returns:
+            建议等待的秒数，没有或无法解析时返回 None
+        """
+        value = headers.get("Retry-After") if headers else None
+        if not value:
+            return None
+
+        value = value.strip()
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+
+        # HTTP-date 格式
+        try:
+            retry_at = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at is None:
+            return None
+        return max(0.0, retry_at.timestamp() - time.time())
+
+    def get_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        计算第 attempt 次尝试失败后的等待时间
+
+        Args:
+            attempt: 已失败的尝试序号（从0开始）
+            retry_after: 服务端给出的 Retry-After 秒数
+
+        Returns:
+            等待秒数
+        """
+        delay = min(self.max_delay, self.base_delay * (self.backoff_factor ** attempt))
+        if self.jitter:
+            # 保留一半的确定性等待，另一半随机
+            delay = delay / 2 + random.uniform(0, delay / 2)
+
+        # 服务端的提示优先，不能比它更早重试
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+
+        return delay
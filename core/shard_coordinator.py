@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+GPQA分片评测协调器
+把题目范围切分给多个工作进程，每个分片使用独立的检查点和日志目录，
+全部结束后合并各分片的结果和统计，生成一份最终报告
+"""
+
+import os
+import sys
+import json
+import datetime
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Any, Tuple
+
+# 添加父目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from configs.config import API_CONFIG
+from core.checkpoint import CheckpointJournal, generation_of, load_latest_valid, journal_path_for
+from core.gpqa_test_resumable import build_report
+
+RUNNER_SCRIPT = Path(__file__).parent / "gpqa_test_resumable.py"
+
+
+def split_range(start: int, count: int, num_shards: int) -> List[Tuple[int, int]]:
+    """
+    把 [start, start+count) 尽量均匀地切成 num_shards 段
+
+    Returns:
+        [(起始索引, 题目数), ...]，不含空分片
+    """
+    base, extra = divmod(count, num_shards)
+    shards = []
+    offset = start
+    for i in range(num_shards):
+        size = base + (1 if i < extra else 0)
+        if size > 0:
+            shards.append((offset, size))
+        offset += size
+    return shards
+
+
+def shard_dir(output_dir: Path, shard_id: int) -> Path:
+    """分片的检查点/日志命名空间"""
+    return output_dir / f"shard_{shard_id:02d}"
+
+
+def get_api_keys() -> List[str]:
+    """读取API密钥列表：XAI_API_KEYS（逗号分隔）优先，否则使用 XAI_API_KEY"""
+    keys = [k.strip() for k in os.getenv("XAI_API_KEYS", "").split(",") if k.strip()]
+    if not keys and os.getenv("XAI_API_KEY"):
+        keys = [os.getenv("XAI_API_KEY")]
+    if not keys:
+        raise ValueError("请设置环境变量 XAI_API_KEYS 或 XAI_API_KEY")
+    return keys
+
+
+def launch_shards(shards: List[Tuple[int, int]], output_dir: Path, concurrency: int,
+                  metrics_port: int = None) -> List[subprocess.Popen]:
+    """
+    为每个分片启动一个工作进程，多个API密钥按分片轮流分配
+
+    每个密钥的RPM/TPM预算（API_CONFIG）由共用该密钥的分片平分，各分片的限流器只使用自己的份额，
+    合计不超过该密钥的配额。指定 metrics_port 时分片 i 的指标服务监听 metrics_port + i
+    """
+    api_keys = get_api_keys()
+    processes = []
+    shards_per_key = [len(range(k, len(shards), len(api_keys))) for k in range(len(api_keys))]
+
+    for shard_id, (start, count) in enumerate(shards):
+        directory = shard_dir(output_dir, shard_id)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        key_index = shard_id % len(api_keys)
+        env = os.environ.copy()
+        env["XAI_API_KEY"] = api_keys[key_index]
+
+        cmd = [
+            sys.executable, str(RUNNER_SCRIPT), str(count), str(start),
+            "--checkpoint", str(directory / "gpqa_checkpoint.json"),
+            "--log-dir", str(directory / "logs"),
+            "--concurrency", str(concurrency),
+        ]
+        for flag, budget in (("--requests-per-minute", API_CONFIG.get("requests_per_minute")),
+                             ("--tokens-per-minute", API_CONFIG.get("tokens_per_minute"))):
+            if budget:
+                cmd += [flag, str(budget / shards_per_key[key_index])]
+        if metrics_port is not None:
+            cmd += ["--metrics-port", str(metrics_port + shard_id)]
+        log_file = open(directory / "worker.log", "a", encoding="utf-8")
+        process = subprocess.Popen(cmd, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+        log_file.close()
+
+        metrics_info = f", 指标端口: {metrics_port + shard_id}" if metrics_port is not None else ""
+        print(f"分片 {shard_id}: 题目 {start}-{start + count - 1} (PID: {process.pid}{metrics_info})")
+        processes.append(process)
+
+    return processes
+
+
+def load_shard_state(checkpoint_file: Path) -> Dict[str, Any]:
+    """
+    读取一个分片的检查点，并回放其日志中尚未压缩的结果
+
+    仍在重试预算内的失败题目和被中断的在途题目不计入结果，记为待处理
+    """
+    data, source = load_latest_valid(checkpoint_file)
+    # 只回放未压缩进所读检查点版本的日志
+    generations = generation_of(checkpoint_file, source) + 1 if data else None
+    data = data or {"completed_questions": [], "results": [], "stats": {}}
+
+    completed = set(data["completed_questions"])
+    results = list(data["results"])
+    stats = data.get("stats", {})
+    pending = {int(qid) for qid in data.get("failed_questions", {})}
+    pending.update(data.get("interrupted_questions", []))
+
+    for record in CheckpointJournal(journal_path_for(checkpoint_file)).replay(generations):
+        question_id = record["question_id"]
+        if question_id in completed:
+            continue
+        stats = record.get("stats", stats)
+        if "failure" in record:
+            pending.add(question_id)
+            continue
+        completed.add(question_id)
+        results.append(record["result"])
+
+    return {
+        "results": results,
+        "stats": stats,
+        "pending": pending - completed,
+        "dataset_hash": data.get("dataset_hash")
+    }
+
+
+def merge_shards(output_dir: Path, num_shards: int) -> Path:
+    """
+    合并所有分片的结果和统计，生成最终报告
+
+    Returns:
+        合并报告路径
+    """
+    results_by_id = {}
+    pending = set()
+    stats = {}
+    dataset_hashes = set()
+
+    for shard_id in range(num_shards):
+        checkpoint_file = shard_dir(output_dir, shard_id) / "gpqa_checkpoint.json"
+        state = load_shard_state(checkpoint_file)
+
+        for result in state["results"]:
+            results_by_id[result["question_id"]] = result
+        pending.update(state["pending"])
+        for key, value in state["stats"].items():
+            if isinstance(value, (int, float)):
+                stats[key] = stats.get(key, 0) + value
+        if state["dataset_hash"]:
+            dataset_hashes.add(state["dataset_hash"])
+
+    if len(dataset_hashes) > 1:
+        print(f"⚠️  各分片使用的数据不一致: {sorted(h[:12] for h in dataset_hashes)}")
+
+    results = [results_by_id[qid] for qid in sorted(results_by_id)]
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    report = build_report(results, stats, timestamp, dataset_hashes.pop() if len(dataset_hashes) == 1 else None,
+                          pending=pending - set(results_by_id))
+    report["test_info"]["shards"] = num_shards
+
+    report_file = output_dir / f"gpqa_report_merged_{timestamp}.json"
+    with open(report_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    info = report["test_info"]
+    print(f"\n合并完成: {info['total_questions']} 题, 正确 {info['correct']}, 准确率 {info['accuracy']:.2%}")
+    if info["pending"]:
+        print(f"⚠️  仍有 {info['pending']} 题待重试或被中断，未计入结果；重新运行协调器即可继续")
+    print(f"合并报告已保存到: {report_file}")
+    return report_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程分片运行GPQA评测")
+    parser.add_argument("--shards", type=int, required=True, help="分片（工作进程）数量")
+    parser.add_argument("--start", type=int, default=0, help="起始索引")
+    parser.add_argument("--count", type=int, default=448, help="题目数量")
+    parser.add_argument("--concurrency", type=int, default=1, help="每个工作进程内同时在途的题目数")
+    parser.add_argument("--output-dir", default="results/shards", help="分片检查点和合并报告的目录")
+    parser.add_argument("--merge-only", action="store_true", help="不启动工作进程，只合并已有分片结果")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="分片指标服务的起始端口，分片 i 使用该端口 + i")
+    args = parser.parse_args()
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    shards = split_range(args.start, args.count, args.shards)
+
+    if not args.merge_only:
+        print(f"=== 启动 {len(shards)} 个分片 (题目 {args.start}-{args.start + args.count - 1}) ===")
+        processes = launch_shards(shards, output_dir, args.concurrency, args.metrics_port)
+
+        failed = []
+        for shard_id, process in enumerate(processes):
+            if process.wait() != 0:
+                failed.append(shard_id)
+        if failed:
+            # 已完成的题目都在各自的检查点里，重新运行协调器会从断点继续
+            print(f"⚠️  分片 {failed} 异常退出，合并已完成部分；重新运行即可继续")
+
+    merge_shards(output_dir, len(shards))
+
+
+if __name__ == "__main__":
+    main()
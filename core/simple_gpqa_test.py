@@ -3,82 +3,32 @@
 简单直接的GPQA测试，不使用DeepEval框架
 """
 
-import os
+import sys
 import json
-import time
+from pathlib import Path
 from dotenv import load_dotenv
-from datasets import load_dataset
-import requests
-import random
 
-# 加载环境变量
-load_dotenv()
+# 添加父目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
 
-def call_grok_api(prompt: str, max_retries: int = 3):
-    """直接调用Grok API"""
-    api_key = os.getenv("XAI_API_KEY")
-    if not api_key:
-        raise ValueError("未设置 XAI_API_KEY")
-    
-    url = "https://api.x.ai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    
-    data = {
-        "model": "grok-4",
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0,
-        "max_tokens": 100000  # 设置很大的token限制
-    }
-    
-    # 设置代理
-    proxies = {}
-    if os.environ.get('https_proxy'):
-        proxies = {
-            'http': os.environ.get('http_proxy', ''),
-            'https': os.environ.get('https_proxy', '')
-        }
-    
-    for attempt in range(max_retries):
-        try:
-            response = requests.post(
-                url, 
-                headers=headers, 
-                json=data, 
-                timeout=600,  # 增加到10分钟
-                proxies=proxies
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result['choices'][0]['message']['content']
-            else:
-                print(f"API错误 (尝试 {attempt+1}/{max_retries}): {response.status_code}")
-                print(f"响应: {response.text}")
-                
-        except Exception as e:
-            print(f"请求失败 (尝试 {attempt+1}/{max_retries}): {e}")
-            print(f"错误类型: {type(e).__name__}")
-            import traceback
-            traceback.print_exc()
-            
-        if attempt < max_retries - 1:
-            time.sleep(5)  # 等待5秒后重试
-    
-    return None
+from configs.config import PATHS
+from core.api_client import GrokAPIClient
+from core.question_format import load_questions
 
+# 加载环境变量
+load_dotenv()
 
 def test_gpqa_simple(num_questions: int = 2):
     """简单的GPQA测试"""
     print(f"=== 简单GPQA测试 ({num_questions}题) ===\n")
     
-    # 加载数据集
+    # 加载预处理好的题目（与 gpqa_test_resumable 相同的选项顺序）
     print("加载数据集...")
-    dataset = load_dataset("Idavidrein/gpqa", "gpqa_main", split="train")
-    print(f"成功加载 {len(dataset)} 道题目\n")
+    questions, _ = load_questions(PATHS["question_store"], PATHS["processed_data"])
+    print(f"成功加载 {len(questions)} 道题目\n")
     
+    # 与其他入口共用限流、重试、熔断和连接池
+    client = GrokAPIClient()
     results = []
     correct_count = 0
     
@@ -87,35 +37,9 @@ def test_gpqa_simple(num_questions: int = 2):
         print(f"第 {i+1} 题")
         print(f"{'='*60}")
         
-        item = dataset[i]
-        
-        # 获取问题和答案
-        question = item["Question"]
-        correct_answer = item["Correct Answer"]
-        incorrect_answers = [
-            item["Incorrect Answer 1"],
-            item["Incorrect Answer 2"],
-            item["Incorrect Answer 3"]
-        ]
-        
-        # 过滤空答案并随机排序
-        all_answers = [(correct_answer, True)] + [(ans, False) for ans in incorrect_answers if ans]
-        random.seed(i)  # 固定随机种子
-        random.shuffle(all_answers)
-        
-        # 找出正确答案的位置
-        correct_letter = None
-        options = []
-        for j, (answer, is_correct) in enumerate(all_answers):
-            letter = chr(65 + j)
-            options.append(f"{letter}. {answer}")
-            if is_correct:
-                correct_letter = letter
-        
-        # 构建提示
-        prompt = f"{question}\n\n"
-        prompt += "\n".join(options)
-        prompt += "\n\n请只回答字母 (A, B, C 或 D)。"
+        question = questions[i]
+        prompt = question["prompt"]
+        correct_letter = question["correct_answer"]
         
         # 显示问题预览
         print("\n问题预览（前300字符）:")
@@ -124,9 +48,10 @@ def test_gpqa_simple(num_questions: int = 2):
         
         # 调用API
         print("调用Grok-4...")
-        response = call_grok_api(prompt)
+        api_result = client.call_api(prompt)
         
-        if response:
+        if api_result["success"]:
+            response = api_result["content"]
             print(f"模型原始回答: '{response}'")
             
             # 提取答案字母
@@ -152,11 +77,12 @@ def test_gpqa_simple(num_questions: int = 2):
                 "correct": is_correct
             })
         else:
-            print("API调用失败")
+            print(f"API调用失败: {api_result['error']}")
             results.append({
                 "question_id": i,
                 "expected": correct_letter,
-                "error": "API call failed"
+                "error": api_result["error"],
+                "error_class": api_result.get("error_class", "unknown")
             })
     
     # 总结
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+流式（SSE）响应处理
+增量读取 chat completion 的 SSE 分块，记录首token时间和分块间隔，
+按空闲时间而不是总耗时判断连接是否卡死
+"""
+
+import json
+import time
+from typing import Dict, Any
+import requests
+
+
+class StreamStalledError(requests.exceptions.Timeout):
+    """流式响应在空闲超时内没有任何数据"""
+
+
+def consume_sse(response: requests.Response, request_start: float, idle_timeout: float) -> Dict[str, Any]:
+    """
+    读取SSE流并拼装成与非流式响应相同结构的结果
+
+    Args:
+        response: 以 stream=True 发出的请求的响应
+        request_start: 请求发出的时间戳（time.time()），用于计算首token时间
+        idle_timeout: 允许的最长空闲秒数，超过则抛出 StreamStalledError
+
+    Returns:
+        {"choices": [...], "usage": ..., "model": ..., "stream_metrics": {...}}
+    """
+    # text/event-stream 通常不带charset，不设置的话 iter_lines 会返回 bytes
+    if response.encoding is None:
+        response.encoding = "utf-8"
+
+    content_parts = []
+    usage = {}
+    model = "unknown"
+    finish_reason = None
+
+    last_activity = time.time()
+    first_token_at = None
+    last_chunk_at = None
+    gaps = []
+
+    try:
+        for line in response.iter_lines(decode_unicode=True):
+            now = time.time()
+            if now - last_activity > idle_timeout:
+                raise StreamStalledError(f"流式响应空闲 {now - last_activity:.1f} 秒")
+            # 注释行（心跳）也说明连接还活着
+            last_activity = now
+
+            if not line or not line.startswith("data:"):
+                continue
+
+            payload = line[len("data:"):].strip()
+            if payload == "[DONE]":
+                break
+
+            chunk = json.loads(payload)
+            model = chunk.get("model", model)
+            if chunk.get("usage"):
+                usage = chunk["usage"]
+
+            for choice in chunk.get("choices", []):
+                finish_reason = choice.get("finish_reason") or finish_reason
+                text = (choice.get("delta") or {}).get("content")
+                if not text:
+                    continue
+                if first_token_at is None:
+                    first_token_at = now
+                else:
+                    gaps.append(now - last_chunk_at)
+                last_chunk_at = now
+                content_parts.append(text)
+
+    except requests.exceptions.ConnectionError as e:
+        # 套接字读超时在 iter_lines 中会被包装成 ConnectionError
+        idle = time.time() - last_activity
+        if idle >= idle_timeout:
+            raise StreamStalledError(f"流式响应空闲 {idle:.1f} 秒") from e
+        raise
+
+    finally:
+        # 提前结束读取时也要释放连接回连接池
+        response.close()
+
+    return {
+        "choices": [{
+            "message": {"role": "assistant", "content": "".join(content_parts)},
+            "finish_reason": finish_reason
+        }],
+        "usage": usage,
+        "model": model,
+        "stream_metrics": {
+            "ttft": first_token_at - request_start if first_token_at else None,
+            "chunk_count": len(content_parts),
+            "max_chunk_gap": max(gaps) if gaps else 0.0,
+            "mean_chunk_gap": sum(gaps) / len(gaps) if gaps else 0.0,
+        }
+    }
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+自适应超时策略
+根据本次运行已完成题目的 api_time、question_length、reasoning_tokens，
+按子领域估计每道题的合理耗时，给出单次请求的超时和重试次数。
+超时的请求按已等待时长作为耗时下界计入样本，避免只从先完成的快题学习而把超时越收越短
+"""
+
+import threading
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Tuple
+
+
+def _quantile(values: List[float], q: float) -> float:
+    """已排序列表的分位数（最近秩）"""
+    index = min(len(values) - 1, int(q * len(values)))
+    return values[index]
+
+
+class TimeoutPolicy:
+    """按子领域学习耗时分布的超时策略（线程安全）"""
+
+    def __init__(self, default_timeout: float = 900, max_retries: int = 3,
+                 min_timeout: float = 120, max_timeout: float = 1800,
+                 min_samples: int = 5, percentile: float = 0.95, margin: float = 1.5):
+        """
+        Args:
+            default_timeout: 样本不足时使用的超时（秒）
+            max_retries: 重试次数上限
+            min_timeout: 自适应超时下限（秒）
+            max_timeout: 自适应超时上限（秒）
+            min_samples: 子领域样本少于该值时退回全局样本，全局也不足时使用默认值
+            percentile: 估计耗时所用的分位数
+            margin: 在估计耗时上乘的余量系数
+        """
+        self.default_timeout = default_timeout
+        self.max_retries = max_retries
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.min_samples = min_samples
+        self.percentile = percentile
+        self.margin = margin
+        # 单题总等待预算与固定超时时一致：default_timeout × max_retries
+        self.time_budget = default_timeout * max_retries
+
+        # 子领域 -> [(question_length, api_time, reasoning_tokens), ...]；超时样本的 api_time 为下界，reasoning_tokens 为 0
+        self.samples = defaultdict(list)
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, api_config: Dict[str, Any], timeout_config: Dict[str, Any]) -> "TimeoutPolicy":
+        """从 API_CONFIG / TIMEOUT_CONFIG 构造"""
+        return cls(
+            default_timeout=api_config.get("timeout", 900),
+            max_retries=api_config.get("max_retries", 3),
+            min_timeout=timeout_config.get("min_timeout", 120),
+            max_timeout=timeout_config.get("max_timeout", 1800),
+            min_samples=timeout_config.get("min_samples", 5),
+            percentile=timeout_config.get("percentile", 0.95),
+            margin=timeout_config.get("margin", 1.5)
+        )
+
+    def observe(self, result: Dict[str, Any]):
+        """记录一道成功完成的题目；失败、缓存命中的结果不计入"""
+        if "error" in result or result.get("cached") or not result.get("api_time"):
+            return
+        sample = (
+            result.get("question_length", 0),
+            result["api_time"],
+            result.get("reasoning_tokens", 0)
+        )
+        with self.lock:
+            self.samples[result.get("subdomain", "unknown")].append(sample)
+
+    def observe_timeout(self, subdomain: str, question_length: int, timeout: float):
+        """记录一次读超时：该题实际耗时至少为 timeout，作为下界样本计入"""
+        with self.lock:
+            self.samples[subdomain].append((question_length, timeout, 0))
+
+    def _samples_for(self, subdomain: str) -> Tuple[list, list]:
+        """返回 (估计所用样本, 全局样本)"""
+        with self.lock:
+            all_samples = [s for group in self.samples.values() for s in group]
+            group = list(self.samples.get(subdomain, []))
+        if len(group) >= self.min_samples:
+            return group, all_samples
+        return all_samples, all_samples
+
+    def estimate(self, subdomain: str, question_length: int) -> Optional[float]:
+        """
+        估计该题的耗时上沿（秒），样本不足时返回 None
+
+        取两个估计中较大者，避免截断正常的长推理:
+        1. 子领域 api_time 的分位数，按题目长度相对子领域中位长度缩放
+        2. 子领域 reasoning_tokens 的分位数 ÷ 全局推理速度（token/秒）
+        """
+        samples, all_samples = self._samples_for(subdomain)
+        if len(samples) < self.min_samples:
+            return None
+
+        times = sorted(s[1] for s in samples)
+        lengths = sorted(s[0] for s in samples)
+        by_time = _quantile(times, self.percentile)
+        median_length = _quantile(lengths, 0.5)
+        if median_length > 0:
+            # 长度只做温和修正，推理量与题干长度并非线性相关
+            by_time *= min(1.5, max(0.75, question_length / median_length))
+
+        by_tokens = 0.0
+        rates = sorted(s[2] / s[1] for s in all_samples if s[2] > 0)
+        reasoning = sorted(s[2] for s in samples if s[2] > 0)
+        if rates and reasoning:
+            by_tokens = _quantile(reasoning, self.percentile) / _quantile(rates, 0.5)
+
+        return max(by_time, by_tokens)
+
+    def plan(self, subdomain: str, question_length: int, requeues: int = 0) -> Tuple[float, int]:
+        """
+        给出该题的单次请求超时和重试次数
+
+        超时不低于估计所用样本（子领域样本足够时只用本子领域）的分位耗时 × margin，
+        即题目长度修正只放宽不收紧；超时下界样本也计入分位数，先完成的快题不会把超时越收越短。
+        重新分发的题目每分发一次把估计超时加倍，不会以同样短的超时反复失败。
+        超时越长重试次数越少，单题总等待时间不超过 time_budget。
+
+        Args:
+            subdomain: 子领域
+            question_length: 题干长度
+            requeues: 该题在本次运行中已被重新分发的次数
+
+        Returns:
+            (超时秒数, 最多尝试次数)
+        """
+        estimate = self.estimate(subdomain, question_length)
+        if estimate is None:
+            timeout = self.default_timeout
+        else:
+            timeout = max(self.min_timeout, estimate * self.margin)
+        timeout *= 2 ** requeues
+
+        samples, _ = self._samples_for(subdomain)
+        if len(samples) >= self.min_samples:
+            floor = _quantile(sorted(s[1] for s in samples), self.percentile) * self.margin
+            timeout = max(timeout, floor)
+
+        # 上限不低于固定超时，样本不足时的行为与关闭自适应时一致
+        timeout = min(max(self.max_timeout, self.default_timeout), timeout)
+        retries = max(1, min(self.max_retries, int(self.time_budget // timeout)))
+        return timeout, retries
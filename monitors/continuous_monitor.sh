@@ -1,5 +1,11 @@
 #!/bin/bash
 # 持续监控脚本 - 每5分钟检查一次进程状态
+# 单机长时间运行建议改用任务队列模式（python core/job_queue.py worker ...）：
+# 卡住的工作进程租约过期后，其题目会自动转交给其他工作进程，无需 kill -9 重启。
+# 任务队列基于 SQLite WAL，只支持同一台机器上的工作进程，不要放在网络文件系统上共享；
+# 多机运行请改用分片协调器（python core/shard_coordinator.py --shards N ...）
+# 单机运行建议改用监督进程（python monitors/supervisor.py -- 448 --concurrency 8）：
+# 按心跳判断卡住，SIGTERM 让运行器保存检查点后再重启
 
 echo "=== 持续监控器启动 ==="
 echo "开始时间: $(date)"
@@ -44,7 +50,13 @@ while true; do
             if [ $TIME_DIFF -gt 900 ]; then
                 echo "  ⚠️  警告：进程可能卡住了（15分钟无更新）"
                 echo "  终止卡住的进程..."
-                kill -9 $TEST_PID
+                # 先 SIGTERM 让运行器保存检查点，2分钟内未退出再强制结束
+                kill -TERM $TEST_PID
+                for _ in $(seq 120); do
+                    kill -0 $TEST_PID 2>/dev/null || break
+                    sleep 1
+                done
+                kill -9 $TEST_PID 2>/dev/null
                 sleep 2
                 
                 echo "  重新启动测试..."
@@ -5,14 +5,48 @@ GPQA评测持续监控器
 """
 
 import os
+import sys
 import time
 import json
+import argparse
 import subprocess
 from datetime import datetime
 from pathlib import Path
 
+# 添加父目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from configs.config import MONITOR_CONFIG
+from core.metrics import fetch_metrics
+from core.progress_events import EventTail, ProgressTracker, events_path_for
+
+
+def tail_lines(path, count=5, block_size=4096):
+    """读取文件最后 count 行，只读取文件末尾的数据块"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        data = b''
+        while size > 0 and data.count(b'\n') <= count:
+            step = min(block_size, size)
+            size -= step
+            f.seek(size)
+            data = f.read(step) + data
+    return data.decode('utf-8', errors='replace').splitlines()[-count:]
+
+
+def format_duration(seconds):
+    """秒数 -> 1h02m / 5m30s"""
+    if seconds is None:
+        return "未知"
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    return f"{seconds // 60}m{seconds % 60:02d}s"
+
 class ContinuousMonitor:
-    def __init__(self):
+    def __init__(self, metrics_url=None):
+        self.metrics_url = metrics_url  # 运行器的 /metrics.json，设置后不再解析检查点
         self.checkpoint_file = Path("gpqa_checkpoint.json")
         self.log_dir = Path("gpqa_logs")
         self.last_checkpoint_update = None
@@ -43,14 +77,37 @@ class ContinuousMonitor:
         except:
             return None
             
+    def read_metrics(self):
+        """从运行器的指标服务读取进度，开销与已完成题数无关"""
+        metrics = fetch_metrics(self.metrics_url)
+        if not metrics:
+            return None
+        counters, gauges = metrics['counters'], metrics['gauges']
+        return {
+            'completed': counters['questions_completed'] + counters['questions_failed'],
+            'total': gauges['questions_target'] or 150,
+            'errors': counters['questions_failed'],
+            'in_flight': gauges['questions_in_flight']
+        }
+        
     def analyze_progress(self):
         """分析进度"""
-        checkpoint = self.read_checkpoint()
-        if not checkpoint:
-            return None
-            
-        completed = len(checkpoint.get('completed_questions', []))
-        last_saved = checkpoint.get('last_saved', '')
+        if self.metrics_url:
+            progress = self.read_metrics()
+            if not progress:
+                return None
+            completed = progress['completed']
+        else:
+            checkpoint = self.read_checkpoint()
+            if not checkpoint:
+                return None
+            completed = len(checkpoint.get('completed_questions', []))
+            progress = {
+                'completed': completed,
+                'total': 150,
+                'last_saved': checkpoint.get('last_saved', ''),
+                'errors': sum(1 for r in checkpoint.get('results', []) if 'error' in r)
+            }
         
         # 检查是否有新进展
         has_progress = False
@@ -61,21 +118,19 @@ class ContinuousMonitor:
         else:
             self.no_progress_count += 1
             
-        return {
-            'completed': completed,
-            'total': 150,
-            'last_saved': last_saved,
-            'has_progress': has_progress,
-            'errors': sum(1 for r in checkpoint.get('results', []) if 'error' in r)
-        }
+        progress['has_progress'] = has_progress
+        return progress
         
     def restart_if_needed(self):
         """必要时重启进程"""
         if not self.check_process() and self.no_progress_count > 2:
             print(f"[{datetime.now().strftime('%H:%M:%S')}] 检测到进程停止，尝试重启...")
-            subprocess.run(['nohup', 'python3', 'gpqa_test_resumable.py', '>', 
-                          f'gpqa_restart_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log', 
-                          '2>&1', '&'], shell=True)
+            # 需要卡死检测和优雅重启时改用 monitors/supervisor.py
+            runner = Path(__file__).parent.parent / "core" / "gpqa_test_resumable.py"
+            log_name = f'gpqa_restart_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log'
+            with open(log_name, 'w') as log_file:
+                subprocess.Popen([sys.executable, str(runner), 'resume'], stdout=log_file,
+                                 stderr=subprocess.STDOUT, start_new_session=True)
             time.sleep(5)
             return True
         return False
@@ -110,6 +165,8 @@ class ContinuousMonitor:
                     print(f"📊 进度: {progress['completed']}/{progress['total']} " +
                           f"({'%.1f' % (progress['completed']/progress['total']*100)}%)")
                     print(f"   错误: {progress['errors']}")
+                    if 'in_flight' in progress:
+                        print(f"   在途: {progress['in_flight']}")
                     
                     if progress['has_progress']:
                         print("   ✅ 有新进展")
@@ -118,9 +175,7 @@ class ContinuousMonitor:
                         
                 if latest_log:
                     # 读取日志最后几行
-                    with open(latest_log, 'r') as f:
-                        lines = f.readlines()
-                        last_lines = lines[-5:] if len(lines) > 5 else lines
+                    last_lines = tail_lines(latest_log, 5)
                         
                     print(f"\n📄 最新日志 ({latest_log.name}):")
                     for line in last_lines:
@@ -135,7 +190,7 @@ class ContinuousMonitor:
                         self.no_progress_count = 0
                         
                 # 检查是否完成
-                if progress and progress['completed'] >= 150:
+                if progress and progress['completed'] >= progress['total']:
                     print("\n🎉 评测已完成!")
                     break
                     
@@ -149,6 +204,83 @@ class ContinuousMonitor:
                 print(f"\n错误: {e}")
                 time.sleep(60)
 
+    def follow(self, events_file=None, from_end=False, poll_interval=2):
+        """
+        跟随模式：增量读取运行器的进度事件流，按时间判断停滞
+        
+        每次只读取新追加的事件，内存和CPU开销与检查点、日志大小无关。
+        """
+        events_file = Path(events_file) if events_file else events_path_for(self.log_dir)
+        tail = EventTail(events_file, from_end=from_end)
+        tracker = ProgressTracker(MONITOR_CONFIG["event_window"], MONITOR_CONFIG["stall_seconds"])
+        report_interval = MONITOR_CONFIG["check_interval"]
+        
+        print("=== GPQA 持续监控器启动（跟随模式）===")
+        print(f"事件文件: {events_file}")
+        print("=" * 50)
+        
+        last_report = 0
+        stall_alerted = False
+        error_alerted = False
+        while True:
+            try:
+                events = tail.read_new()
+                for event in events:
+                    tracker.feed(event)
+                    if event["event"] in ("run_start", "run_end"):
+                        print(f"[{datetime.fromtimestamp(event['ts']).strftime('%H:%M:%S')}] {event['event']}: " +
+                              json.dumps({k: v for k, v in event.items() if k not in ('ts', 'event')}, ensure_ascii=False))
+                if events:
+                    # 文件还有未读内容时立即继续读取
+                    if tail.offset < events_file.stat().st_size:
+                        continue
+                    stall_alerted = False
+                
+                summary = tracker.summary()
+                now = time.time()
+                if now - last_report >= report_interval and tracker.target is not None:
+                    last_report = now
+                    target = summary['target'] or 0
+                    percent = summary['completed'] / target * 100 if target else 0
+                    print(f"\n[{datetime.now().strftime('%H:%M:%S')}] 📊 进度: {summary['completed']}/{target} ({percent:.1f}%)")
+                    print(f"   吞吐: {summary['throughput_per_min']:.2f} 题/分钟, 预计剩余: {format_duration(summary['eta_seconds'])}")
+                    print(f"   错误率: {summary['error_rate']:.1%} (最近{format_duration(tracker.window)}), "
+                          f"本次运行错误: {summary['errors']}, 距上一事件: {format_duration(summary['idle_seconds'])}")
+                
+                if summary['stalled'] and not stall_alerted:
+                    stall_alerted = True
+                    print(f"\n🚨 警告: 已经 {format_duration(summary['idle_seconds'])} 没有进度事件!")
+                    self.no_progress_count = self.max_no_progress
+                    if self.restart_if_needed():
+                        print("   已尝试重启进程")
+                
+                error_high = summary['error_rate'] > MONITOR_CONFIG["error_rate_alert"]
+                if error_high and not error_alerted:
+                    print(f"\n⚠️  错误率过高: {summary['error_rate']:.1%}")
+                error_alerted = error_high
+                
+                if not summary['running'] and tracker.target is not None and summary['completed'] >= tracker.target:
+                    print("\n🎉 评测已完成!")
+                    break
+                
+                time.sleep(poll_interval)
+                
+            except KeyboardInterrupt:
+                print("\n\n监控器已停止")
+                break
+
 if __name__ == "__main__":
-    monitor = ContinuousMonitor()
-    monitor.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="GPQA评测持续监控器")
+    parser.add_argument("--metrics-url", default=None,
+                        help="运行器指标地址，如 http://127.0.0.1:9108/metrics.json（默认解析检查点）")
+    parser.add_argument("--follow", action="store_true",
+                        help="跟随模式：增量读取进度事件流，按距上一事件的时间判断停滞")
+    parser.add_argument("--events", default=None,
+                        help="进度事件文件（默认 gpqa_logs/progress_events.jsonl）")
+    parser.add_argument("--from-end", action="store_true", help="跟随模式下跳过已有事件")
+    args = parser.parse_args()
+    monitor = ContinuousMonitor(metrics_url=args.metrics_url)
+    if args.follow:
+        monitor.follow(args.events, from_end=args.from_end)
+    else:
+        monitor.run()
\ No newline at end of file
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+GPQA评测监督进程
+以子进程方式启动运行器，通过管道接收心跳:
+    - 心跳中断超过 heartbeat_timeout，或完成数长时间不变（熔断期间除外），视为卡住
+    - 卡住时先发 SIGTERM，运行器停止分发、保存检查点后退出；超过 grace_period 仍未退出再 SIGKILL
+    - 运行器异常退出后按指数退避重启，已完成的题目由检查点/日志恢复，不会重复调用
+
+用法:
+    python monitors/supervisor.py -- 448 --concurrency 8
+    python monitors/supervisor.py --stall-seconds 900 -- resume --concurrency 4
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import select
+import argparse
+import subprocess
+from datetime import datetime
+from pathlib import Path
+
+# 添加父目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from configs.config import MONITOR_CONFIG
+
+RUNNER_SCRIPT = Path(__file__).parent.parent / "core" / "gpqa_test_resumable.py"
+
+
+def exit_code(returncode):
+    """子进程退出码 -> 监督进程退出码（被信号杀死时 Popen 返回负数）"""
+    return 128 - returncode if returncode < 0 else returncode
+
+
+def log(message):
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {message}", flush=True)
+
+
+class Supervisor:
+    """运行器监督进程"""
+
+    def __init__(self, runner_args, heartbeat_interval=10, heartbeat_timeout=60,
+                 stall_seconds=MONITOR_CONFIG["stall_seconds"],
+                 grace_period=120, backoff=5, max_backoff=300, max_restarts=20, log_file=None):
+        """
+        Args:
+            runner_args: 传给 gpqa_test_resumable.py 的参数
+            heartbeat_interval: 运行器发送心跳的间隔（秒）
+            heartbeat_timeout: 超过该时长没有心跳视为进程卡死（秒）
+            stall_seconds: 心跳正常但完成数超过该时长不变视为没有进展（秒）
+            grace_period: SIGTERM 后等待运行器保存检查点并退出的时长，超时后 SIGKILL（秒）
+            backoff: 首次重启前的等待（秒），之后每次翻倍
+            max_backoff: 重启等待上限（秒）
+            max_restarts: 最多重启次数
+            log_file: 运行器输出重定向到的文件，None 表示继承监督进程的输出
+        """
+        self.runner_args = list(runner_args)
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.stall_seconds = stall_seconds
+        self.grace_period = grace_period
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_restarts = max_restarts
+        self.log_file = log_file
+        self.stopping = False
+        self.process = None
+
+    def launch(self):
+        """启动运行器，返回 (进程, 心跳管道读端)"""
+        read_fd, write_fd = os.pipe()
+        cmd = [sys.executable, str(RUNNER_SCRIPT), *self.runner_args,
+               "--heartbeat-fd", str(write_fd), "--heartbeat-interval", str(self.heartbeat_interval)]
+        output = open(self.log_file, "a", encoding="utf-8") if self.log_file else None
+        try:
+            # 运行器放在独立会话中：终端的 Ctrl+C 只发给监督进程，由 terminate 转发一次 SIGTERM，
+            # 否则运行器会先收到 SIGINT 再收到 SIGTERM，把第二个信号当作“立即退出”放弃在途题目
+            process = subprocess.Popen(cmd, pass_fds=(write_fd,), stdout=output,
+                                       stderr=subprocess.STDOUT if output else None,
+                                       start_new_session=True)
+        finally:
+            os.close(write_fd)
+            if output:
+                output.close()
+        log(f"运行器已启动 (PID: {process.pid})")
+        return process, read_fd
+
+    def watch(self, process, read_fd):
+        """
+        读取心跳直到运行器退出或被判定卡住
+
+        Returns:
+            (退出码, 是否由监督进程终止, 本次运行新完成的题数)
+        """
+        buffer = b""
+        started = time.time()
+        last_beat = started
+        last_progress = started
+        first_completed = None
+        completed = None
+        stopped = False
+
+        while True:
+            ready, _, _ = select.select([read_fd], [], [], 1.0)
+            if ready:
+                chunk = os.read(read_fd, 65536)
+                if not chunk:
+                    # 写端已关闭：运行器正在退出
+                    break
+                buffer += chunk
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    try:
+                        beat = json.loads(line)
+                    except ValueError:
+                        continue
+                    last_beat = time.time()
+                    if first_completed is None:
+                        first_completed = beat["completed"]
+                    if beat["completed"] != completed or beat.get("circuit_open"):
+                        # 熔断期间没有进展是在等上游恢复，不计入停滞
+                        completed = beat["completed"]
+                        last_progress = last_beat
+
+            if process.poll() is not None or self.stopping:
+                break
+
+            now = time.time()
+            if now - last_beat > self.heartbeat_timeout:
+                log(f"⚠️  {now - last_beat:.0f} 秒没有收到心跳，判定运行器卡死")
+                stopped = True
+                break
+            if now - last_progress > self.stall_seconds:
+                log(f"⚠️  {now - last_progress:.0f} 秒没有完成新题目，判定运行器停滞")
+                stopped = True
+                break
+
+        if stopped or self.stopping:
+            self.terminate(process)
+        returncode = process.wait()
+        os.close(read_fd)
+        new_completed = (completed or 0) - (first_completed or 0)
+        return returncode, stopped, new_completed
+
+    def terminate(self, process):
+        """先 SIGTERM 让运行器保存检查点，超过宽限期再 SIGKILL"""
+        if process.poll() is not None:
+            return
+        log(f"发送 SIGTERM，等待运行器保存检查点（最多 {self.grace_period} 秒）")
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=self.grace_period)
+        except subprocess.TimeoutExpired:
+            log("⚠️  宽限期内未退出，发送 SIGKILL（已完成的题目仍在检查点日志中）")
+            process.kill()
+
+    def handle_signal(self, signum, frame):
+        """监督进程收到终止信号时转发给运行器，不再重启"""
+        log(f"收到信号 {signal.Signals(signum).name}，停止运行器后退出")
+        self.stopping = True
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self.handle_signal)
+        signal.signal(signal.SIGINT, self.handle_signal)
+
+        restarts = 0
+        delay = self.backoff
+        while True:
+            self.process, read_fd = self.launch()
+            returncode, stopped, new_completed = self.watch(self.process, read_fd)
+
+            if self.stopping:
+                log(f"运行器已退出 (退出码: {returncode})")
+                return exit_code(returncode)
+            if returncode == 0 and not stopped:
+                log("✅ 运行器正常结束")
+                return 0
+
+            # 上次运行有进展时从头计算退避，连续失败时翻倍
+            if new_completed > 0:
+                delay = self.backoff
+            restarts += 1
+            if restarts > self.max_restarts:
+                log(f"❌ 已重启 {self.max_restarts} 次，放弃")
+                return exit_code(returncode) or 1
+
+            log(f"运行器退出 (退出码: {returncode}，本次完成 {new_completed} 题)，{delay:.0f} 秒后第 {restarts} 次重启")
+            deadline = time.time() + delay
+            while time.time() < deadline and not self.stopping:
+                time.sleep(min(1.0, deadline - time.time()))
+            if self.stopping:
+                return exit_code(returncode)
+            delay = min(delay * 2, self.max_backoff)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="GPQA评测监督进程：心跳检测卡住、优雅终止并按指数退避重启",
+        epilog="-- 之后的参数原样传给 core/gpqa_test_resumable.py"
+    )
+    parser.add_argument("--heartbeat-interval", type=float, default=MONITOR_CONFIG["heartbeat_interval"],
+                        help="运行器心跳间隔（秒）")
+    parser.add_argument("--heartbeat-timeout", type=float, default=MONITOR_CONFIG["heartbeat_timeout"],
+                        help="多久没有心跳视为卡死（秒）")
+    parser.add_argument("--stall-seconds", type=float, default=MONITOR_CONFIG["stall_seconds"],
+                        help="多久没有完成新题目视为停滞（秒）")
+    parser.add_argument("--grace-period", type=float, default=MONITOR_CONFIG["grace_period"],
+                        help="SIGTERM 后等待退出的时长，超时 SIGKILL（秒）")
+    parser.add_argument("--backoff", type=float, default=MONITOR_CONFIG["restart_backoff"],
+                        help="首次重启等待（秒），之后翻倍")
+    parser.add_argument("--max-backoff", type=float, default=MONITOR_CONFIG["max_restart_backoff"],
+                        help="重启等待上限（秒）")
+    parser.add_argument("--max-restarts", type=int, default=MONITOR_CONFIG["max_restarts"], help="最多重启次数")
+    parser.add_argument("--log-file", default=None, help="运行器输出文件（默认输出到终端）")
+    parser.add_argument("runner_args", nargs=argparse.REMAINDER, help="运行器参数")
+    args = parser.parse_args()
+
+    runner_args = args.runner_args
+    if runner_args and runner_args[0] == "--":
+        runner_args = runner_args[1:]
+    if not runner_args:
+        parser.error("缺少运行器参数，例如: python monitors/supervisor.py -- 448 --concurrency 8")
+
+    supervisor = Supervisor(
+        runner_args,
+        heartbeat_interval=args.heartbeat_interval,
+        heartbeat_timeout=args.heartbeat_timeout,
+        stall_seconds=args.stall_seconds,
+        grace_period=args.grace_period,
+        backoff=args.backoff,
+        max_backoff=args.max_backoff,
+        max_restarts=args.max_restarts,
+        log_file=args.log_file
+    )
+    sys.exit(supervisor.run())
+
+
+if __name__ == "__main__":
+    main()
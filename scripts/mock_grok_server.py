@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+本地模拟Grok API服务器
+OpenAI兼容的 /v1/chat/completions 接口，用于在不产生费用的情况下压测
+GrokAPIClient / ResumableGPQATestRunner 的并发、重试、熔断和检查点
+
+支持:
+    - 固定、对数正态、帕累托（重尾）延迟分布
+    - 按比例注入 429（带 Retry-After）、5xx、超时（挂起不响应）
+    - 合成 usage（含 completion_tokens_details.reasoning_tokens）
+    - SSE 流式响应（stream=true，含 stream_options.include_usage）
+
+用法:
+    python scripts/mock_grok_server.py --port 8000 --latency pareto --latency-mean 2 --error-500 0.02
+    GROK_API_ENDPOINT=http://127.0.0.1:8000/v1/chat/completions XAI_API_KEY=mock \\
+        python core/gpqa_test_resumable.py 448 --concurrency 16
+
+设置了 https_proxy 时记得把 127.0.0.1 加入 no_proxy。
+"""
+
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class LatencyModel:
+    """请求延迟分布"""
+
+    def __init__(self, kind: str = "fixed", mean: float = 1.0, sigma: float = 1.0,
+                 alpha: float = 1.5, max_latency: float = None, rng: random.Random = None):
+        """
+        Args:
+            kind: fixed / lognormal / pareto
+            mean: 延迟均值（秒）
+            sigma: 对数正态分布的形状参数，越大尾部越重
+            alpha: 帕累托分布的形状参数（>1），越小尾部越重
+            max_latency: 延迟上限（秒），None 表示不截断
+            rng: 随机数生成器
+        """
+        self.kind = kind
+        self.mean = mean
+        self.sigma = sigma
+        self.alpha = alpha
+        self.max_latency = max_latency
+        self.rng = rng or random.Random()
+        self.lock = threading.Lock()
+
+    def sample(self) -> float:
+        """抽取一次延迟（秒）"""
+        with self.lock:
+            if self.kind == "lognormal":
+                # 选取 mu 使分布均值等于 mean
+                mu = -self.sigma ** 2 / 2
+                latency = self.mean * self.rng.lognormvariate(mu, self.sigma)
+            elif self.kind == "pareto":
+                # 帕累托均值为 alpha/(alpha-1) 倍的尺度
+                scale = self.mean * (self.alpha - 1) / self.alpha
+                latency = scale * self.rng.paretovariate(self.alpha)
+            else:
+                latency = self.mean
+        if self.max_latency is not None:
+            latency = min(latency, self.max_latency)
+        return latency
+
+
+class MockState:
+    """服务器配置和请求计数"""
+
+    def __init__(self, args):
+        self.rng = random.Random(args.seed)
+        self.latency = LatencyModel(args.latency, args.latency_mean, args.latency_sigma,
+                                    args.pareto_alpha, args.max_latency, random.Random(args.seed))
+        self.error_429 = args.error_429
+        self.error_500 = args.error_500
+        self.timeout_rate = args.timeout_rate
+        self.hang_seconds = args.hang_seconds
+        self.retry_after = args.retry_after
+        self.reasoning_tokens = args.reasoning_tokens
+        self.answer = args.answer
+        self.model = args.model
+
+        self.counts = {"requests": 0, "ok": 0, "429": 0, "5xx": 0, "timeouts": 0, "streams": 0}
+        self.lock = threading.Lock()
+
+    def count(self, key: str):
+        with self.lock:
+            self.counts[key] += 1
+
+    def draw(self) -> float:
+        with self.lock:
+            return self.rng.random()
+
+    def completion(self, body: dict) -> dict:
+        """合成一次完成结果：答案字母和用量"""
+        prompt = body["messages"][-1]["content"]
+        with self.lock:
+            letter = self.rng.choice("ABCD") if self.answer == "random" else self.answer
+            reasoning = int(self.rng.expovariate(1 / self.reasoning_tokens)) if self.reasoning_tokens else 0
+        prompt_tokens = len(prompt) // 4
+        return {
+            "id": f"mock-{time.time_ns()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", self.model),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": letter}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": reasoning + 1,
+                "total_tokens": prompt_tokens + reasoning + 1,
+                "completion_tokens_details": {"reasoning_tokens": reasoning}
+            }
+        }
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """请求处理：按配置注入错误和延迟"""
+
+    protocol_version = "HTTP/1.1"
+    # 响应头和响应体分开写出，不关闭Nagle会叠加约40ms的延迟确认
+    disable_nagle_algorithm = True
+    state: MockState = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/stats":
+            with self.state.lock:
+                self._send_json(200, dict(self.state.counts))
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": "not found"})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        state = self.state
+        state.count("requests")
+
+        # 依次判断注入的故障
+        draw = state.draw()
+        if draw < state.error_429:
+            state.count("429")
+            self._send_json(429, {"error": "rate limited"}, {"Retry-After": str(state.retry_after)})
+            return
+        draw -= state.error_429
+        if draw < state.error_500:
+            state.count("5xx")
+            self._send_json(503, {"error": "service unavailable"})
+            return
+        draw -= state.error_500
+        if draw < state.timeout_rate:
+            state.count("timeouts")
+            # 不发送任何数据，直到客户端读超时
+            time.sleep(state.hang_seconds)
+            self.close_connection = True
+            return
+
+        latency = state.latency.sample()
+        completion = state.completion(body)
+
+        if body.get("stream"):
+            state.count("streams")
+            self._stream(body, completion, latency)
+        else:
+            time.sleep(latency)
+            self._send_json(200, completion)
+        state.count("ok")
+
+    def _stream(self, body: dict, completion: dict, latency: float):
+        """按SSE分块返回，首块之前等待一半延迟，其余延迟分摊到各分块之间"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write_event(payload):
+            data = f"data: {payload}\n\n".encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        # 先发角色，再发答案内容（运行器取回答中第一个 A-D 字母，内容里不能混入其他大写字母）
+        deltas = [{"role": "assistant"}, {"content": completion["choices"][0]["message"]["content"]}]
+        time.sleep(latency / 2)
+        for delta in deltas:
+            chunk = {
+                "id": completion["id"],
+                "model": completion["model"],
+                "choices": [{"index": 0, "delta": delta, "finish_reason": None}]
+            }
+            write_event(json.dumps(chunk))
+            time.sleep(latency / 2 / len(deltas))
+
+        final = {"id": completion["id"], "model": completion["model"],
+                 "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        write_event(json.dumps(final))
+        if body.get("stream_options", {}).get("include_usage"):
+            write_event(json.dumps({"id": completion["id"], "model": completion["model"],
+                                    "choices": [], "usage": completion["usage"]}))
+        write_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def create_server(args) -> ThreadingHTTPServer:
+    """按命令行参数创建服务器（不启动）"""
+    handler = type("BoundMockHandler", (MockHandler,), {"state": MockState(args)})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="本地模拟Grok API服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", choices=["fixed", "lognormal", "pareto"], default="fixed", help="延迟分布")
+    parser.add_argument("--latency-mean", type=float, default=1.0, help="延迟均值（秒）")
+    parser.add_argument("--latency-sigma", type=float, default=1.0, help="lognormal: 形状参数")
+    parser.add_argument("--pareto-alpha", type=float, default=1.5, help="pareto: 形状参数（>1）")
+    parser.add_argument("--max-latency", type=float, default=None, help="延迟上限（秒）")
+    parser.add_argument("--error-429", type=float, default=0.0, help="返回429的比例")
+    parser.add_argument("--error-500", type=float, default=0.0, help="返回503的比例")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="挂起不响应的比例")
+    parser.add_argument("--hang-seconds", type=float, default=3600, help="挂起请求的时长（秒）")
+    parser.add_argument("--retry-after", type=float, default=1, help="429响应的 Retry-After（秒）")
+    parser.add_argument("--reasoning-tokens", type=int, default=3000, help="推理token均值（指数分布）")
+    parser.add_argument("--answer", default="random", help="返回的答案：random 或固定字母")
+    parser.add_argument("--model", default="grok-4-mock")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子")
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    server = create_server(args)
+    print(f"模拟Grok API: http://{args.host}:{args.port}/v1/chat/completions "
+          f"(延迟: {args.latency}, 均值 {args.latency_mean}秒)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
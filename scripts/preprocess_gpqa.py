@@ -1,93 +1,70 @@
 #!/usr/bin/env python3
 """
 GPQA数据预处理脚本
-将原始GPQA数据转换为评测所需的格式
+将原始GPQA数据转换为评测所需的格式，测试运行器直接读取该产物
 """
 
+import sys
 import json
-import random
 import argparse
 from pathlib import Path
 from datasets import load_dataset
 
-def preprocess_gpqa_item(item, seed):
+# 添加父目录到Python路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core.question_format import build_question, write_processed
+from core.question_store import QuestionStore
+
+
+def preprocess_gpqa_item(item, question_id, seed=0):
     """
     预处理单个GPQA题目
     1. 提取答案内容，去除标签
-    2. 随机打乱顺序（使用固定seed保证可重复）
-    3. 生成标准格式
+    2. 随机打乱顺序（使用 seed + question_id 保证可重复，与运行器一致）
+    3. 生成标准格式的提示
     """
-    # 收集所有答案
-    answers = [
-        item["Correct Answer"],
-        item["Incorrect Answer 1"],
-        item["Incorrect Answer 2"],
-        item["Incorrect Answer 3"]
-    ]
-    
-    # 记录正确答案
-    correct_answer = item["Correct Answer"]
-    
-    # 使用问题ID或内容的hash作为seed，确保同一问题打乱顺序固定
-    random.seed(seed)
-    random.shuffle(answers)
-    
-    # 生成选项
-    options = []
-    correct_letter = None
-    for i, answer in enumerate(answers):
-        letter = chr(65 + i)  # A, B, C, D
-        options.append(f"{letter}. {answer}")
-        if answer == correct_answer:
-            correct_letter = letter
-    
-    return {
-        "id": item.get("id", hash(item["Question"])),
-        "question": item["Question"],
-        "options": "\n".join(options),
-        "correct_answer": correct_letter,
-        "subject": item.get("Subdomain", "Unknown"),
-        "original_data": item  # 保留原始数据用于验证
-    }
+    return build_question(item, question_id, seed)
+
 
 def main():
     parser = argparse.ArgumentParser(description="预处理GPQA数据集")
     parser.add_argument("--dataset", default="Idavidrein/gpqa", help="HuggingFace数据集名称")
     parser.add_argument("--subset", default="gpqa_main", help="数据子集")
     parser.add_argument("--output", default="data/gpqa_processed.json", help="输出文件路径")
-    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--store", default="data/gpqa_processed.qstore", help="内存映射题目存储的输出路径")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子（每题实际种子为 seed + 题目索引）")
     args = parser.parse_args()
-    
+
     print(f"Loading dataset: {args.dataset}/{args.subset}")
-    
+
     # 加载数据集
     # 注意：需要输入密码 deserted-untie-orchid
     dataset = load_dataset(args.dataset, args.subset)
-    
+
     # 处理所有数据
     processed_data = []
     for idx, item in enumerate(dataset['train']):
-        # 使用idx作为seed，确保每个问题的打乱是固定的
-        processed_item = preprocess_gpqa_item(item, args.seed + idx)
+        processed_item = preprocess_gpqa_item(item, idx, args.seed)
         processed_data.append(processed_item)
-        
+
         if (idx + 1) % 50 == 0:
             print(f"Processed {idx + 1} items...")
-    
+
     # 保存处理后的数据
     output_path = Path(args.output)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(processed_data, f, indent=2, ensure_ascii=False)
-    
+    digest = write_processed(output_path, processed_data, args.seed, f"{args.dataset}/{args.subset}")
+    QuestionStore.build(args.store, processed_data, digest)
+
     print(f"\nProcessing complete!")
     print(f"Total items: {len(processed_data)}")
+    print(f"Content hash: {digest}")
     print(f"Output saved to: {output_path}")
-    
+    print(f"Question store saved to: {args.store}")
+
     # 验证数据格式
     print("\nSample processed item:")
     print(json.dumps(processed_data[0], indent=2, ensure_ascii=False))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
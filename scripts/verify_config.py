@@ -14,6 +14,7 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from configs.config import *
 from core.api_client import call_grok_api
+from core.question_store import read_question_count
 
 def verify_environment():
     """评测前验证环境配置"""
@@ -66,13 +67,21 @@ def verify_environment():
     # 4. 检查数据文件
     print("\n4. Checking data files...")
     data_path = Path(PROCESSED_DATA)
-    if not data_path.exists():
+    store_path = data_path.with_suffix(".qstore")
+    if store_path.exists():
+        # 只读文件头，不必加载整个数据文件
+        print(f"✓ Question store found: {read_question_count(store_path)} questions")
+    elif not data_path.exists():
         errors.append(f"❌ Processed data not found: {PROCESSED_DATA}")
         print(f"   Run: python scripts/preprocess_gpqa.py")
     else:
         with open(data_path, 'r') as f:
             data = json.load(f)
-        print(f"✓ Processed data found: {len(data)} questions")
+        if isinstance(data, dict):
+            print(f"✓ Processed data found: {data.get('total_questions', 0)} questions "
+                  f"(hash: {data.get('content_hash', '')[:12]})")
+        else:
+            warnings.append("⚠️  Processed data uses the old list format, please re-run scripts/preprocess_gpqa.py")
     
     # 5. 检查目录权限
     print("\n5. Checking directory permissions...")